@@ -0,0 +1,129 @@
+"""
+Times a per slot scan of many perp markets: `find_nodes_to_fill` and
+`find_nodes_to_trigger` called market by market, against
+`find_nodes_to_fill_for_markets` and `find_nodes_to_trigger_for_markets`, with
+and without a thread pool. Every market has a crossed book around $100, as in
+scripts/benchmarks/find_nodes_to_fill.py, and a few trigger orders.
+
+    python -m scripts.benchmarks.batch_markets --markets 60 --orders 500
+"""
+
+import argparse
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from types import SimpleNamespace
+
+from solders.pubkey import Pubkey
+
+from driftpy.dlob.dlob import DLOB, MarketToScan
+from driftpy.types import (
+    ExchangeStatus,
+    MarketType,
+    OraclePriceData,
+    OrderTriggerCondition,
+    OrderType,
+    PositionDirection,
+)
+from scripts.benchmarks.common import make_order, timed
+from scripts.benchmarks.find_nodes_to_fill import MID, SLOT, STATE_ACCOUNT, TS
+from tests.dlob_test_constants import mock_perp_markets
+
+TRIGGER_STATE_ACCOUNT = SimpleNamespace(exchange_status=ExchangeStatus.Active())
+
+
+def build_dlob(num_markets: int, num_orders: int, seed: int = 0) -> DLOB:
+    rng = random.Random(seed)
+    users = [Pubkey.new_unique() for _ in range(1_000)]
+    dlob = DLOB(node_list_backend="sorted")
+    order_id = 0
+    for market_index in range(num_markets):
+        for i in range(num_orders):
+            order_id += 1
+            is_bid = i % 2 == 0
+            offset = rng.randint(0, MID // 20)
+            is_trigger = i % 50 == 0
+            order = make_order(
+                order_id,
+                (
+                    MID - 3 * MID // 100 + offset
+                    if is_bid
+                    else MID - 2 * MID // 100 + offset
+                ),
+                PositionDirection.Long() if is_bid else PositionDirection.Short(),
+                slot=rng.randint(1, 900),
+                market_index=market_index,
+                order_type=OrderType.TriggerMarket() if is_trigger else None,
+                base_asset_amount=rng.randint(1, 10) * 10**8,
+                post_only=i % 4 > 1,
+                trigger_price=MID - offset if is_trigger else 0,
+                trigger_condition=OrderTriggerCondition.Above(),
+            )
+            dlob.insert_order(order, users[order_id % len(users)], SLOT)
+    return dlob
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--markets", type=int, default=60)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.markets} markets, {args.orders} orders each")
+    dlob = build_dlob(args.markets, args.orders)
+    markets = [
+        MarketToScan(
+            replace(mock_perp_markets[0], market_index=market_index),
+            OraclePriceData(MID, SLOT, 1, 1, 1, True),
+            fallback_bid=MID,
+            fallback_ask=MID,
+        )
+        for market_index in range(args.markets)
+    ]
+
+    with timed("[per market] find_nodes_to_fill"):
+        expected = {
+            market.key: len(
+                dlob.find_nodes_to_fill(
+                    market.market_account.market_index,
+                    SLOT,
+                    TS,
+                    MarketType.Perp(),
+                    market.oracle_price_data,
+                    STATE_ACCOUNT,
+                    market.market_account,
+                    market.fallback_bid,
+                    market.fallback_ask,
+                )
+            )
+            for market in markets
+        }
+    with timed("[per market] find_nodes_to_trigger"):
+        for market in markets:
+            dlob.find_nodes_to_trigger(
+                market.market_account.market_index,
+                market.oracle_price_data.price,
+                MarketType.Perp(),
+                TRIGGER_STATE_ACCOUNT,
+            )
+
+    with timed("[batch] find_nodes_to_fill_for_markets"):
+        nodes_to_fill = dlob.find_nodes_to_fill_for_markets(
+            markets, SLOT, TS, STATE_ACCOUNT
+        )
+    assert {key: len(nodes) for key, nodes in nodes_to_fill.items()} == expected
+
+    with ThreadPoolExecutor(args.threads) as executor:
+        with timed(f"[batch, {args.threads} threads] find_nodes_to_fill_for_markets"):
+            nodes_to_fill = dlob.find_nodes_to_fill_for_markets(
+                markets, SLOT, TS, STATE_ACCOUNT, executor
+            )
+    assert {key: len(nodes) for key, nodes in nodes_to_fill.items()} == expected
+
+    with timed("[batch] find_nodes_to_trigger_for_markets"):
+        dlob.find_nodes_to_trigger_for_markets(markets, TRIGGER_STATE_ACCOUNT)
+
+
+if __name__ == "__main__":
+    main()
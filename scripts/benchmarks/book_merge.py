@@ -0,0 +1,127 @@
+"""
+Compares the heap merge used by `DLOB._get_best_node` and
+`merge_l2_level_generators` with the linear scan over the generators' heads on
+deep synthetic books, with a third of the orders floating. The L2 merge is
+timed over already materialized levels of the book and `--fallback-sources`
+synthetic fallback sources, so it measures the merge alone.
+
+    python -m scripts.benchmarks.book_merge --sizes 10000 100000
+"""
+
+import argparse
+import random
+
+from driftpy.constants.numeric_constants import PRICE_PRECISION
+from driftpy.dlob.dlob import DLOB
+from driftpy.dlob.orderbook_levels import (
+    L2Level,
+    get_l2_generator_from_dlob_nodes,
+    get_l2_level_price,
+    merge_l2_level_generators,
+)
+from driftpy.types import MarketType, OraclePriceData
+from scripts.benchmarks.common import make_order, make_resting_book, timed
+
+SLOT = 1_001
+ORACLE_PRICE_DATA = OraclePriceData(100 * PRICE_PRECISION, SLOT, 1, 1, 1, True)
+
+
+def build_dlob(size: int) -> DLOB:
+    dlob = DLOB(node_list_backend="sorted")
+    rng = random.Random(1)
+    for order, user in make_resting_book(size):
+        if order.order_id % 3 == 0:
+            is_bid = order.order_id % 2 == 0
+            offset = rng.randint(1, PRICE_PRECISION * 5)
+            order = make_order(
+                order.order_id,
+                0,
+                order.direction,
+                slot=order.slot,
+                oracle_price_offset=-offset if is_bid else offset,
+            )
+        dlob.insert_order(order, user, SLOT)
+    return dlob
+
+
+def fallback_levels(args, size: int) -> list[list[L2Level]]:
+    rng = random.Random(2)
+    return [
+        [
+            L2Level(price, 1, {"vamm": 1})
+            for price in sorted(
+                100 * PRICE_PRECISION + rng.randint(1, 5 * PRICE_PRECISION)
+                for _ in range(size // 10)
+            )
+        ]
+        for _ in range(args.fallback_sources)
+    ]
+
+
+def resting_asks(dlob: DLOB, heap: bool):
+    node_lists = dlob.order_lists["perp"][0]
+    generator_list = [
+        node_lists.resting_limit["ask"].get_generator(),
+        node_lists.floating_limit["ask"].get_generator(),
+    ]
+    if heap:
+        return dlob._get_best_node(
+            generator_list,
+            ORACLE_PRICE_DATA,
+            SLOT,
+            key_fcn=lambda node: node.get_price(ORACLE_PRICE_DATA, SLOT),
+        )
+
+    def cmp(best_node, current_node, slot, oracle_price_data):
+        return current_node.get_price(oracle_price_data, slot) < best_node.get_price(
+            oracle_price_data, slot
+        )
+
+    return dlob._get_best_node(generator_list, ORACLE_PRICE_DATA, SLOT, cmp)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--fallback-sources", type=int, default=8)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"\n--- {size} orders ---")
+        dlob = build_dlob(size)
+        maker_levels = list(
+            get_l2_generator_from_dlob_nodes(
+                resting_asks(dlob, True), ORACLE_PRICE_DATA, SLOT
+            )
+        )
+
+        results = {}
+        for label, heap in (("linear", False), ("heap", True)):
+            with timed(f"[{label}] merge resting + floating asks"):
+                results[label] = [
+                    node.order.order_id for node in resting_asks(dlob, heap)
+                ]
+
+            generators = [
+                iter(levels) for levels in [maker_levels, *fallback_levels(args, size)]
+            ]
+            with timed(f"[{label}] merge L2 asks with fallback sources"):
+                if heap:
+                    merged = merge_l2_level_generators(
+                        generators, key=get_l2_level_price
+                    )
+                else:
+                    merged = merge_l2_level_generators(
+                        generators, lambda a, b: a.price < b.price
+                    )
+                for _ in merged:
+                    pass
+
+        assert results["linear"] == results["heap"]
+
+        with timed("[heap] get_l2 depth 100"):
+            dlob.get_l2(0, MarketType.Perp(), SLOT, ORACLE_PRICE_DATA, 100)
+
+
+if __name__ == "__main__":
+    main()
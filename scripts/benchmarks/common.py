@@ -0,0 +1,94 @@
+import random
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from solders.pubkey import Pubkey
+
+from driftpy.constants.numeric_constants import BASE_PRECISION, PRICE_PRECISION
+from driftpy.types import (
+    MarketType,
+    Order,
+    OrderStatus,
+    OrderTriggerCondition,
+    OrderType,
+    PositionDirection,
+)
+
+
+def make_order(
+    order_id: int,
+    price: int,
+    direction: PositionDirection,
+    slot: int = 1,
+    market_index: int = 0,
+    market_type: Optional[MarketType] = None,
+    order_type: Optional[OrderType] = None,
+    base_asset_amount: int = BASE_PRECISION,
+    post_only: bool = True,
+    oracle_price_offset: int = 0,
+    trigger_price: int = 0,
+    trigger_condition: Optional[OrderTriggerCondition] = None,
+    auction_duration: int = 0,
+    max_ts: int = 0,
+) -> Order:
+    return Order(
+        slot=slot,
+        price=price,
+        base_asset_amount=base_asset_amount,
+        base_asset_amount_filled=0,
+        quote_asset_amount_filled=0,
+        trigger_price=trigger_price,
+        auction_start_price=0,
+        auction_end_price=0,
+        max_ts=max_ts,
+        oracle_price_offset=oracle_price_offset,
+        order_id=order_id,
+        market_index=market_index,
+        status=OrderStatus.Open(),
+        order_type=order_type or OrderType.Limit(),
+        market_type=market_type or MarketType.Perp(),
+        user_order_id=0,
+        existing_position_direction=PositionDirection.Long(),
+        direction=direction,
+        reduce_only=False,
+        post_only=post_only,
+        immediate_or_cancel=False,
+        trigger_condition=trigger_condition or OrderTriggerCondition.Above(),
+        auction_duration=auction_duration,
+        posted_slot_tail=0,
+        bit_flags=0,
+    )
+
+
+def make_resting_book(
+    num_orders: int, num_users: int = 1_000, seed: int = 0
+) -> list[tuple[Order, Pubkey]]:
+    """
+    Synthetic resting limit book around $100 with prices spread over +/- 5%.
+    """
+    rng = random.Random(seed)
+    users = [Pubkey.new_unique() for _ in range(num_users)]
+    mid = 100 * PRICE_PRECISION
+    book = []
+    for order_id in range(num_orders):
+        is_bid = order_id % 2 == 0
+        offset = rng.randint(1, mid // 20)
+        order = make_order(
+            order_id,
+            mid - offset if is_bid else mid + offset,
+            PositionDirection.Long() if is_bid else PositionDirection.Short(),
+            slot=rng.randint(1, 1_000),
+        )
+        book.append((order, users[order_id % num_users]))
+    return book
+
+
+@contextmanager
+def timed(label: str, results: Optional[dict] = None):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    if results is not None:
+        results[label] = elapsed
+    print(f"{label:<48} {elapsed * 1_000:>12.2f} ms")
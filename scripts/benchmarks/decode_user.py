@@ -0,0 +1,241 @@
+"""
+Compares the previous slice / int.from_bytes UserAccount decoder with the
+struct-based `decode_user` and the lazy `decode_user_lazy` view over the fixtures
+in tests/decode, repeated to approximate a mainnet UserMap.sync.
+
+    python -m scripts.benchmarks.decode_user --repeat 1000
+"""
+
+import argparse
+import base64
+import gc
+import tracemalloc
+
+from solders.pubkey import Pubkey
+
+from driftpy.decode.user import (
+    decode_user,
+    decode_user_lazy,
+    read_bigint64le,
+    read_int32_le,
+    read_uint8,
+    read_uint16_le,
+)
+from driftpy.types import (
+    MarginMode,
+    MarketType,
+    Order,
+    OrderStatus,
+    OrderTriggerCondition,
+    OrderType,
+    PerpPosition,
+    PositionDirection,
+    SpotBalanceType,
+    SpotPosition,
+    UserAccount,
+)
+from scripts.benchmarks.common import timed
+from tests.decode.decode_strings import user_account_buffer_strings
+
+
+def legacy_decode_user(buffer: bytes) -> UserAccount:
+    """
+    Field-by-field decoder that `decode_user` replaced, kept here as a baseline.
+    """
+    offset = 8
+    authority = Pubkey(buffer[offset : offset + 32])
+    delegate = Pubkey(buffer[offset + 32 : offset + 64])
+    name = [buffer[offset + 64 + i] for i in range(32)]
+    offset += 96
+
+    spot_positions = []
+    for _ in range(8):
+        scaled_balance = read_bigint64le(buffer, offset, False)
+        open_orders = buffer[offset + 35]
+        if scaled_balance == 0 and open_orders == 0:
+            offset += 40
+            continue
+        spot_positions.append(
+            SpotPosition(
+                scaled_balance,
+                read_bigint64le(buffer, offset + 8, True),
+                read_bigint64le(buffer, offset + 16, True),
+                read_bigint64le(buffer, offset + 24, True),
+                read_uint16_le(buffer, offset + 32),
+                (
+                    SpotBalanceType.Deposit()
+                    if read_uint8(buffer, offset + 34) == 0
+                    else SpotBalanceType.Borrow()
+                ),
+                open_orders,
+                [0, 0, 0, 0],
+            )
+        )
+        offset += 40
+
+    perp_positions = []
+    for _ in range(8):
+        base_asset_amount = read_bigint64le(buffer, offset + 8, True)
+        quote_asset_amount = read_bigint64le(buffer, offset + 16, True)
+        lp_shares = read_bigint64le(buffer, offset + 64, False)
+        open_orders = buffer[offset + 94]
+        if (
+            base_asset_amount == 0
+            and open_orders == 0
+            and quote_asset_amount == 0
+            and lp_shares == 0
+        ):
+            offset += 96
+            continue
+        perp_positions.append(
+            PerpPosition(
+                read_bigint64le(buffer, offset, True),
+                base_asset_amount,
+                quote_asset_amount,
+                *[read_bigint64le(buffer, offset + o, True) for o in range(24, 64, 8)],
+                lp_shares,
+                read_bigint64le(buffer, offset + 72, True),
+                read_bigint64le(buffer, offset + 80, True),
+                read_int32_le(buffer, offset + 88, True),
+                read_uint16_le(buffer, offset + 92),
+                open_orders,
+                read_uint8(buffer, offset + 95),
+            )
+        )
+        offset += 96
+
+    order_types = ["Market", "Limit", "TriggerMarket", "TriggerLimit", "Oracle"]
+    trigger_conditions = ["Above", "Below", "TriggeredAbove", "TriggeredBelow"]
+    orders = []
+    for _ in range(32):
+        if read_uint8(buffer, offset + 82) != 1:
+            offset += 96
+            continue
+        u64s = [read_bigint64le(buffer, offset + o, False) for o in range(0, 48, 8)]
+        i64s = [read_bigint64le(buffer, offset + o, True) for o in range(48, 72, 8)]
+        orders.append(
+            Order(
+                *u64s,
+                *i64s,
+                read_int32_le(buffer, offset + 72, True),
+                read_int32_le(buffer, offset + 76, False),
+                read_uint16_le(buffer, offset + 80),
+                OrderStatus.Open(),
+                getattr(OrderType, order_types[read_uint8(buffer, offset + 83)])(),
+                (
+                    MarketType.Spot()
+                    if read_uint8(buffer, offset + 84) == 0
+                    else MarketType.Perp()
+                ),
+                read_uint8(buffer, offset + 85),
+                (
+                    PositionDirection.Long()
+                    if read_uint8(buffer, offset + 86) == 0
+                    else PositionDirection.Short()
+                ),
+                (
+                    PositionDirection.Long()
+                    if read_uint8(buffer, offset + 87) == 0
+                    else PositionDirection.Short()
+                ),
+                read_uint8(buffer, offset + 88) == 1,
+                read_uint8(buffer, offset + 89) == 1,
+                read_uint8(buffer, offset + 90) == 1,
+                getattr(
+                    OrderTriggerCondition,
+                    trigger_conditions[read_uint8(buffer, offset + 91)],
+                )(),
+                read_uint8(buffer, offset + 92),
+                read_uint8(buffer, offset + 93),
+                read_uint8(buffer, offset + 94),
+                [0],
+            )
+        )
+        offset += 96
+
+    u64_fields = [
+        read_bigint64le(buffer, offset + o, signed)
+        for o, signed in zip(
+            range(0, 72, 8), [True, False, False, False, True, True, True, False, False]
+        )
+    ]
+    offset += 72
+    next_order_id = read_int32_le(buffer, offset, False)
+    max_margin_ratio = read_int32_le(buffer, offset + 4, False)
+    next_liquidation_id = read_uint16_le(buffer, offset + 8)
+    sub_account_id = read_uint16_le(buffer, offset + 10)
+    flags = [read_uint8(buffer, offset + 12 + i) for i in range(9)]
+    offset += 21
+    padding1_bytes = [buffer[offset + i] for i in range(3)]
+    last_fuel_bonus_update_ts = read_int32_le(buffer, offset + 3, signed=False)
+    final_padding_bytes = [buffer[offset + 7 + i] for i in range(12)]
+
+    return UserAccount(
+        authority,
+        delegate,
+        name,
+        spot_positions,
+        perp_positions,
+        orders,
+        *u64_fields,
+        next_order_id,
+        max_margin_ratio,
+        next_liquidation_id,
+        sub_account_id,
+        flags[0],
+        flags[1] == 1,
+        flags[2] == 1,
+        flags[3],
+        flags[4] == 1,
+        flags[5],
+        flags[6] == 1,
+        [MarginMode.Default(), MarginMode.HighLeverage()][flags[7]],
+        flags[8],
+        last_fuel_bonus_update_ts,
+        padding1_bytes + final_padding_bytes,
+    )
+
+
+def decode_all(decode, buffers, touch_orders: bool):
+    decoded = [decode(buffer) for buffer in buffers]
+    if touch_orders:
+        for user_account in decoded:
+            user_account.orders
+    return decoded
+
+
+def bench(label: str, decode, buffers, touch_orders: bool):
+    gc.collect()
+    with timed(f"{label} decode {len(buffers)} accounts"):
+        decoded = decode_all(decode, buffers, touch_orders)
+    del decoded
+
+    # tracing slows decoding down, so peak memory is measured in a second pass
+    gc.collect()
+    tracemalloc.start()
+    decoded = decode_all(decode, buffers, touch_orders)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label + ' peak memory':<48} {peak / 1024 / 1024:>12.2f} MB")
+    return decoded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=1_000)
+    args = parser.parse_args()
+
+    fixtures = [base64.b64decode(s) for s in user_account_buffer_strings]
+    buffers = fixtures * args.repeat
+
+    legacy = bench("[legacy]", legacy_decode_user, buffers, False)
+    eager = bench("[struct]", decode_user, buffers, False)
+    assert legacy[: len(fixtures)] == eager[: len(fixtures)]
+    del legacy, eager
+
+    bench("[lazy, untouched]", decode_user_lazy, buffers, False)
+    bench("[lazy, orders read]", decode_user_lazy, buffers, True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compares `parse_logs` through anchorpy's event coder with the discriminator
+dispatched `EventLogParser` over a corpus of synthetic Drift transaction logs.
+
+There are no recorded mainnet logs in the repo, so the corpus is generated from
+the IDL: every event type is serialized from random field values and wrapped in
+the invoke / log / data / consumed / success lines a fill transaction produces,
+with compute budget and token program CPIs mixed in.
+
+    python -m scripts.benchmarks.event_parse --transactions 2000
+"""
+
+import argparse
+from pathlib import Path
+
+from anchorpy import Idl, Program
+from solders.pubkey import Pubkey
+
+import driftpy
+from driftpy.events.parse import DRIFT_PROGRAM_ID, EventLogParser, parse_logs
+from scripts.benchmarks.common import timed
+from tests.events.log_corpus import make_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=2_000)
+    args = parser.parse_args()
+
+    idl = Idl.from_json((Path(driftpy.__path__[0]) / "idl/drift.json").read_text())
+    program = Program(idl, Pubkey.from_string(DRIFT_PROGRAM_ID))
+    corpus = make_corpus(idl, args.transactions)
+    num_lines = sum(len(logs) for logs in corpus)
+    print(f"{args.transactions} transactions, {num_lines} log lines")
+
+    with timed("[anchorpy coder] parse_logs"):
+        expected = [parse_logs(program, logs) for logs in corpus]
+
+    event_log_parser = EventLogParser(program)
+    with timed("[EventLogParser] parse_logs"):
+        parsed = [event_log_parser.parse_logs(logs) for logs in corpus]
+    assert parsed == expected
+
+    event_log_parser = EventLogParser(program, event_names=["OrderActionRecord"])
+    with timed("[EventLogParser] OrderActionRecord only"):
+        for logs in corpus:
+            event_log_parser.parse_logs(logs)
+
+
+if __name__ == "__main__":
+    main()
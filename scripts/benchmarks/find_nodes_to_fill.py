@@ -0,0 +1,92 @@
+"""
+Times `DLOB.find_nodes_to_fill` on a crossed perp book: resting bids and asks
+overlap by a few percent around $100, a quarter of the orders are takers whose
+auctions are over, and fallback liquidity is quoted at the oracle price.
+
+The first call on a fresh DLOB is timed, then a second one on the same DLOB,
+which finds the same nodes now that simulated fills aren't written to the book.
+
+    python -m scripts.benchmarks.find_nodes_to_fill --sizes 1000 5000
+"""
+
+import argparse
+import random
+from types import SimpleNamespace
+
+from solders.pubkey import Pubkey
+
+from driftpy.constants.numeric_constants import PRICE_PRECISION
+from driftpy.dlob.dlob import DLOB
+from driftpy.types import MarketType, OraclePriceData, PositionDirection
+from scripts.benchmarks.common import make_order, timed
+from tests.dlob_test_constants import mock_perp_markets
+
+SLOT = 1_001
+TS = 1_700_000_000
+MID = 100 * PRICE_PRECISION
+ORACLE_PRICE_DATA = OraclePriceData(MID, SLOT, 1, 1, 1, True)
+
+STATE_ACCOUNT = SimpleNamespace(
+    exchange_status=0,
+    min_perp_auction_duration=10,
+    perp_fee_structure=SimpleNamespace(
+        fee_tiers=[
+            SimpleNamespace(maker_rebate_numerator=2, maker_rebate_denominator=10_000)
+        ]
+    ),
+)
+
+
+def build_dlob(size: int, num_users: int = 1_000, seed: int = 0) -> DLOB:
+    rng = random.Random(seed)
+    users = [Pubkey.new_unique() for _ in range(num_users)]
+    dlob = DLOB(node_list_backend="sorted")
+    for order_id in range(size):
+        is_bid = order_id % 2 == 0
+        # bids in [97, 102), asks in [98, 103)
+        offset = rng.randint(0, MID // 20)
+        order = make_order(
+            order_id,
+            MID - 3 * MID // 100 + offset if is_bid else MID - 2 * MID // 100 + offset,
+            PositionDirection.Long() if is_bid else PositionDirection.Short(),
+            slot=rng.randint(1, 900),
+            base_asset_amount=rng.randint(1, 10) * 10**8,
+            post_only=order_id % 4 > 1,
+        )
+        dlob.insert_order(order, users[order_id % num_users], SLOT)
+    return dlob
+
+
+def find_nodes_to_fill(dlob: DLOB):
+    return dlob.find_nodes_to_fill(
+        0,
+        SLOT,
+        TS,
+        MarketType.Perp(),
+        ORACLE_PRICE_DATA,
+        STATE_ACCOUNT,
+        mock_perp_markets[0],
+        fallback_bid=MID,
+        fallback_ask=MID,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"\n--- {size} orders ---")
+        dlob = build_dlob(size)
+        dlob.update_resting_limit_orders(SLOT)
+
+        with timed("find_nodes_to_fill"):
+            first = find_nodes_to_fill(dlob)
+        with timed("find_nodes_to_fill again"):
+            second = find_nodes_to_fill(dlob)
+        print(f"{len(first)} nodes to fill, then {len(second)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares merging resting and floating limit orders by `get_price` per node, as
+`get_resting_limit_bids/asks` used to, with pricing the nodes from their sort
+value, on synthetic books where most makers are oracle pegged.
+
+    python -m scripts.benchmarks.floating_book --sizes 10000 100000
+"""
+
+import argparse
+import random
+
+from driftpy.constants.numeric_constants import PRICE_PRECISION
+from driftpy.dlob.dlob import DLOB
+from driftpy.types import MarketType, OraclePriceData
+from scripts.benchmarks.common import make_order, make_resting_book, timed
+
+SLOT = 1_001
+ORACLE_PRICE_DATA = OraclePriceData(100 * PRICE_PRECISION, SLOT, 1, 1, 1, True)
+
+
+def build_dlob(size: int, floating_share: float) -> DLOB:
+    dlob = DLOB(node_list_backend="sorted")
+    rng = random.Random(1)
+    for order, user in make_resting_book(size):
+        if rng.random() < floating_share:
+            is_bid = order.order_id % 2 == 0
+            offset = rng.randint(1, PRICE_PRECISION * 5)
+            order = make_order(
+                order.order_id,
+                0,
+                order.direction,
+                slot=order.slot,
+                oracle_price_offset=-offset if is_bid else offset,
+            )
+        dlob.insert_order(order, user, SLOT)
+    return dlob
+
+
+def get_price_merge(dlob: DLOB, side: str):
+    node_lists = dlob.order_lists["perp"][0]
+    sign = 1 if side == "ask" else -1
+    return dlob._get_best_node(
+        [
+            node_lists.resting_limit[side].get_generator(),
+            node_lists.floating_limit[side].get_generator(),
+        ],
+        ORACLE_PRICE_DATA,
+        SLOT,
+        key_fcn=lambda node: sign * node.get_price(ORACLE_PRICE_DATA, SLOT),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--floating-share", type=float, default=0.8)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"\n--- {size} orders, {args.floating_share:.0%} floating ---")
+        dlob = build_dlob(size, args.floating_share)
+        dlob.update_resting_limit_orders(SLOT)
+
+        with timed("[get_price] merge bids and asks"):
+            expected = [
+                [node.order.order_id for node in get_price_merge(dlob, side)]
+                for side in ("bid", "ask")
+            ]
+
+        with timed("[sort value] get_resting_limit_bids/asks"):
+            merged = [
+                [
+                    node.order.order_id
+                    for node in dlob.get_resting_limit_bids(
+                        0, SLOT, MarketType.Perp(), ORACLE_PRICE_DATA
+                    )
+                ],
+                [
+                    node.order.order_id
+                    for node in dlob.get_resting_limit_asks(
+                        0, SLOT, MarketType.Perp(), ORACLE_PRICE_DATA
+                    )
+                ],
+            ]
+        assert merged == expected
+
+
+if __name__ == "__main__":
+    main()
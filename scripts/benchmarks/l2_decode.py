@@ -0,0 +1,71 @@
+"""
+Times decoding DLOB server `/l2` responses with the stdlib `json` module and one
+dict lookup per level field, as `DLOBSubscriber.decode_l2_orderbook` used to,
+against `decode_l2_orderbook` with whichever JSON backend is installed.
+
+    python -m scripts.benchmarks.l2_decode --depths 100 1000
+"""
+
+import argparse
+import json
+
+from driftpy.dlob import dlob_subscriber
+from driftpy.dlob.dlob_subscriber import DLOBSubscriber
+from driftpy.dlob.orderbook_levels import L2Level, L2OrderBook
+from scripts.benchmarks.common import timed
+
+REPEAT = 200
+
+
+def make_response(depth: int) -> bytes:
+    def levels(start: int, step: int):
+        return [
+            {
+                "price": str(start + i * step),
+                "size": str(10**9 + i),
+                "sources": {"dlob": str(10**9 + i)},
+            }
+            for i in range(depth)
+        ]
+
+    return json.dumps(
+        {
+            "asks": levels(100_000_001, 1_000),
+            "bids": levels(99_999_999, -1_000),
+            "slot": 1_000,
+        }
+    ).encode()
+
+
+def decode_with_json(data: bytes) -> L2OrderBook:
+    data = json.loads(data)
+    asks = [L2Level(ask["price"], ask["size"], ask["sources"]) for ask in data["asks"]]
+    bids = [L2Level(bid["price"], bid["size"], bid["sources"]) for bid in data["bids"]]
+    return L2OrderBook(asks, bids, data.get("slot"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depths", type=int, nargs="+", default=[100, 1_000])
+    args = parser.parse_args()
+
+    dlob_subscriber_instance = DLOBSubscriber()
+    backend = dlob_subscriber.json_loads.__module__
+    for depth in args.depths:
+        print(f"\n--- {depth} levels per side, {REPEAT} responses ---")
+        response = make_response(depth)
+
+        with timed("[json] decode_l2_orderbook"):
+            for _ in range(REPEAT):
+                expected = decode_with_json(response)
+
+        with timed(f"[{backend}] decode_l2_orderbook"):
+            for _ in range(REPEAT):
+                orderbook = dlob_subscriber_instance.decode_l2_orderbook(response)
+        assert [level.price for level in orderbook.bids] == [
+            level.price for level in expected.bids
+        ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Times finding the users that can be liquidated after each oracle update, by
+scanning every user with `RiskEngine.get_user_risk` as against
+`LiquidationCandidateIndex.get_liquidation_candidates`, which re-evaluates only
+the users whose bands the oracle crossed. Users are those of
+scripts/benchmarks/risk_engine.py, 2% of them liquidatable, and every tick
+moves one oracle, by 0.1% when calm and by 2% otherwise.
+
+    python -m scripts.benchmarks.liquidation_index --users 1000 10000
+"""
+
+import argparse
+import random
+from dataclasses import replace
+
+from solders.pubkey import Pubkey
+
+from driftpy.user_map.liquidation_index import LiquidationCandidateIndex
+from driftpy.user_map.risk_engine import RiskEngine
+from scripts.benchmarks.common import timed
+from scripts.benchmarks.risk_engine import PERP_PRICES, SPOT_PRICES, make_users
+
+TICKS = 50
+
+
+def move_oracle(rng: random.Random, move: float):
+    market_index = rng.randrange(4)
+    direction = rng.choice((-1, 1))
+    if market_index == 3:
+        # spot market 2
+        SPOT_PRICES[2] = int(SPOT_PRICES[2] * (1 + direction * move))
+    else:
+        PERP_PRICES[market_index] = int(
+            PERP_PRICES[market_index] * (1 + direction * move)
+        )
+        if market_index == 1:
+            SPOT_PRICES[1] = PERP_PRICES[1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000])
+    args = parser.parse_args()
+
+    initial_prices = list(PERP_PRICES), list(SPOT_PRICES)
+    for num_users in args.users:
+        print(f"\n--- {num_users} users, {TICKS} oracle updates ---")
+        drift_client, users = make_users(3 * num_users)
+        # mostly users that can't be liquidated, as on a live exchange
+        risk = RiskEngine(drift_client).get_user_risk(users)
+        healthy = [user for user, c in zip(users, risk.can_be_liquidated) if not c]
+        liquidatable = [user for user, c in zip(users, risk.can_be_liquidated) if c]
+        users = healthy[: num_users - num_users // 50] + liquidatable[: num_users // 50]
+        # one oracle per market, perp and spot market 1 sharing theirs
+        perp_markets = drift_client.get_perp_market_accounts()
+        spot_markets = drift_client.get_spot_market_accounts()
+        for market in perp_markets:
+            market.amm = replace(market.amm, oracle=Pubkey.new_unique())
+        for market in spot_markets:
+            market.oracle = Pubkey.new_unique()
+        spot_markets[1].oracle = perp_markets[1].amm.oracle
+
+        for label, move in (("calm", 0.001), ("2% moves", 0.02)):
+            PERP_PRICES[:], SPOT_PRICES[:] = map(list, initial_prices)
+            index = LiquidationCandidateIndex(drift_client)
+            for user in users:
+                index.update_user(str(user.user_public_key), user)
+            with timed(f"[index] initial evaluation, {label}"):
+                index.get_liquidation_candidates()
+
+            rng = random.Random(0)
+            expected = []
+            for _ in range(TICKS):
+                move_oracle(rng, move)
+                expected.append((list(PERP_PRICES), list(SPOT_PRICES)))
+
+            with timed(f"[full scan] {label}"):
+                scanned = []
+                for perp_prices, spot_prices in expected:
+                    PERP_PRICES[:], SPOT_PRICES[:] = perp_prices, spot_prices
+                    risk = RiskEngine(drift_client).get_user_risk(users)
+                    scanned.append(
+                        {
+                            str(user.user_public_key)
+                            for user, can_be_liquidated in zip(
+                                users, risk.can_be_liquidated.tolist()
+                            )
+                            if can_be_liquidated
+                        }
+                    )
+
+            PERP_PRICES[:], SPOT_PRICES[:] = map(list, initial_prices)
+            evaluated = 0
+            with timed(f"[index] {label}"):
+                found = []
+                for perp_prices, spot_prices in expected:
+                    PERP_PRICES[:], SPOT_PRICES[:] = perp_prices, spot_prices
+                    found.append(
+                        {
+                            str(user.user_public_key)
+                            for user in index.get_liquidation_candidates()
+                        }
+                    )
+                    evaluated += index.last_evaluated
+            assert found == scanned
+            print(
+                f"{len(scanned[-1])} users can be liquidated, "
+                f"{evaluated // TICKS} re-evaluated per update"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Times the spot weights and perp margin ratios of many random sizes through
+`calculate_asset_weight`, `calculate_liability_weight` and
+`calculate_market_margin_ratio`, against the `MarketRiskTable` lookups that
+`DriftUser` now uses, on markets with and without an IMF factor.
+
+    python -m scripts.benchmarks.market_risk --sizes 100000
+"""
+
+import argparse
+import random
+from dataclasses import replace
+
+from driftpy.constants.numeric_constants import PRICE_PRECISION
+from driftpy.math.margin import (
+    MarginCategory,
+    MarketRiskTable,
+    calculate_asset_weight,
+    calculate_liability_weight,
+    calculate_market_margin_ratio,
+)
+from scripts.benchmarks.common import timed
+from tests.dlob_test_constants import mock_perp_markets, mock_spot_markets
+
+ORACLE_PRICE = 150 * PRICE_PRECISION
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sizes = [rng.randint(1, 10 ** rng.randint(6, 15)) for _ in range(args.sizes)]
+    category = MarginCategory.INITIAL
+
+    for imf_factor in (0, 1_000):
+        print(f"\n--- imf factor {imf_factor}, {args.sizes} sizes ---")
+        spot_market = replace(
+            mock_spot_markets[1],
+            decimals=9,
+            imf_factor=imf_factor,
+            initial_asset_weight=8_000,
+            initial_liability_weight=12_000,
+        )
+        perp_market = replace(mock_perp_markets[0], imf_factor=imf_factor)
+        table = MarketRiskTable()
+
+        with timed("[functions] asset weight, liability weight, margin ratio"):
+            expected = [
+                (
+                    calculate_asset_weight(size, ORACLE_PRICE, spot_market, category),
+                    calculate_liability_weight(size, spot_market, category),
+                    calculate_market_margin_ratio(perp_market, size, category),
+                )
+                for size in sizes
+            ]
+
+        with timed("[table] asset weight, liability weight, margin ratio"):
+            found = [
+                (
+                    table.get_spot_market_risk(spot_market).get_asset_weight(
+                        size, ORACLE_PRICE, category
+                    ),
+                    table.get_spot_market_risk(spot_market).get_liability_weight(
+                        size, category
+                    ),
+                    table.get_perp_market_risk(perp_market).get_margin_ratio(
+                        size, category
+                    ),
+                )
+                for size in sizes
+            ]
+        assert found == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Compares the linked and sorted DLOB NodeList backends on synthetic resting books.
+
+    python -m scripts.benchmarks.node_list --sizes 1000 10000 100000
+
+The linked backend is O(n^2) to build, so it is skipped above `--max-linked`
+orders unless that limit is raised.
+"""
+
+import argparse
+
+from driftpy.dlob.dlob import DLOB
+from scripts.benchmarks.common import make_resting_book, timed
+
+
+def bench_backend(backend: str, book, slot: int):
+    dlob = DLOB(node_list_backend=backend)
+
+    with timed(f"[{backend}] insert {len(book)} orders"):
+        for order, user in book:
+            dlob.insert_order(order, user, slot)
+
+    node_lists = dlob.order_lists["perp"][0]
+    with timed(f"[{backend}] iterate both sides"):
+        for side in ("bid", "ask"):
+            for _ in node_lists.resting_limit[side].get_generator():
+                pass
+
+    with timed(f"[{backend}] remove every other order"):
+        for order, user in book[::2]:
+            dlob.delete(order, user, slot)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--max-linked", type=int, default=10_000)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"\n--- {size} orders ---")
+        book = make_resting_book(size)
+        if size <= args.max_linked:
+            bench_backend("linked", book, 1_001)
+        else:
+            print(f"[linked] skipped (> --max-linked {args.max_linked})")
+        bench_backend("sorted", book, 1_001)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Times the health, free collateral and liquidation checks of many users with one
+`RiskEngine.get_user_risk` call, against calling `DriftUser.get_health`,
+`get_free_collateral` and `can_be_liquidated` user by user, as a liquidator
+scanning its `UserMap` does, and the liquidation prices of all their positions
+with `RiskEngine.get_liquidation_prices` against `DriftUser.get_perp_liq_price`
+and `get_spot_liq_price`. Users hold a few random perp and spot positions in the
+mock markets of the tests.
+
+    python -m scripts.benchmarks.risk_engine --users 1000 10000
+"""
+
+import argparse
+import asyncio
+import copy
+import random
+from dataclasses import replace
+
+from driftpy.constants.numeric_constants import (
+    BASE_PRECISION,
+    PRICE_PRECISION,
+    QUOTE_PRECISION,
+    SPOT_BALANCE_PRECISION,
+)
+from driftpy.types import OraclePriceData, SpotBalanceType
+from driftpy.user_map.risk_engine import RiskEngine
+from scripts.benchmarks.common import timed
+from tests.dlob_test_constants import mock_perp_markets, mock_spot_markets
+from tests.math.helpers import make_mock_user, mock_user_account
+
+PERP_PRICES = [60_000 * PRICE_PRECISION, 150 * PRICE_PRECISION, 10 * PRICE_PRECISION]
+SPOT_PRICES = [PRICE_PRECISION, 150 * PRICE_PRECISION, 3 * PRICE_PRECISION // 2]
+
+
+def make_users(num_users: int, seed: int = 0):
+    rng = random.Random(seed)
+    perp_markets = [replace(market) for market in mock_perp_markets]
+    spot_markets = [replace(market) for market in mock_spot_markets]
+    perp_markets[1].imf_factor = 1_000
+    spot_markets[1].imf_factor = 2_000
+    spot_markets[1].initial_liability_weight = 12_000
+
+    user = asyncio.run(
+        make_mock_user(
+            perp_markets,
+            spot_markets,
+            copy.deepcopy(mock_user_account),
+            [1] * 3,
+            [1] * 3,
+        )
+    )
+    drift_client = user.drift_client
+    drift_client.get_oracle_price_data_for_perp_market = lambda i: OraclePriceData(
+        PERP_PRICES[i], 0, 1, 0, 0, True
+    )
+    drift_client.get_oracle_price_data_for_spot_market = lambda i: OraclePriceData(
+        SPOT_PRICES[i], 0, 1, 0, 0, True
+    )
+    drift_client.get_perp_market_accounts = lambda: perp_markets
+    drift_client.get_spot_market_accounts = lambda: spot_markets
+
+    users = []
+    for i in range(num_users):
+        user_account = copy.deepcopy(mock_user_account)
+        for position, market_index in zip(
+            user_account.perp_positions, rng.sample(range(3), rng.randint(1, 3))
+        ):
+            position.market_index = market_index
+            position.base_asset_amount = rng.randint(
+                -100 * BASE_PRECISION, 100 * BASE_PRECISION
+            )
+            position.quote_asset_amount = rng.randint(
+                -10_000 * QUOTE_PRECISION, 10_000 * QUOTE_PRECISION
+            )
+        for position, market_index in zip(
+            user_account.spot_positions, rng.sample(range(3), rng.randint(1, 3))
+        ):
+            position.market_index = market_index
+            position.balance_type = rng.choice(
+                [SpotBalanceType.Deposit(), SpotBalanceType.Borrow()]
+            )
+            position.scaled_balance = rng.randint(0, 100_000 * SPOT_BALANCE_PRECISION)
+            position.open_bids = rng.choice([0, 1]) * rng.randint(0, 10**12)
+
+        drift_user = copy.copy(user)
+        drift_user.get_user_account = lambda user_account=user_account: user_account
+        drift_user.user_public_key = i
+        users.append(drift_user)
+    return drift_client, users
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000])
+    args = parser.parse_args()
+
+    for num_users in args.users:
+        print(f"\n--- {num_users} users ---")
+        drift_client, users = make_users(num_users)
+
+        with timed("[DriftUser] health, free collateral, can_be_liquidated"):
+            expected = [
+                (
+                    user.get_health(),
+                    user.get_free_collateral(),
+                    user.can_be_liquidated(),
+                )
+                for user in users
+            ]
+
+        with timed("[RiskEngine] get_user_risk"):
+            risk = RiskEngine(drift_client).get_user_risk(users)
+
+        assert expected == list(
+            zip(
+                risk.health.tolist(),
+                risk.free_collateral.tolist(),
+                risk.can_be_liquidated.tolist(),
+            )
+        )
+        print(f"{int(risk.can_be_liquidated.sum())} users can be liquidated")
+
+        with timed("[DriftUser] get_perp_liq_price, get_spot_liq_price"):
+            expected = [
+                user.get_perp_liq_price(position.market_index)
+                for user in users
+                for position in user.get_user_account().perp_positions
+                if position.base_asset_amount != 0
+            ] + [
+                user.get_spot_liq_price(position.market_index)
+                for user in users
+                for position in user.get_user_account().spot_positions
+                if position.scaled_balance != 0 and position.market_index != 0
+            ]
+
+        with timed("[RiskEngine] get_liquidation_prices"):
+            liquidation_prices = RiskEngine(drift_client).get_liquidation_prices(users)
+
+        assert expected == (
+            liquidation_prices.perp_liq_prices.tolist()
+            + liquidation_prices.spot_liq_prices.tolist()
+        )
+
+
+if __name__ == "__main__":
+    main()
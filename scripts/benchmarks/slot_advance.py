@@ -0,0 +1,105 @@
+"""
+Compares scanning every taking limit and open order on each slot and ts
+advance, as `update_resting_limit_orders` and `find_expired_nodes_to_fill` used
+to, with popping the auction end and expiry heaps of the DLOB, on books where
+most taking orders are still in long auctions.
+
+    python -m scripts.benchmarks.slot_advance --sizes 10000 100000 --slots 100
+"""
+
+import argparse
+import random
+
+from solders.pubkey import Pubkey
+
+from driftpy.constants.numeric_constants import PRICE_PRECISION
+from driftpy.dlob.dlob import DLOB
+from driftpy.math.orders import is_order_expired, is_resting_limit_order
+from driftpy.types import MarketType, PositionDirection
+from scripts.benchmarks.common import make_order, timed
+
+SLOT = 1_000
+TS = 1_700_000_000
+
+
+def build_dlob(size: int, num_markets: int = 10, seed: int = 0) -> DLOB:
+    rng = random.Random(seed)
+    users = [Pubkey.new_unique() for _ in range(1_000)]
+    dlob = DLOB(node_list_backend="sorted")
+    for order_id in range(size):
+        is_bid = order_id % 2 == 0
+        order = make_order(
+            order_id,
+            100 * PRICE_PRECISION + rng.randint(-PRICE_PRECISION, PRICE_PRECISION),
+            PositionDirection.Long() if is_bid else PositionDirection.Short(),
+            slot=SLOT - rng.randint(0, 10),
+            market_index=order_id % num_markets,
+            post_only=False,
+            auction_duration=rng.randint(1, 255),
+            max_ts=TS + rng.randint(-100, 10_000),
+        )
+        dlob.insert_order(order, users[order_id % len(users)], SLOT)
+    return dlob
+
+
+def scan_slot_advance(dlob: DLOB, slot: int):
+    """
+    The former per slot scan, without moving the orders.
+    """
+    resting = []
+    for node_lists in dlob.order_lists["perp"].values():
+        for side in ("ask", "bid"):
+            for node in node_lists.taking_limit[side].get_generator():
+                if is_resting_limit_order(node.order, slot):
+                    resting.append(node)
+    return resting
+
+
+def scan_expired(dlob: DLOB, market_index: int, ts: int):
+    node_lists = dlob.order_lists["perp"][market_index]
+    return [
+        node
+        for group in ("taking_limit", "resting_limit", "floating_limit", "market")
+        for side in ("bid", "ask")
+        for node in getattr(node_lists, group)[side].get_generator()
+        if is_order_expired(node.order, ts, True)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--slots", type=int, default=100)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"\n--- {size} orders, {args.slots} slots ---")
+        dlob = build_dlob(size)
+        markets = list(dlob.order_lists["perp"])
+
+        with timed("[scan] taking limit orders per slot"):
+            for slot in range(SLOT + 1, SLOT + 1 + args.slots):
+                scan_slot_advance(dlob, slot)
+
+        with timed("[scan] expired orders per ts"):
+            for ts in range(TS, TS + args.slots):
+                for market_index in markets:
+                    scan_expired(dlob, market_index, ts)
+
+        with timed("[heap] update_resting_limit_orders per slot"):
+            for slot in range(SLOT + 1, SLOT + 1 + args.slots):
+                dlob.update_resting_limit_orders(slot)
+
+        with timed("[heap] find_expired_nodes_to_fill per ts"):
+            for ts in range(TS, TS + args.slots):
+                for market_index in markets:
+                    expired = dlob.find_expired_nodes_to_fill(
+                        market_index, ts, MarketType.Perp()
+                    )
+        assert sorted(node_to_fill.node.order.order_id for node_to_fill in expired) == (
+            sorted(node.order.order_id for node in scan_expired(dlob, markets[-1], ts))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares restoring users from the pickled `PickledData` format written by
+`UserMap.dump` with the memory-mapped snapshot format written by
+`UserMap.dump_snapshot`, using the fixtures in tests/decode repeated to
+approximate a mainnet UserMap.
+
+    python -m scripts.benchmarks.snapshot --repeat 1000
+"""
+
+import argparse
+import base64
+import gc
+import os
+import pickle
+import tempfile
+
+from solders.pubkey import Pubkey
+
+from driftpy.decode.user import decode_user, decode_user_lazy
+from driftpy.pickle.snapshot import Snapshot, write_snapshot
+from driftpy.types import PickledData, compress, decompress
+from scripts.benchmarks.common import timed
+from tests.decode.decode_strings import user_account_buffer_strings
+
+
+def load_pickle(filename: str):
+    with open(filename, "rb") as f:
+        users: list[PickledData] = pickle.load(f)
+    return {str(user.pubkey): decode_user(decompress(user.data)) for user in users}
+
+
+def load_snapshot(filename: str):
+    snapshot = Snapshot(filename)
+    return {pubkey: decode_user_lazy(data) for pubkey, data in snapshot.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=1_000)
+    args = parser.parse_args()
+
+    fixtures = [base64.b64decode(s) for s in user_account_buffer_strings]
+    raw = {
+        str(Pubkey.new_unique()): buffer
+        for _ in range(args.repeat)
+        for buffer in fixtures
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, "usermap_0.pkl")
+        snapshot_path = os.path.join(directory, "usermap_0.snap")
+        compressed_path = os.path.join(directory, "usermap_z_0.snap")
+
+        with timed(f"[pickle] dump {len(raw)} users"):
+            users = [
+                PickledData(pubkey=pubkey, data=compress(data))
+                for pubkey, data in raw.items()
+            ]
+            with open(pickle_path, "wb") as f:
+                pickle.dump(users, f, pickle.HIGHEST_PROTOCOL)
+        with timed(f"[snapshot] dump {len(raw)} users"):
+            write_snapshot(snapshot_path, 0, raw.items())
+        with timed(f"[snapshot, zlib] dump {len(raw)} users"):
+            write_snapshot(compressed_path, 0, raw.items(), compress=True)
+
+        for path in (pickle_path, snapshot_path, compressed_path):
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"{os.path.basename(path) + ' size':<48} {size:>12.2f} MB")
+
+        gc.collect()
+        with timed(f"[pickle] load {len(raw)} users"):
+            loaded = load_pickle(pickle_path)
+        del loaded
+
+        for label, path in (
+            ("[snapshot]", snapshot_path),
+            ("[snapshot, zlib]", compressed_path),
+        ):
+            gc.collect()
+            with timed(f"{label} load {len(raw)} users"):
+                loaded = load_snapshot(path)
+            with timed(f"{label} then read every user's orders"):
+                for user_account in loaded.values():
+                    user_account.orders
+            del loaded
+
+
+if __name__ == "__main__":
+    main()
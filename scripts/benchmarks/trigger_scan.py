@@ -0,0 +1,108 @@
+"""
+Compares walking the trigger lists node by node, as `find_nodes_to_trigger`
+used to, with bisecting the sorted backend's keys, on books of stop orders with
+trigger prices within 10% of $100. Every scan is repeated for calm oracle moves,
+which trigger a handful of orders, and for a 5% move, which triggers many.
+
+    python -m scripts.benchmarks.trigger_scan --sizes 10000 50000
+"""
+
+import argparse
+import random
+from types import SimpleNamespace
+
+from solders.pubkey import Pubkey
+
+from driftpy.constants.numeric_constants import PRICE_PRECISION
+from driftpy.dlob.dlob import DLOB, NodeToTrigger
+from driftpy.types import (
+    ExchangeStatus,
+    MarketType,
+    OrderTriggerCondition,
+    OrderType,
+    PositionDirection,
+)
+from scripts.benchmarks.common import make_order, timed
+
+MID = 100 * PRICE_PRECISION
+SLOT = 1_000
+REPEAT = 200
+STATE_ACCOUNT = SimpleNamespace(exchange_status=ExchangeStatus.Active())
+
+
+def build_dlob(size: int, seed: int = 0) -> DLOB:
+    rng = random.Random(seed)
+    users = [Pubkey.new_unique() for _ in range(1_000)]
+    dlob = DLOB(node_list_backend="sorted")
+    for order_id in range(size):
+        offset = rng.randint(1, MID // 10)
+        is_above = order_id % 2 == 0
+        order = make_order(
+            order_id,
+            0,
+            PositionDirection.Long() if is_above else PositionDirection.Short(),
+            slot=rng.randint(1, SLOT),
+            order_type=OrderType.TriggerMarket(),
+            trigger_price=MID + offset if is_above else MID - offset,
+            trigger_condition=(
+                OrderTriggerCondition.Above()
+                if is_above
+                else OrderTriggerCondition.Below()
+            ),
+        )
+        dlob.insert_order(order, users[order_id % len(users)], SLOT)
+    return dlob
+
+
+def walk_nodes_to_trigger(dlob: DLOB, oracle_price: int):
+    """
+    The former node by node walk of the trigger lists.
+    """
+    nodes_to_trigger = []
+    trigger_lists = dlob.order_lists["perp"][0].trigger
+    for node in trigger_lists["above"].get_generator():
+        if oracle_price > node.order.trigger_price:
+            nodes_to_trigger.append(NodeToTrigger(node))
+        else:
+            break
+    for node in trigger_lists["below"].get_generator():
+        if oracle_price < node.order.trigger_price:
+            nodes_to_trigger.append(NodeToTrigger(node))
+        else:
+            break
+    return nodes_to_trigger
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"\n--- {size} stop orders, {REPEAT} scans ---")
+        dlob = build_dlob(size)
+        for label, move in (("calm", MID // 1_000), ("5% move", MID // 20)):
+            rng = random.Random(1)
+            oracle_prices = [MID + rng.choice((-1, 1)) * move for _ in range(REPEAT)]
+
+            with timed(f"[walk] {label}"):
+                expected = [
+                    len(walk_nodes_to_trigger(dlob, oracle_price))
+                    for oracle_price in oracle_prices
+                ]
+
+            with timed(f"[bisect] {label}"):
+                found = [
+                    len(
+                        dlob.find_nodes_to_trigger(
+                            0, oracle_price, MarketType.Perp(), STATE_ACCOUNT
+                        )
+                    )
+                    for oracle_price in oracle_prices
+                ]
+            assert found == expected
+            print(f"{sum(found) // REPEAT} orders triggered per scan")
+
+
+if __name__ == "__main__":
+    main()
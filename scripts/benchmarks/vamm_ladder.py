@@ -0,0 +1,118 @@
+"""
+Compares walking the vAMM swap by swap, as `get_vamm_l2_generator` used to,
+with the batched `get_vamm_l2_ladder` and the `L2Level` wrapper around it, on the
+mock perp market of tests/math/amm.py scaled to mainnet-like reserves.
+
+    python -m scripts.benchmarks.vamm_ladder --num-orders 10 100 500
+"""
+
+import argparse
+
+from driftpy.constants.numeric_constants import (
+    BASE_PRECISION,
+    PEG_PRECISION,
+    PRICE_PRECISION,
+)
+from driftpy.dlob.orderbook_levels import get_vamm_l2_generator, get_vamm_l2_ladder
+from driftpy.math.amm import (
+    calculate_amm_reserves_after_swap,
+    calculate_market_open_bid_ask,
+    calculate_quote_asset_amount_swapped,
+    calculate_spread_reserves,
+    calculate_updated_amm,
+    deepcopy_amm,
+)
+from driftpy.types import AssetType, OraclePriceData, SwapDirection
+from scripts.benchmarks.common import timed
+from tests.dlob_test_constants import mock_perp_markets
+from tests.math.amm import custom_deepcopy_perp_market_account
+
+NOW = 1_688_881_915
+REPEAT = 100
+
+
+def swap_by_swap_levels(market_account, oracle_price_data, num_orders: int):
+    """
+    The former per level implementation, without top of book quote amounts.
+    """
+    updated_amm = calculate_updated_amm(market_account.amm, oracle_price_data)
+    open_bids, open_asks = calculate_market_open_bid_ask(
+        updated_amm.base_asset_reserve,
+        updated_amm.min_base_asset_reserve,
+        updated_amm.max_base_asset_reserve,
+        updated_amm.order_step_size,
+    )
+    bid_reserves, ask_reserves = calculate_spread_reserves(
+        updated_amm, oracle_price_data, NOW, False
+    )
+
+    sides = []
+    for reserves, open_liquidity, direction in (
+        (bid_reserves, open_bids, SwapDirection.Add()),
+        (ask_reserves, abs(open_asks), SwapDirection.Remove()),
+    ):
+        amm = deepcopy_amm(updated_amm)
+        amm.base_asset_reserve, amm.quote_asset_reserve = reserves
+        size = open_liquidity // num_orders
+
+        levels = []
+        while len(levels) < num_orders and size > 0:
+            quote_reserve, base_reserve = calculate_amm_reserves_after_swap(
+                amm, AssetType.BASE(), size, direction
+            )
+            quote_swapped = calculate_quote_asset_amount_swapped(
+                abs(amm.quote_asset_reserve - quote_reserve),
+                amm.peg_multiplier,
+                direction,
+            )
+            levels.append(((quote_swapped * BASE_PRECISION) // size, size))
+            amm.base_asset_reserve = base_reserve
+            amm.quote_asset_reserve = quote_reserve
+        sides.append(levels)
+    return sides
+
+
+def make_market():
+    market = custom_deepcopy_perp_market_account(mock_perp_markets[0])
+    reserve = 38_104_569 * BASE_PRECISION
+    market.amm.base_asset_reserve = reserve
+    market.amm.quote_asset_reserve = reserve
+    market.amm.sqrt_k = reserve
+    market.amm.max_base_asset_reserve = reserve * 2
+    market.amm.min_base_asset_reserve = reserve // 2
+    market.amm.peg_multiplier = int(18.32 * PEG_PRECISION)
+    market.amm.historical_oracle_data.last_oracle_price = int(18.55 * PRICE_PRECISION)
+    return market
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-orders", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    market = make_market()
+    oracle_price_data = OraclePriceData(int(18.624 * PRICE_PRECISION), 0, 1, 1, 1, True)
+
+    for num_orders in args.num_orders:
+        print(f"\n--- {num_orders} levels per side, {REPEAT} ladders ---")
+        with timed("[swap by swap] bids and asks"):
+            for _ in range(REPEAT):
+                bids, asks = swap_by_swap_levels(market, oracle_price_data, num_orders)
+
+        with timed("[get_vamm_l2_ladder] bids and asks"):
+            for _ in range(REPEAT):
+                ladder = get_vamm_l2_ladder(market, oracle_price_data, num_orders, NOW)
+        assert list(zip(ladder.bid_prices, ladder.bid_sizes)) == bids
+        assert list(zip(ladder.ask_prices, ladder.ask_sizes)) == asks
+
+        with timed("[get_vamm_l2_generator] bid and ask L2Levels"):
+            for _ in range(REPEAT):
+                get_l2_bids, get_l2_asks = get_vamm_l2_generator(
+                    market, oracle_price_data, num_orders, NOW
+                )
+                list(get_l2_bids())
+                list(get_l2_asks())
+
+
+if __name__ == "__main__":
+    main()
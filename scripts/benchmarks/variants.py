@@ -0,0 +1,137 @@
+"""
+Per-call cost of `is_variant` / `is_one_of_variant` and their effect on the DLOB
+insert and DriftUser margin paths, comparing the tag-based implementation with
+the previous name / `str()` based one.
+
+    python -m scripts.benchmarks.variants
+"""
+
+import argparse
+import asyncio
+import enum as py_enum
+import sys
+import timeit
+from contextlib import contextmanager
+
+from driftpy.dlob.dlob import DLOB
+from driftpy.types import (
+    OrderType,
+    PositionDirection,
+    is_one_of_variant,
+    is_variant,
+)
+from scripts.benchmarks.common import make_resting_book, timed
+
+
+def legacy_is_variant(enum, _type: str) -> bool:
+    if isinstance(enum, py_enum.EnumMeta):
+        raise TypeError
+    if isinstance(enum, py_enum.Enum):
+        raise TypeError
+    if enum.__class__.__name__ == "type":
+        raise ValueError
+
+    return _type == enum.__class__.__name__
+
+
+def legacy_is_one_of_variant(enum, types):
+    return any(type in str(enum) for type in types)
+
+
+@contextmanager
+def legacy_variants():
+    """
+    Swap the legacy implementations into every driftpy module that imported them.
+    """
+    patched = []
+    for module in list(sys.modules.values()):
+        if not getattr(module, "__name__", "").startswith("driftpy"):
+            continue
+        for name, legacy in (
+            ("is_variant", legacy_is_variant),
+            ("is_one_of_variant", legacy_is_one_of_variant),
+        ):
+            if getattr(module, name, None) is not None:
+                patched.append((module, name, getattr(module, name)))
+                setattr(module, name, legacy)
+    try:
+        yield
+    finally:
+        for module, name, original in patched:
+            setattr(module, name, original)
+
+
+def bench_calls(number: int):
+    direction = PositionDirection.Long()
+    order_type = OrderType.TriggerLimit()
+    types = ["Market", "TriggerMarket", "Oracle"]
+    for label, fn, args in [
+        ("is_variant", is_variant, (direction, "Long")),
+        ("legacy is_variant", legacy_is_variant, (direction, "Long")),
+        ("is_one_of_variant", is_one_of_variant, (order_type, types)),
+        ("legacy is_one_of_variant", legacy_is_one_of_variant, (order_type, types)),
+    ]:
+        elapsed = timeit.timeit(lambda: fn(*args), number=number)
+        print(f"{label:<48} {elapsed / number * 1e9:>12.1f} ns/call")
+
+
+def bench_dlob_insert(num_orders: int):
+    book = make_resting_book(num_orders)
+    for label in ("legacy", "tagged"):
+        dlob = DLOB(node_list_backend="sorted")
+        if label == "legacy":
+            with legacy_variants(), timed(f"[{label}] DLOB insert {num_orders} orders"):
+                for order, user in book:
+                    dlob.insert_order(order, user, 1_001)
+        else:
+            with timed(f"[{label}] DLOB insert {num_orders} orders"):
+                for order, user in book:
+                    dlob.insert_order(order, user, 1_001)
+
+
+async def bench_margin(iterations: int):
+    # reuses the DriftUser fixtures from the math tests
+    from tests.dlob_test_constants import mock_perp_markets, mock_spot_markets
+    from tests.math.helpers import make_mock_user, mock_user_account
+
+    user = await make_mock_user(
+        mock_perp_markets,
+        mock_spot_markets,
+        mock_user_account,
+        [1] * len(mock_perp_markets),
+        [1] * len(mock_spot_markets),
+    )
+
+    def margin_path():
+        user.get_health()
+        user.get_free_collateral()
+        user.get_leverage()
+
+    # warm up lazily built state before timing either implementation
+    margin_path()
+
+    for label in ("legacy", "tagged"):
+        if label == "legacy":
+            with legacy_variants(), timed(f"[{label}] margin path x{iterations}"):
+                for _ in range(iterations):
+                    margin_path()
+        else:
+            with timed(f"[{label}] margin path x{iterations}"):
+                for _ in range(iterations):
+                    margin_path()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--margin-iterations", type=int, default=2_000)
+    args = parser.parse_args()
+
+    bench_calls(args.calls)
+    bench_dlob_insert(args.orders)
+    asyncio.run(bench_margin(args.margin_iterations))
+
+
+if __name__ == "__main__":
+    main()
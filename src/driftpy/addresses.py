@@ -1,15 +1,84 @@
+from functools import lru_cache
+from typing import Optional, Sequence
+
 from solders.pubkey import Pubkey
 
+# number of derived addresses kept by `find_program_address`
+PDA_CACHE_SIZE = 8192
+
 
 def int_to_le_bytes(a: int):
     return a.to_bytes(2, "little")
 
 
+@lru_cache(maxsize=PDA_CACHE_SIZE)
+def _find_program_address(
+    seeds: tuple[bytes, ...], program_id: Pubkey
+) -> tuple[Pubkey, int]:
+    return Pubkey.find_program_address(list(seeds), program_id)
+
+
+def find_program_address(
+    seeds: Sequence[bytes], program_id: Pubkey
+) -> tuple[Pubkey, int]:
+    """
+    `Pubkey.find_program_address` behind a bounded LRU cache keyed on
+    (seeds, program_id). Every address helper in this module goes through it.
+    """
+    return _find_program_address(tuple(seeds), program_id)
+
+
+def get_pda_cache_info():
+    """
+    Returns the `functools` cache info (hits, misses, maxsize, currsize) of the
+    PDA cache.
+    """
+    return _find_program_address.cache_info()
+
+
+def clear_pda_cache():
+    _find_program_address.cache_clear()
+
+
+def warm_pda_cache(program_id: Pubkey, env: Optional[str] = None):
+    """
+    Derives the state, signer, market and market vault addresses of every market
+    in `driftpy.constants` for `env` ("devnet" or "mainnet", both if None), so the
+    first instructions built after startup don't pay for them.
+    """
+    from driftpy.constants.perp_markets import (
+        devnet_perp_market_configs,
+        mainnet_perp_market_configs,
+    )
+    from driftpy.constants.spot_markets import (
+        devnet_spot_market_configs,
+        mainnet_spot_market_configs,
+    )
+
+    perp_markets = []
+    spot_markets = []
+    if env in (None, "devnet"):
+        perp_markets += devnet_perp_market_configs
+        spot_markets += devnet_spot_market_configs
+    if env in (None, "mainnet"):
+        perp_markets += mainnet_perp_market_configs
+        spot_markets += mainnet_spot_market_configs
+
+    get_state_public_key(program_id)
+    get_drift_client_signer_public_key(program_id)
+    for perp_market in perp_markets:
+        get_perp_market_public_key(program_id, perp_market.market_index)
+    for spot_market in spot_markets:
+        get_spot_market_public_key(program_id, spot_market.market_index)
+        get_spot_market_vault_public_key(program_id, spot_market.market_index)
+        get_insurance_fund_vault_public_key(program_id, spot_market.market_index)
+
+
 def get_perp_market_public_key(
     program_id: Pubkey,
     market_index: int,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"perp_market", int_to_le_bytes(market_index)], program_id
     )[0]
 
@@ -18,7 +87,7 @@ def get_insurance_fund_vault_public_key(
     program_id: Pubkey,
     spot_market_index: int,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"insurance_fund_vault", int_to_le_bytes(spot_market_index)], program_id
     )[0]
 
@@ -28,7 +97,7 @@ def get_insurance_fund_stake_public_key(
     authority: Pubkey,
     spot_market_index: int,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"insurance_fund_stake", bytes(authority), int_to_le_bytes(spot_market_index)],
         program_id,
     )[0]
@@ -38,7 +107,7 @@ def get_spot_market_public_key(
     program_id: Pubkey,
     spot_market_index: int,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"spot_market", int_to_le_bytes(spot_market_index)], program_id
     )[0]
 
@@ -47,7 +116,7 @@ def get_spot_market_vault_public_key(
     program_id: Pubkey,
     spot_market_index: int,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"spot_market_vault", int_to_le_bytes(spot_market_index)], program_id
     )[0]
 
@@ -56,7 +125,7 @@ def get_spot_market_vault_authority_public_key(
     program_id: Pubkey,
     spot_market_index: int,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"spot_market_vault_authority", int_to_le_bytes(spot_market_index)], program_id
     )[0]
 
@@ -64,20 +133,20 @@ def get_spot_market_vault_authority_public_key(
 def get_state_public_key(
     program_id: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address([b"drift_state"], program_id)[0]
+    return find_program_address([b"drift_state"], program_id)[0]
 
 
 def get_drift_client_signer_public_key(
     program_id: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address([b"drift_signer"], program_id)[0]
+    return find_program_address([b"drift_signer"], program_id)[0]
 
 
 def get_user_stats_account_public_key(
     program_id: Pubkey,
     authority: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address([b"user_stats", bytes(authority)], program_id)[0]
+    return find_program_address([b"user_stats", bytes(authority)], program_id)[0]
 
 
 def get_user_account_public_key(
@@ -85,13 +154,13 @@ def get_user_account_public_key(
     authority: Pubkey,
     sub_account_id=0,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"user", bytes(authority), int_to_le_bytes(sub_account_id)], program_id
     )[0]
 
 
 def get_prelaunch_oracle_public_key(program_id: Pubkey, market_index: int) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"prelaunch_oracle", int_to_le_bytes(market_index)], program_id
     )[0]
 
@@ -100,9 +169,7 @@ def get_serum_open_orders_public_key(
     program_id: Pubkey,
     market: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
-        [b"serum_open_orders", bytes(market)], program_id
-    )[0]
+    return find_program_address([b"serum_open_orders", bytes(market)], program_id)[0]
 
 
 def get_serum_signer_public_key(
@@ -119,7 +186,7 @@ def get_serum_fulfillment_config_public_key(
     program_id: Pubkey,
     market: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"serum_fulfillment_config", bytes(market)], program_id
     )[0]
 
@@ -128,7 +195,7 @@ def get_phoenix_fulfillment_config_public_key(
     program_id: Pubkey,
     market: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [b"phoenix_fulfillment_config", bytes(market)], program_id
     )[0]
 
@@ -136,33 +203,31 @@ def get_phoenix_fulfillment_config_public_key(
 def get_sequencer_public_key_and_bump(
     program_id: Pubkey, payer: Pubkey, subaccount_id: int
 ) -> tuple[Pubkey, int]:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [(str(subaccount_id)).encode(), bytes(payer)], program_id
     )
 
 
 def get_high_leverage_mode_config_public_key(program_id: Pubkey) -> Pubkey:
-    return Pubkey.find_program_address([b"high_leverage_mode_config"], program_id)[0]
+    return find_program_address([b"high_leverage_mode_config"], program_id)[0]
 
 
 def get_protected_maker_mode_config_public_key(program_id: Pubkey) -> Pubkey:
-    return Pubkey.find_program_address([b"protected_maker_mode_config"], program_id)[0]
+    return find_program_address([b"protected_maker_mode_config"], program_id)[0]
 
 
 def get_rfq_user_account_public_key(
     program_id: Pubkey,
     user_account_public_key: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
-        [b"RFQ", bytes(user_account_public_key)], program_id
-    )[0]
+    return find_program_address([b"RFQ", bytes(user_account_public_key)], program_id)[0]
 
 
 def get_signed_msg_user_account_public_key(
     program_id: Pubkey,
     authority: Pubkey,
 ) -> Pubkey:
-    return Pubkey.find_program_address([b"SIGNED_MSG", bytes(authority)], program_id)[0]
+    return find_program_address([b"SIGNED_MSG", bytes(authority)], program_id)[0]
 
 
 def get_if_rebalance_config_public_key(
@@ -170,7 +235,7 @@ def get_if_rebalance_config_public_key(
     in_market_index: int,
     out_market_index: int,
 ) -> Pubkey:
-    return Pubkey.find_program_address(
+    return find_program_address(
         [
             b"if_rebalance_config",
             int_to_le_bytes(in_market_index),
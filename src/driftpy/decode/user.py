@@ -1,4 +1,6 @@
-from typing import List, Literal
+import struct
+from dataclasses import fields as dataclass_fields
+from typing import List, Literal, Optional, Union
 
 from solders.pubkey import Pubkey
 
@@ -40,39 +42,60 @@ def read_bigint64le(buffer, offset: Literal, signed: bool):
     return int.from_bytes(byte_slice, byteorder="little", signed=signed)
 
 
-def decode_user(buffer: bytes) -> UserAccount:
-    offset = 8
-    authority = Pubkey(buffer[offset : offset + 32])
-    offset += 32
-    delegate = Pubkey(buffer[offset : offset + 32])
-    offset += 32
-    name = [buffer[offset + i] for i in range(32)]
-    offset += 32
+# Precompiled layouts, offsets are relative to the start of each element
+SPOT_POSITION_STRUCT = struct.Struct("<Qqqq H B B 4x")
+PERP_POSITION_STRUCT = struct.Struct("<qqqqqqqq Q qq i H B B")
+ORDER_STRUCT = struct.Struct("<QQQQQQqqq i I H BBBBBB BBBB BBB x")
+USER_TAIL_STRUCT = struct.Struct("<qQQQqqqQQ II HH BBBBBBB BB 3s I 12s")
+
+SPOT_POSITIONS_OFFSET = 8 + 32 + 32 + 32
+PERP_POSITIONS_OFFSET = SPOT_POSITIONS_OFFSET + 8 * SPOT_POSITION_STRUCT.size
+ORDERS_OFFSET = PERP_POSITIONS_OFFSET + 8 * PERP_POSITION_STRUCT.size
+USER_TAIL_OFFSET = ORDERS_OFFSET + 32 * ORDER_STRUCT.size
+
+SPOT_BALANCE_TYPES = (SpotBalanceType.Deposit(), SpotBalanceType.Borrow())
+ORDER_TYPES = (
+    OrderType.Market(),
+    OrderType.Limit(),
+    OrderType.TriggerMarket(),
+    OrderType.TriggerLimit(),
+    OrderType.Oracle(),
+)
+MARKET_TYPES = (MarketType.Spot(), MarketType.Perp())
+POSITION_DIRECTIONS = (PositionDirection.Long(), PositionDirection.Short())
+ORDER_TRIGGER_CONDITIONS = (
+    OrderTriggerCondition.Above(),
+    OrderTriggerCondition.Below(),
+    OrderTriggerCondition.TriggeredAbove(),
+    OrderTriggerCondition.TriggeredBelow(),
+)
+MARGIN_MODES = (
+    MarginMode.Default(),
+    MarginMode.HighLeverage(),
+    MarginMode.HighLeverageMaintenance(),
+)
+ORDER_STATUS_OPEN = OrderStatus.Open()
 
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def decode_spot_positions(buffer: Buffer) -> List[SpotPosition]:
     spot_positions: List[SpotPosition] = []
-    for _ in range(8):
-        scaled_balance = read_bigint64le(buffer, offset, False)
-        open_orders = buffer[offset + 35]
+    unpack_from = SPOT_POSITION_STRUCT.unpack_from
+    for i in range(8):
+        (
+            scaled_balance,
+            open_bids,
+            open_asks,
+            cumulative_deposits,
+            market_index,
+            balance_type_num,
+            open_orders,
+        ) = unpack_from(buffer, SPOT_POSITIONS_OFFSET + i * 40)
+
         if scaled_balance == 0 and open_orders == 0:
-            offset += 40
             continue
 
-        offset += 8
-        open_bids = read_bigint64le(buffer, offset, True)
-        offset += 8
-        open_asks = read_bigint64le(buffer, offset, True)
-        offset += 8
-        cumulative_deposits = read_bigint64le(buffer, offset, True)
-        offset += 8
-        market_index = read_uint16_le(buffer, offset)
-        offset += 2
-        balance_type_num = read_uint8(buffer, offset)
-        balance_type = (
-            SpotBalanceType.Deposit()
-            if balance_type_num == 0
-            else SpotBalanceType.Borrow()
-        )
-        offset += 6
         spot_positions.append(
             SpotPosition(
                 scaled_balance,
@@ -80,191 +103,68 @@ def decode_user(buffer: bytes) -> UserAccount:
                 open_asks,
                 cumulative_deposits,
                 market_index,
-                balance_type,
+                SPOT_BALANCE_TYPES[0 if balance_type_num == 0 else 1],
                 open_orders,
                 [0, 0, 0, 0],
             )
         )
+    return spot_positions
+
 
+def decode_perp_positions(buffer: Buffer) -> List[PerpPosition]:
     perp_positions: List[PerpPosition] = []
-    for _ in range(8):
-        base_asset_amount = read_bigint64le(buffer, offset + 8, True)
-        quote_asset_amount = read_bigint64le(buffer, offset + 16, True)
-        lp_shares = read_bigint64le(buffer, offset + 64, False)
-        open_orders = buffer[offset + 94]
-
-        if (
-            base_asset_amount == 0
-            and open_orders == 0
-            and quote_asset_amount == 0
-            and lp_shares == 0
-        ):
-            offset += 96
+    unpack_from = PERP_POSITION_STRUCT.unpack_from
+    for i in range(8):
+        fields = unpack_from(buffer, PERP_POSITIONS_OFFSET + i * 96)
+
+        # base_asset_amount, quote_asset_amount, lp_shares and open_orders
+        if fields[1] == 0 and fields[13] == 0 and fields[2] == 0 and fields[8] == 0:
             continue
 
-        last_cumulative_funding_rate = read_bigint64le(buffer, offset, True)
-        offset += 24
-        quote_break_even_amount = read_bigint64le(buffer, offset, True)
-        offset += 8
-        quote_entry_amount = read_bigint64le(buffer, offset, True)
-        offset += 8
-        open_bids = read_bigint64le(buffer, offset, True)
-        offset += 8
-        open_asks = read_bigint64le(buffer, offset, True)
-        offset += 8
-        settled_pnl = read_bigint64le(buffer, offset, True)
-        offset += 16
-        last_base_asset_amount_per_lp = read_bigint64le(buffer, offset, True)
-        offset += 8
-        last_quote_asset_amount_per_lp = read_bigint64le(buffer, offset, True)
-        offset += 8
-        remainder_base_asset_amount = read_int32_le(buffer, offset, True)
-        offset += 4
-        market_index = read_uint16_le(buffer, offset)
-        offset += 3
-        per_lp_base = read_uint8(buffer, offset)
-        offset += 1
-
-        perp_positions.append(
-            PerpPosition(
-                last_cumulative_funding_rate,
-                base_asset_amount,
-                quote_asset_amount,
-                quote_break_even_amount,
-                quote_entry_amount,
-                open_bids,
-                open_asks,
-                settled_pnl,
-                lp_shares,
-                last_base_asset_amount_per_lp,
-                last_quote_asset_amount_per_lp,
-                remainder_base_asset_amount,
-                market_index,
-                open_orders,
-                per_lp_base,
-            )
-        )
+        perp_positions.append(PerpPosition(*fields))
+    return perp_positions
 
+
+def decode_orders(buffer: Buffer) -> List[Order]:
     orders: List[Order] = []
-    for _ in range(32):
+    unpack_from = ORDER_STRUCT.unpack_from
+    for i in range(32):
+        offset = ORDERS_OFFSET + i * 96
         # skip order if it's not open
-        if read_uint8(buffer, offset + 82) != 1:
-            offset += 96
+        if buffer[offset + 82] != 1:
             continue
 
-        slot = read_bigint64le(buffer, offset, False)
-        offset += 8
-
-        price = read_bigint64le(buffer, offset, False)
-        offset += 8
-
-        base_asset_amount = read_bigint64le(buffer, offset, False)
-        offset += 8
-
-        base_asset_amount_filled = read_bigint64le(buffer, offset, False)
-        offset += 8
-
-        quote_asset_amount_filled = read_bigint64le(buffer, offset, False)
-        offset += 8
-
-        trigger_price = read_bigint64le(buffer, offset, False)
-        offset += 8
-
-        auction_start_price = read_bigint64le(buffer, offset, True)
-        offset += 8
-
-        auction_end_price = read_bigint64le(buffer, offset, True)
-        offset += 8
-
-        max_ts = read_bigint64le(buffer, offset, True)
-        offset += 8
-
-        oracle_price_offset = read_int32_le(buffer, offset, True)
-        offset += 4
-
-        order_id = read_int32_le(buffer, offset, False)
-        offset += 4
-
-        market_index = read_uint16_le(buffer, offset)
-        offset += 2
-
-        order_status_num = read_uint8(buffer, offset)
-        status: OrderStatus = (
-            OrderStatus.Init() if order_status_num == 0 else OrderStatus.Open()
-        )
-        offset += 1
-
-        order_type_num = read_uint8(buffer, offset)
-        order_type: OrderType
-        if order_type_num == 0:
-            order_type = OrderType.Market()
-        elif order_type_num == 1:
-            order_type = OrderType.Limit()
-        elif order_type_num == 2:
-            order_type = OrderType.TriggerMarket()
-        elif order_type_num == 3:
-            order_type = OrderType.TriggerLimit()
-        elif order_type_num == 4:
-            order_type = OrderType.Oracle()
-        else:
+        (
+            slot,
+            price,
+            base_asset_amount,
+            base_asset_amount_filled,
+            quote_asset_amount_filled,
+            trigger_price,
+            auction_start_price,
+            auction_end_price,
+            max_ts,
+            oracle_price_offset,
+            order_id,
+            market_index,
+            _,
+            order_type_num,
+            market_type_num,
+            user_order_id,
+            existing_position_direction_num,
+            position_direction_num,
+            reduce_only,
+            post_only,
+            immediate_or_cancel,
+            trigger_condition_num,
+            auction_duration,
+            posted_slot_tail,
+            bit_flags,
+        ) = unpack_from(buffer, offset)
+
+        if order_type_num >= len(ORDER_TYPES):
             raise ValueError(f"Invalid order type: {order_type_num}")
 
-        offset += 1
-
-        market_type_num = read_uint8(buffer, offset)
-        market_type: MarketType = (
-            MarketType.Spot() if market_type_num == 0 else MarketType.Perp()
-        )
-        offset += 1
-
-        user_order_id = read_uint8(buffer, offset)
-        offset += 1
-
-        existing_position_direction_num = read_uint8(buffer, offset)
-        existing_position_direction: PositionDirection = (
-            PositionDirection.Long()
-            if existing_position_direction_num == 0
-            else PositionDirection.Short()
-        )
-        offset += 1
-
-        position_direction_num = read_uint8(buffer, offset)
-        direction: PositionDirection = (
-            PositionDirection.Long()
-            if position_direction_num == 0
-            else PositionDirection.Short()
-        )
-        offset += 1
-
-        reduce_only = read_uint8(buffer, offset) == 1
-        offset += 1
-
-        post_only = read_uint8(buffer, offset) == 1
-        offset += 1
-
-        immediate_or_cancel = read_uint8(buffer, offset) == 1
-        offset += 1
-
-        trigger_condition_num = read_uint8(buffer, offset)
-        trigger_condition: OrderTriggerCondition
-        if trigger_condition_num == 0:
-            trigger_condition = OrderTriggerCondition.Above()
-        elif trigger_condition_num == 1:
-            trigger_condition = OrderTriggerCondition.Below()
-        elif trigger_condition_num == 2:
-            trigger_condition = OrderTriggerCondition.TriggeredAbove()
-        elif trigger_condition_num == 3:
-            trigger_condition = OrderTriggerCondition.TriggeredBelow()
-        offset += 1
-
-        auction_duration = read_uint8(buffer, offset)
-        offset += 1
-        posted_slot_tail = read_uint8(buffer, offset)
-        offset += 1
-        bit_flags = read_uint8(buffer, offset)
-        offset += 1
-        offset += 1  # padding
-
         orders.append(
             Order(
                 slot=slot,
@@ -279,119 +179,32 @@ def decode_user(buffer: bytes) -> UserAccount:
                 oracle_price_offset=oracle_price_offset,
                 order_id=order_id,
                 market_index=market_index,
-                status=status,
-                order_type=order_type,
-                market_type=market_type,
+                status=ORDER_STATUS_OPEN,
+                order_type=ORDER_TYPES[order_type_num],
+                market_type=MARKET_TYPES[0 if market_type_num == 0 else 1],
                 user_order_id=user_order_id,
-                existing_position_direction=existing_position_direction,
-                direction=direction,
-                reduce_only=reduce_only,
-                post_only=post_only,
-                immediate_or_cancel=immediate_or_cancel,
-                trigger_condition=trigger_condition,
+                existing_position_direction=POSITION_DIRECTIONS[
+                    0 if existing_position_direction_num == 0 else 1
+                ],
+                direction=POSITION_DIRECTIONS[0 if position_direction_num == 0 else 1],
+                reduce_only=reduce_only == 1,
+                post_only=post_only == 1,
+                immediate_or_cancel=immediate_or_cancel == 1,
+                trigger_condition=ORDER_TRIGGER_CONDITIONS[trigger_condition_num],
                 auction_duration=auction_duration,
                 bit_flags=bit_flags,
                 posted_slot_tail=posted_slot_tail,
                 padding=[0],
             )
         )
+    return orders
 
-    last_add_perp_lp_shares_ts = read_bigint64le(buffer, offset, signed=True)
-    offset += 8
-
-    total_deposits = read_bigint64le(buffer, offset, signed=False)
-    offset += 8
-
-    total_withdraws = read_bigint64le(buffer, offset, signed=False)
-    offset += 8
-
-    total_social_loss = read_bigint64le(buffer, offset, signed=False)
-    offset += 8
-
-    settled_perp_pnl = read_bigint64le(buffer, offset, signed=True)
-    offset += 8
-
-    cumulative_spot_fees = read_bigint64le(buffer, offset, signed=True)
-    offset += 8
-
-    cumulative_perp_funding = read_bigint64le(buffer, offset, signed=True)
-    offset += 8
-
-    liquidation_margin_freed = read_bigint64le(buffer, offset, signed=False)
-    offset += 8
-
-    last_active_slot = read_bigint64le(buffer, offset, signed=False)
-    offset += 8
 
-    next_order_id = read_int32_le(buffer, offset, False)
-    offset += 4
-
-    max_margin_ratio = read_int32_le(buffer, offset, False)
-    offset += 4
-
-    next_liquidation_id = read_uint16_le(buffer, offset)
-    offset += 2
-
-    sub_account_id = read_uint16_le(buffer, offset)
-    offset += 2
-
-    status = read_uint8(buffer, offset)
-    offset += 1
-
-    is_margin_trading_enabled = read_uint8(buffer, offset) == 1
-    offset += 1
-
-    idle = read_uint8(buffer, offset) == 1
-    offset += 1
-
-    open_orders = read_uint8(buffer, offset)
-    offset += 1
-
-    has_open_order = read_uint8(buffer, offset) == 1
-    offset += 1
-
-    open_auctions = read_uint8(buffer, offset)
-    offset += 1
-
-    has_open_auction = read_uint8(buffer, offset) == 1
-    offset += 1
-
-    margin_mode: MarginMode
-    margin_mode_num = read_uint8(buffer, offset)
-    if margin_mode_num == 0:
-        margin_mode = MarginMode.Default()
-    elif margin_mode_num == 1:
-        margin_mode = MarginMode.HighLeverage()
-    elif margin_mode_num == 2:
-        margin_mode = MarginMode.HighLeverageMaintenance()
-    else:
-        print(
-            f"Warning: unknown margin mode: {margin_mode_num}, (user: {authority}) returning default"
-        )
-        margin_mode = MarginMode.Default()
-    offset += 1
-
-    pool_id = read_uint8(buffer, offset)
-    offset += 1
-
-    padding1_bytes = [buffer[offset + i] for i in range(3)]
-    offset += 3
-
-    last_fuel_bonus_update_ts = read_int32_le(buffer, offset, signed=False)
-    offset += 4
-
-    final_padding_bytes = [buffer[offset + i] for i in range(12)]
-    offset += 12
-
-    user_account_padding = padding1_bytes + final_padding_bytes
-
-    return UserAccount(
-        authority,
-        delegate,
-        name,
-        spot_positions,
-        perp_positions,
-        orders,
+def decode_user_fields(buffer: Buffer) -> dict:
+    """
+    Decodes every UserAccount field except the position and order arrays.
+    """
+    (
         last_add_perp_lp_shares_ts,
         total_deposits,
         total_withdraws,
@@ -412,8 +225,143 @@ def decode_user(buffer: bytes) -> UserAccount:
         has_open_order,
         open_auctions,
         has_open_auction,
-        margin_mode,
+        margin_mode_num,
         pool_id,
+        padding1_bytes,
         last_fuel_bonus_update_ts,
-        user_account_padding,
+        final_padding_bytes,
+    ) = USER_TAIL_STRUCT.unpack_from(buffer, USER_TAIL_OFFSET)
+
+    authority = Pubkey.from_bytes(bytes(buffer[8:40]))
+
+    if margin_mode_num < len(MARGIN_MODES):
+        margin_mode = MARGIN_MODES[margin_mode_num]
+    else:
+        print(
+            f"Warning: unknown margin mode: {margin_mode_num}, (user: {authority}) returning default"
+        )
+        margin_mode = MARGIN_MODES[0]
+
+    return dict(
+        authority=authority,
+        delegate=Pubkey.from_bytes(bytes(buffer[40:72])),
+        name=list(buffer[72:104]),
+        last_add_perp_lp_shares_ts=last_add_perp_lp_shares_ts,
+        total_deposits=total_deposits,
+        total_withdraws=total_withdraws,
+        total_social_loss=total_social_loss,
+        settled_perp_pnl=settled_perp_pnl,
+        cumulative_spot_fees=cumulative_spot_fees,
+        cumulative_perp_funding=cumulative_perp_funding,
+        liquidation_margin_freed=liquidation_margin_freed,
+        last_active_slot=last_active_slot,
+        next_order_id=next_order_id,
+        max_margin_ratio=max_margin_ratio,
+        next_liquidation_id=next_liquidation_id,
+        sub_account_id=sub_account_id,
+        status=status,
+        is_margin_trading_enabled=is_margin_trading_enabled == 1,
+        idle=idle == 1,
+        open_orders=open_orders,
+        has_open_order=has_open_order == 1,
+        open_auctions=open_auctions,
+        has_open_auction=has_open_auction == 1,
+        margin_mode=margin_mode,
+        pool_id=pool_id,
+        last_fuel_bonus_update_ts=last_fuel_bonus_update_ts,
+        padding=list(padding1_bytes) + list(final_padding_bytes),
     )
+
+
+def decode_user(buffer: Buffer) -> UserAccount:
+    return UserAccount(
+        spot_positions=decode_spot_positions(buffer),
+        perp_positions=decode_perp_positions(buffer),
+        orders=decode_orders(buffer),
+        **decode_user_fields(buffer),
+    )
+
+
+class LazyField:
+    """
+    Decodes a UserAccount array from the account buffer on first access and caches
+    it on the instance. Assigning to the field replaces the cached value.
+    """
+
+    def __init__(self, decode):
+        self.decode = decode
+
+    def __set_name__(self, owner, name):
+        self.attr = f"_lazy_{name}"
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return instance.__dict__[self.attr]
+        except KeyError:
+            value = instance.__dict__[self.attr] = self.decode(instance.buffer)
+            return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.attr] = value
+
+
+class LazyUserAccount(UserAccount):
+    """
+    UserAccount view that decodes from the source buffer on first access:
+    `spot_positions`, `perp_positions` and `orders` each on their own, every other
+    field at once through `decode_user_fields`. Keeps a reference to the buffer.
+
+    It compares equal to a UserAccount with the same fields, and
+    `dataclasses.replace` returns a LazyUserAccount with every field decoded.
+    It is not a UserAccount dataclass instance, e.g. for `dataclasses.asdict` or
+    pickling, and `to_user_account` decodes it into one where that is needed.
+    """
+
+    spot_positions = LazyField(decode_spot_positions)
+    perp_positions = LazyField(decode_perp_positions)
+    orders = LazyField(decode_orders)
+
+    def __init__(self, buffer: Optional[Buffer] = None, **fields):
+        # `dataclasses.replace` passes every field and no buffer
+        self.buffer = buffer
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        if not isinstance(other, UserAccount):
+            return NotImplemented
+        return all(
+            getattr(self, field.name) == getattr(other, field.name)
+            for field in dataclass_fields(UserAccount)
+        )
+
+    __hash__ = None
+
+    def to_user_account(self) -> UserAccount:
+        return UserAccount(
+            **{
+                field.name: getattr(self, field.name)
+                for field in dataclass_fields(UserAccount)
+            }
+        )
+
+    def __getattr__(self, name):
+        # only reached for fields that haven't been decoded or assigned yet
+        if name not in USER_FIELD_NAMES:
+            raise AttributeError(name)
+        for field, value in decode_user_fields(self.buffer).items():
+            self.__dict__.setdefault(field, value)
+        return self.__dict__[name]
+
+
+USER_FIELD_NAMES = frozenset(
+    field.name
+    for field in dataclass_fields(UserAccount)
+    if field.name not in vars(LazyUserAccount)
+)
+
+
+def decode_user_lazy(buffer: Buffer) -> UserAccount:
+    return LazyUserAccount(buffer)
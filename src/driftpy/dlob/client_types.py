@@ -23,3 +23,7 @@ class DLOBClientConfig:
     dlob_source: DLOBSource
     slot_source: SlotSource
     update_frequency: int
+    # True to cache L2/L3 books per market in `DLOBSubscriber`, sharing one book
+    # between callers until the DLOB version, slot or oracle price changes.
+    # Shared books must be copied before their levels are modified
+    cache_orderbooks: bool = False
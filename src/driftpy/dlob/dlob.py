@@ -1,5 +1,10 @@
-import copy
-from typing import Callable, Dict, Generator, List, Optional, Tuple, Union
+import dataclasses
+import functools
+import heapq
+from concurrent.futures import Executor
+from itertools import count
+from operator import itemgetter
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple, Union
 
 from solders.pubkey import Pubkey
 
@@ -11,14 +16,19 @@ from driftpy.constants.numeric_constants import (
 from driftpy.dlob.dlob_helpers import get_maker_rebate, get_node_lists
 from driftpy.dlob.dlob_node import (
     DLOBNode,
-    FloatingLimitOrderNode,
-    MarketOrderNode,
     RestingLimitOrderNode,
-    TakingLimitOrderNode,
     TriggerOrderNode,
     VAMMNode,
 )
-from driftpy.dlob.node_list import NodeList, get_vamm_node_generator
+from driftpy.dlob.node_list import (
+    NodeList,
+    NodeListBackend,
+    SortedNodeList,
+    create_node_list,
+    get_limit_price_key_generator,
+    get_order_signature,
+    get_vamm_node_generator,
+)
 from driftpy.dlob.orderbook_levels import (
     L2OrderBook,
     L2OrderBookGenerator,
@@ -26,13 +36,16 @@ from driftpy.dlob.orderbook_levels import (
     L3OrderBook,
     create_l2_levels,
     get_l2_generator_from_dlob_nodes,
+    get_l2_level_price,
+    get_negated_l2_level_price,
     merge_l2_level_generators,
 )
 from driftpy.math.auction import is_fallback_available_liquidity_source
 from driftpy.math.exchange_status import amm_paused, exchange_paused, fill_paused
 from driftpy.math.orders import (
     get_limit_price,
-    is_order_expired,
+    get_order_max_ts,
+    get_resting_limit_order_slot,
     is_resting_limit_order,
     is_taking_order,
     is_triggered,
@@ -55,31 +68,79 @@ from driftpy.types import (
 
 
 class MarketNodeLists:
-    def __init__(self):
+    def __init__(self, node_list_backend: NodeListBackend = "linked"):
         self.resting_limit = {
-            "ask": NodeList[RestingLimitOrderNode]("restingLimit", "asc"),
-            "bid": NodeList[RestingLimitOrderNode]("restingLimit", "desc"),
+            "ask": create_node_list(node_list_backend, "restingLimit", "asc"),
+            "bid": create_node_list(node_list_backend, "restingLimit", "desc"),
         }
         self.floating_limit = {
-            "ask": NodeList[FloatingLimitOrderNode]("floatingLimit", "asc"),
-            "bid": NodeList[FloatingLimitOrderNode]("floatingLimit", "desc"),
+            "ask": create_node_list(node_list_backend, "floatingLimit", "asc"),
+            "bid": create_node_list(node_list_backend, "floatingLimit", "desc"),
         }
         self.taking_limit = {
-            "ask": NodeList[TakingLimitOrderNode]("takingLimit", "asc"),
-            "bid": NodeList[TakingLimitOrderNode](
-                "takingLimit", "asc"
+            "ask": create_node_list(node_list_backend, "takingLimit", "asc"),
+            "bid": create_node_list(
+                node_list_backend, "takingLimit", "asc"
             ),  # always sort ascending for market orders
         }
         self.market = {
-            "ask": NodeList[MarketOrderNode]("market", "asc"),
-            "bid": NodeList[MarketOrderNode](
-                "market", "asc"
+            "ask": create_node_list(node_list_backend, "market", "asc"),
+            "bid": create_node_list(
+                node_list_backend, "market", "asc"
             ),  # always sort ascending for market orders
         }
         self.trigger = {
-            "above": NodeList[TriggerOrderNode]("trigger", "asc"),
-            "below": NodeList[TriggerOrderNode]("trigger", "desc"),
+            "above": create_node_list(node_list_backend, "trigger", "asc"),
+            "below": create_node_list(node_list_backend, "trigger", "desc"),
         }
+        # heap of (resting slot, sequence, side, order signature, node) of taking
+        # limit orders, popped when the slot reaches the end of their auction
+        self.auction_ends: List[tuple] = []
+        # heap of (max ts, sequence, side, order signature) of orders that can
+        # expire, popped into `expired` once the ts passes their max ts
+        self.expiries: List[tuple] = []
+        self.expired: Dict[str, Tuple[str, int]] = {}
+        # number of entries left in the heaps by their last compaction
+        self.compacted_heap_size = 0
+
+    def get_expirable_node(self, side: str, order_signature: str):
+        for node_list in (
+            self.taking_limit[side],
+            self.resting_limit[side],
+            self.floating_limit[side],
+            self.market[side],
+        ):
+            node = node_list.get(order_signature)
+            if node is not None:
+                return node
+        return None
+
+    def compact_heaps(self):
+        """
+        Called when an order is removed from the lists. Once the heaps have
+        doubled since they were last compacted, the entries of orders no longer
+        in the lists are dropped, so the heaps stay bounded under order churn.
+        """
+        if len(self.auction_ends) + len(self.expiries) <= 2 * self.compacted_heap_size:
+            return
+
+        self.auction_ends[:] = [
+            entry
+            for entry in self.auction_ends
+            if self.taking_limit[entry[2]].get(entry[3]) is entry[4]
+        ]
+        heapq.heapify(self.auction_ends)
+        # a modified order can be removed and inserted again with the same max ts,
+        # which leaves its entries alike
+        expiries = {}
+        for entry in self.expiries:
+            max_ts, _, side, order_signature = entry
+            node = self.get_expirable_node(side, order_signature)
+            if node is not None and get_order_max_ts(node.order, True) == max_ts:
+                expiries.setdefault((max_ts, order_signature), entry)
+        self.expiries[:] = expiries.values()
+        heapq.heapify(self.expiries)
+        self.compacted_heap_size = len(self.auction_ends) + len(self.expiries)
 
 
 OrderBookCallback = Callable[[], None]
@@ -92,6 +153,69 @@ OrderBookCallback = Callable[[], None]
 DLOBFilterFcn = Callable[[DLOBNode], bool]
 
 
+def get_order_slot(node: DLOBNode) -> int:
+    return node.order.slot
+
+
+def simulates_fills(method):
+    """
+    Runs a matching method as one fill simulation pass: matches are recorded in
+    `DLOB.simulated_fills` rather than written to the orders, and are dropped
+    once the outermost matching method returns. Nested matching methods share
+    the pass of their caller.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.simulated_fills is not None:
+            return method(self, *args, **kwargs)
+
+        self.simulated_fills = {}
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.simulated_fills = None
+
+    return wrapper
+
+
+class BufferedNodeGenerator:
+    """
+    Buffers the nodes of a generator so that one side of the book can be walked
+    from the top again for every node of the other side within a matching pass,
+    without merging its lists again. Nodes filled by the pass are skipped, and
+    the filled ones at the top are dropped from later walks.
+    """
+
+    def __init__(
+        self,
+        generator: Generator[DLOBNode, None, None],
+        is_base_filled: Callable[[DLOBNode], bool],
+    ):
+        self.generator = generator
+        self.is_base_filled = is_base_filled
+        self.nodes: List[DLOBNode] = []
+        self.start = 0
+
+    def __iter__(self) -> Generator[DLOBNode, None, None]:
+        nodes = self.nodes
+        is_base_filled = self.is_base_filled
+        while self.start < len(nodes) and is_base_filled(nodes[self.start]):
+            self.start += 1
+
+        index = self.start
+        while True:
+            if index == len(nodes):
+                node = next(self.generator, None)
+                if node is None:
+                    return
+                nodes.append(node)
+            node = nodes[index]
+            index += 1
+            if not is_base_filled(node):
+                yield node
+
+
 class NodeToFill:
     def __init__(self, node: DLOBNode, maker_nodes: List[DLOBNode]):
         self.node = node
@@ -103,6 +227,32 @@ class NodeToTrigger:
         self.node = node
 
 
+@dataclasses.dataclass
+class MarketToScan:
+    """
+    A market passed to the multi market `DLOB.find_nodes_to_fill_for_markets`
+    and `DLOB.find_nodes_to_trigger_for_markets`.
+    """
+
+    market_account: Union[PerpMarketAccount, SpotMarketAccount]
+    oracle_price_data: OraclePriceData
+    fallback_bid: Optional[int] = None
+    fallback_ask: Optional[int] = None
+
+    @property
+    def market_type(self) -> MarketType:
+        if isinstance(self.market_account, PerpMarketAccount):
+            return MarketType.Perp()
+        return MarketType.Spot()
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (
+            market_type_to_string(self.market_type),
+            self.market_account.market_index,
+        )
+
+
 SUPPORTED_ORDER_TYPES = [
     "Market",
     "Limit",
@@ -113,11 +263,24 @@ SUPPORTED_ORDER_TYPES = [
 
 
 class DLOB:
-    def __init__(self):
+    def __init__(self, node_list_backend: NodeListBackend = "linked"):
+        """
+        `node_list_backend` selects the NodeList implementation used for every
+        market: "linked" (default) walks a linked list on insert, "sorted" keeps
+        bisect-maintained arrays for O(log n) insert/remove on deep books.
+        """
+        self.node_list_backend: NodeListBackend = node_list_backend
         self.open_orders: Dict[str, set] = {}
         self.order_lists: Dict[str, Dict[int, MarketNodeLists]] = {}
         self.max_slot_for_resting_limit_orders = 0
         self.initialized = False
+        # bumped whenever the node lists change, so views of the book can be cached
+        self.version = 0
+        # breaks ties between entries of the auction end and expiry heaps
+        self.sequence = count()
+        # (user account, order id) -> base amount filled by the matching pass in
+        # progress, on top of the order's base_asset_amount_filled
+        self.simulated_fills: Optional[Dict[Tuple[Pubkey, int], int]] = None
         self.init()
 
     def init(self):
@@ -144,9 +307,13 @@ class DLOB:
         if market_type not in self.order_lists:
             self.order_lists[market_type] = {}
 
-        self.order_lists[market_type][market_index] = MarketNodeLists()
+        self.order_lists[market_type][market_index] = MarketNodeLists(
+            self.node_list_backend
+        )
 
-    def get_list_for_order(self, order: Order, slot: int) -> Optional[NodeList]:
+    def get_list_for_order(
+        self, order: Order, slot: int
+    ) -> Optional[Union[NodeList, SortedNodeList]]:
         is_inactive_trigger_order = must_be_triggered(order) and not is_triggered(order)
 
         if is_inactive_trigger_order:
@@ -156,7 +323,12 @@ class DLOB:
         elif order.oracle_price_offset != 0:
             node_type = "floating_limit"
         else:
-            is_resting = is_resting_limit_order(order, slot)
+            # taking limit orders are moved to the resting lists as the book's
+            # slot advances, so account updates from an older slot must look
+            # the order up as of the book's slot
+            is_resting = is_resting_limit_order(
+                order, max(slot, self.max_slot_for_resting_limit_orders)
+            )
             node_type = "resting_limit" if is_resting else "taking_limit"
 
         if is_inactive_trigger_order:
@@ -205,11 +377,47 @@ class DLOB:
                 get_order_signature(order.order_id, user_account)
             )
 
-        self.get_list_for_order(order, slot).insert(order, market_type, user_account)
+        node_list = self.get_list_for_order(order, slot)
+        node_list.insert(order, market_type, user_account)
+        self.index_order(node_list, order, user_account, market_type)
+        self.version += 1
 
         if on_insert is not None and callable(on_insert):
             on_insert()
 
+    def index_order(
+        self,
+        node_list: Union[NodeList, SortedNodeList],
+        order: Order,
+        user_account: Pubkey,
+        market_type: str,
+    ):
+        """
+        Records when an order inserted in `node_list` stops taking and when it
+        expires, so slot and ts advances only visit the orders that change.
+        Entries of orders that were removed since are skipped when popped, or
+        dropped by `MarketNodeLists.compact_heaps`.
+        """
+        node_lists = self.order_lists[market_type][order.market_index]
+        order_signature = get_order_signature(order.order_id, user_account)
+        side = "bid" if is_variant(order.direction, "Long") else "ask"
+
+        if node_list.node_type == "takingLimit":
+            resting_slot = get_resting_limit_order_slot(order)
+            node = node_list.get(order_signature)
+            if resting_slot is not None and node is not None:
+                heapq.heappush(
+                    node_lists.auction_ends,
+                    (resting_slot, next(self.sequence), side, order_signature, node),
+                )
+
+        max_ts = get_order_max_ts(order, True)
+        if max_ts is not None:
+            heapq.heappush(
+                node_lists.expiries,
+                (max_ts, next(self.sequence), side, order_signature),
+            )
+
     def get_order(self, order_id: int, user_account: Pubkey) -> Optional[Order]:
         from driftpy.dlob.node_list import get_order_signature
 
@@ -228,25 +436,24 @@ class DLOB:
             return
 
         for _, node_lists in self.order_lists[market_type_str].items():
+            auction_ends = node_lists.auction_ends
             nodes_to_update = []
 
-            for node in node_lists.taking_limit["ask"].get_generator():
-                if not is_resting_limit_order(node.order, slot):
-                    continue
-                nodes_to_update.append({"side": "ask", "node": node})
-
-            for node in node_lists.taking_limit["bid"].get_generator():
-                if not is_resting_limit_order(node.order, slot):
+            while auction_ends and auction_ends[0][0] <= slot:
+                _, sequence, side, order_signature, node = heapq.heappop(auction_ends)
+                if node_lists.taking_limit[side].get(order_signature) is not node:
                     continue
-                nodes_to_update.append({"side": "bid", "node": node})
+                # move asks then bids, each in taking limit list order
+                nodes_to_update.append(
+                    (side == "bid", node.order.slot, sequence, side, node)
+                )
 
-            for node_to_update in nodes_to_update:
-                side = node_to_update["side"]
-                node = node_to_update["node"]
+            for *_, side, node in sorted(nodes_to_update):
                 node_lists.taking_limit[side].remove(node.order, node.user_account)
                 node_lists.resting_limit[side].insert(
                     node.order, market_type_str, node.user_account
                 )
+                self.version += 1
 
     def update_resting_limit_orders(self, slot: int):
         if slot <= self.max_slot_for_resting_limit_orders:
@@ -274,11 +481,12 @@ class DLOB:
         if order.base_asset_amount_filled == cumulative_base_asset_amount_filled:
             return
 
-        new_order = copy.deepcopy(order)
-
-        new_order.base_asset_amount_filled = cumulative_base_asset_amount_filled
+        new_order = dataclasses.replace(
+            order, base_asset_amount_filled=cumulative_base_asset_amount_filled
+        )
 
         self.get_list_for_order(order, slot).update(new_order, user_account)
+        self.version += 1
 
         if on_update is not None and callable(on_update):
             on_update()
@@ -296,6 +504,9 @@ class DLOB:
         self.update_resting_limit_orders(slot)
 
         self.get_list_for_order(order, slot).remove(order, user_account)
+        market_type = market_type_to_string(order.market_type)
+        self.order_lists[market_type][order.market_index].compact_heaps()
+        self.version += 1
 
         if on_delete is not None and callable(on_delete):
             on_delete()
@@ -312,13 +523,20 @@ class DLOB:
                     market_index
                 )
 
-                for side in vars(node_lists).keys():
-                    for order_type in getattr(node_lists, side, {}).keys():
-                        getattr(node_lists, side)[order_type].clear()
+                for node_list_group in (
+                    node_lists.resting_limit,
+                    node_lists.floating_limit,
+                    node_lists.taking_limit,
+                    node_lists.market,
+                    node_lists.trigger,
+                ):
+                    for node_list in node_list_group.values():
+                        node_list.clear()
 
         self.order_lists.clear()
 
         self.max_slot_for_resting_limit_orders = 0
+        self.version += 1
 
         self.init()
 
@@ -348,22 +566,114 @@ class DLOB:
         )
         trigger_list.remove(order, user_account)
 
-        self.get_list_for_order(order, slot).insert(order, market_type, user_account)
+        node_list = self.get_list_for_order(order, slot)
+        node_list.insert(order, market_type, user_account)
+        self.index_order(node_list, order, user_account, market_type)
+        self.version += 1
 
         if on_trigger is not None and callable(on_trigger):
             on_trigger()
 
+    def update_user_orders(
+        self,
+        user_account: Pubkey,
+        old_orders: List[Order],
+        new_orders: List[Order],
+        slot: int,
+    ):
+        """
+        Patch the book with the difference between two snapshots of a user's orders,
+        only touching order ids that were added, removed, filled or modified.
+        """
+        old_open = {
+            order.order_id: order
+            for order in old_orders
+            if is_variant(order.status, "Open")
+        }
+        new_open = {
+            order.order_id: order
+            for order in new_orders
+            if is_variant(order.status, "Open")
+        }
+
+        for order_id, old_order in old_open.items():
+            if order_id not in new_open:
+                self.delete(old_order, user_account, slot)
+
+        for order_id, new_order in new_open.items():
+            old_order = old_open.get(order_id)
+            if old_order is None:
+                self.insert_order(new_order, user_account, slot)
+            elif old_order == new_order:
+                continue
+            elif old_order == dataclasses.replace(
+                new_order,
+                base_asset_amount_filled=old_order.base_asset_amount_filled,
+                quote_asset_amount_filled=old_order.quote_asset_amount_filled,
+            ):
+                self.update_order(
+                    old_order, user_account, slot, new_order.base_asset_amount_filled
+                )
+            else:
+                # price, trigger or auction changes can move the order between lists
+                self.delete(old_order, user_account, slot)
+                self.insert_order(new_order, user_account, slot)
+
     def handle_order_record(self, record: OrderRecord, slot: int):
         self.insert_order(record.order, record.user, slot)
 
+    def get_base_remaining(self, node: DLOBNode) -> int:
+        """
+        Base amount left on the node's order after the fills simulated so far in
+        the current matching pass.
+        """
+        order = node.order
+        remaining = order.base_asset_amount - order.base_asset_amount_filled
+        if self.simulated_fills:
+            remaining -= self.simulated_fills.get(
+                (node.user_account, order.order_id), 0
+            )
+        return remaining
+
+    def is_base_filled(self, node: DLOBNode) -> bool:
+        order = node.order
+        if order is None:
+            # vAMM nodes
+            return False
+        filled = order.base_asset_amount_filled
+        if self.simulated_fills:
+            filled += self.simulated_fills.get((node.user_account, order.order_id), 0)
+        return filled >= order.base_asset_amount
+
+    def simulate_fill(self, node: DLOBNode, base_filled: int):
+        key = (node.user_account, node.order.order_id)
+        self.simulated_fills[key] = self.simulated_fills.get(key, 0) + base_filled
+
     def _get_best_node(
         self,
         generator_list: List[Generator[DLOBNode, None, None]],
         oracle_price_data: OraclePriceData,
         slot: int,
-        compare_fcn: Callable[[DLOBNode, DLOBNode, int, OraclePriceData], bool],
+        compare_fcn: Optional[
+            Callable[[DLOBNode, DLOBNode, int, OraclePriceData], bool]
+        ] = None,
         filter_fcn: Optional[DLOBFilterFcn] = None,
+        key_fcn: Optional[Callable[[DLOBNode], Any]] = None,
     ) -> Generator[DLOBNode, None, None]:
+        """
+        Merges generators that are each sorted by `key_fcn` with a heap, the
+        earlier generator winning ties. Without a `key_fcn`, the generators'
+        heads are scanned for every node and the best is switched to the current
+        head whenever `compare_fcn(best, current, slot, oracle_price_data)`.
+        """
+        if key_fcn is not None:
+            for node in heapq.merge(*generator_list, key=key_fcn):
+                # Skip this node is it's already completely filled or fails filter function
+                if self.is_base_filled(node) or (filter_fcn and not filter_fcn(node)):
+                    continue
+                yield node
+            return
+
         generators = [
             {"next": next(generator, None), "generator": generator}
             for generator in generator_list
@@ -385,7 +695,7 @@ class DLOB:
 
             if best_generator and best_generator["next"]:
                 # Skip this node is it's already completely filled or fails filter function
-                if best_generator["next"].is_base_filled() or (
+                if self.is_base_filled(best_generator["next"]) or (
                     filter_fcn and not filter_fcn(best_generator["next"])
                 ):
                     best_generator["next"] = next(best_generator["generator"], None)
@@ -399,6 +709,21 @@ class DLOB:
             else:
                 side_exhausted = True
 
+    def _get_best_keyed_node(
+        self,
+        generator_list: List[Generator[Tuple[Any, DLOBNode], None, None]],
+        filter_fcn: Optional[DLOBFilterFcn] = None,
+    ) -> Generator[DLOBNode, None, None]:
+        """
+        Merges generators of `(key, node)` pairs that are each sorted by key, so
+        the key of every node is computed once, by the generator that yields it.
+        """
+        is_base_filled = self.is_base_filled
+        for _, node in heapq.merge(*generator_list, key=itemgetter(0)):
+            if is_base_filled(node) or (filter_fcn and not filter_fcn(node)):
+                continue
+            yield node
+
     def estimate_fill_with_exact_base_amount(
         self,
         market_index: int,
@@ -475,18 +800,21 @@ class DLOB:
             return
 
         generator_list = [
-            node_lists.resting_limit["ask"].get_generator(),
-            node_lists.floating_limit["ask"].get_generator(),
+            get_limit_price_key_generator(
+                node_lists.resting_limit["ask"].get_generator(),
+                0,
+                oracle_price_data,
+                slot,
+            ),
+            get_limit_price_key_generator(
+                node_lists.floating_limit["ask"].get_generator(),
+                oracle_price_data.price,
+                oracle_price_data,
+                slot,
+            ),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.get_price(
-                oracle_price_data, slot
-            ) < current_node.get_price(oracle_price_data, slot)
-
-        yield from self._get_best_node(
-            generator_list, oracle_price_data, slot, cmp, filter_fcn
-        )
+        yield from self._get_best_keyed_node(generator_list, filter_fcn)
 
     def get_resting_limit_bids(
         self,
@@ -508,18 +836,23 @@ class DLOB:
             return
 
         generator_list = [
-            node_lists.resting_limit["bid"].get_generator(),
-            node_lists.floating_limit["bid"].get_generator(),
+            get_limit_price_key_generator(
+                node_lists.resting_limit["bid"].get_generator(),
+                0,
+                oracle_price_data,
+                slot,
+                -1,
+            ),
+            get_limit_price_key_generator(
+                node_lists.floating_limit["bid"].get_generator(),
+                oracle_price_data.price,
+                oracle_price_data,
+                slot,
+                -1,
+            ),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.get_price(
-                oracle_price_data, slot
-            ) > current_node.get_price(oracle_price_data, slot)
-
-        yield from self._get_best_node(
-            generator_list, oracle_price_data, slot, cmp, filter_fcn
-        )
+        yield from self._get_best_keyed_node(generator_list, filter_fcn)
 
     def get_best_ask(
         self,
@@ -567,14 +900,8 @@ class DLOB:
             order_lists.taking_limit["bid"].get_generator(),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.order.slot > current_node.order.slot
-
         yield from self._get_best_node(
-            generator_list,
-            oracle_price_data,
-            slot,
-            cmp,
+            generator_list, oracle_price_data, slot, key_fcn=get_order_slot
         )
 
     def get_taking_asks(
@@ -597,10 +924,9 @@ class DLOB:
             order_lists.taking_limit["ask"].get_generator(),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.order.slot > current_node.order.slot
-
-        yield from self._get_best_node(generator_list, oracle_price_data, slot, cmp)
+        yield from self._get_best_node(
+            generator_list, oracle_price_data, slot, key_fcn=get_order_slot
+        )
 
     def get_asks(
         self,
@@ -719,6 +1045,7 @@ class DLOB:
 
         return nodes_to_fill
 
+    @simulates_fills
     def find_taking_nodes_crossing_maker_nodes(
         self,
         market_index: int,
@@ -733,12 +1060,13 @@ class DLOB:
     ) -> List[NodeToFill]:
         nodes_to_fill: List[NodeToFill] = []
 
-        for taker_node in taker_node_generator:
-            maker_node_generator = maker_node_generator_fn(
-                market_index, slot, market_type, oracle_price_data
-            )
+        maker_nodes = BufferedNodeGenerator(
+            maker_node_generator_fn(market_index, slot, market_type, oracle_price_data),
+            self.is_base_filled,
+        )
 
-            for maker_node in maker_node_generator:
+        for taker_node in taker_node_generator:
+            for maker_node in maker_nodes:
                 # Check if nodes are from the same user
                 if taker_node.user_account == maker_node.user_account:
                     continue
@@ -751,36 +1079,16 @@ class DLOB:
 
                 nodes_to_fill.append(NodeToFill(taker_node, [maker_node]))
 
-                # Update orders
-                maker_base_remaining = (
-                    maker_node.order.base_asset_amount
-                    - maker_node.order.base_asset_amount_filled
-                )
-                taker_base_remaining = (
-                    taker_node.order.base_asset_amount
-                    - taker_node.order.base_asset_amount_filled
-                )
+                # Simulate the fill
+                maker_base_remaining = self.get_base_remaining(maker_node)
+                taker_base_remaining = self.get_base_remaining(taker_node)
 
                 base_filled = min(maker_base_remaining, taker_base_remaining)
 
-                new_maker_order = copy.deepcopy(maker_node.order)
-                new_maker_order.base_asset_amount_filled += base_filled
+                self.simulate_fill(maker_node, base_filled)
+                self.simulate_fill(taker_node, base_filled)
 
-                self.get_list_for_order(new_maker_order, slot).update(
-                    new_maker_order, maker_node.user_account
-                )
-
-                new_taker_order = copy.deepcopy(taker_node.order)
-                new_taker_order.base_asset_amount_filled += base_filled
-
-                self.get_list_for_order(new_taker_order, slot).update(
-                    new_taker_order, taker_node.user_account
-                )
-
-                if (
-                    new_taker_order.base_asset_amount_filled
-                    == taker_node.order.base_asset_amount
-                ):
+                if base_filled == taker_base_remaining:
                     break
 
         return nodes_to_fill
@@ -806,6 +1114,7 @@ class DLOB:
 
         return nodes_to_fill
 
+    @simulates_fills
     def find_taking_nodes_to_fill(
         self,
         market_index: int,
@@ -929,6 +1238,7 @@ class DLOB:
         else:
             return (ask, bid)
 
+    @simulates_fills
     def find_crossing_resting_limit_orders(
         self,
         market_index: int,
@@ -938,14 +1248,18 @@ class DLOB:
     ) -> List[NodeToFill]:
         nodes_to_fill: List[NodeToFill] = []
 
-        for ask in self.get_resting_limit_asks(
+        ask_generator = self.get_resting_limit_asks(
             market_index, slot, market_type, oracle_price_data
-        ):
-            bid_generator = self.get_resting_limit_bids(
+        )
+        bids = BufferedNodeGenerator(
+            self.get_resting_limit_bids(
                 market_index, slot, market_type, oracle_price_data
-            )
+            ),
+            self.is_base_filled,
+        )
 
-            for bid in bid_generator:
+        for ask in ask_generator:
+            for bid in bids:
                 bid_price = bid.get_price(oracle_price_data, slot)
                 ask_price = ask.get_price(oracle_price_data, slot)
 
@@ -953,9 +1267,6 @@ class DLOB:
                 if bid_price < ask_price:
                     break
 
-                bid_order = bid.order
-                ask_order = ask.order
-
                 # can't match from same user
                 if bid.user_account == ask.user_account:
                     break
@@ -968,30 +1279,22 @@ class DLOB:
 
                 taker, maker = maker_and_taker
 
-                bid_base_remaining = (
-                    bid_order.base_asset_amount - bid_order.base_asset_amount_filled
-                )
-                ask_base_remaining = (
-                    ask_order.base_asset_amount - ask_order.base_asset_amount_filled
-                )
+                bid_base_remaining = self.get_base_remaining(bid)
+                ask_base_remaining = self.get_base_remaining(ask)
 
                 base_filled = min(bid_base_remaining, ask_base_remaining)
 
-                new_bid = copy.deepcopy(bid_order)
-                new_bid.base_asset_amount_filled += base_filled
-                self.get_list_for_order(new_bid, slot).update(new_bid, bid.user_account)
-
-                new_ask = copy.deepcopy(ask_order)
-                new_ask.base_asset_amount_filled += base_filled
-                self.get_list_for_order(new_ask, slot).update(new_ask, ask.user_account)
+                self.simulate_fill(bid, base_filled)
+                self.simulate_fill(ask, base_filled)
 
                 nodes_to_fill.append(NodeToFill(taker, [maker]))
 
-                if new_ask.base_asset_amount == new_ask.base_asset_amount_filled:
+                if base_filled == ask_base_remaining:
                     break
 
         return nodes_to_fill
 
+    @simulates_fills
     def find_resting_limit_order_nodes_to_fill(
         self,
         market_index: int,
@@ -1069,30 +1372,29 @@ class DLOB:
         if node_lists is None:
             return nodes_to_fill
 
-        bid_generators = [
-            node_lists.taking_limit["bid"].get_generator(),
-            node_lists.resting_limit["bid"].get_generator(),
-            node_lists.floating_limit["bid"].get_generator(),
-            node_lists.market["bid"].get_generator(),
-        ]
-        ask_generators = [
-            node_lists.taking_limit["ask"].get_generator(),
-            node_lists.resting_limit["ask"].get_generator(),
-            node_lists.floating_limit["ask"].get_generator(),
-            node_lists.market["ask"].get_generator(),
-        ]
-
-        for bid_generator in bid_generators:
-            for bid in bid_generator:
-                if is_order_expired(bid.order, ts, True):
-                    nodes_to_fill.append(NodeToFill(bid, []))
-
-        for ask_generator in ask_generators:
-            for ask in ask_generator:
-                if is_order_expired(ask.order, ts, True):
-                    nodes_to_fill.append(NodeToFill(ask, []))
+        expiries = node_lists.expiries
+        expired = node_lists.expired
+
+        while expiries and expiries[0][0] < ts:
+            max_ts, _, side, order_signature = heapq.heappop(expiries)
+            node = node_lists.get_expirable_node(side, order_signature)
+            if node is not None and get_order_max_ts(node.order, True) == max_ts:
+                expired[order_signature] = (side, max_ts)
+
+        # expired orders stay in the book until they are cancelled, so they are
+        # kept in `expired` until they are no longer found in the lists
+        asks_to_fill = []
+        for order_signature, (side, max_ts) in list(expired.items()):
+            node = node_lists.get_expirable_node(side, order_signature)
+            if node is None or get_order_max_ts(node.order, True) != max_ts:
+                del expired[order_signature]
+            elif ts > max_ts:
+                if side == "bid":
+                    nodes_to_fill.append(NodeToFill(node, []))
+                else:
+                    asks_to_fill.append(NodeToFill(node, []))
 
-        return nodes_to_fill
+        return nodes_to_fill + asks_to_fill
 
     def merge_nodes_to_fill(
         self,
@@ -1130,6 +1432,7 @@ class DLOB:
 
         return nodes_to_fill
 
+    @simulates_fills
     def find_nodes_to_fill(
         self,
         market_index: int,
@@ -1200,6 +1503,85 @@ class DLOB:
             + expired_nodes_to_fill
         )
 
+    @simulates_fills
+    def find_nodes_to_fill_for_markets(
+        self,
+        markets: List[MarketToScan],
+        slot: int,
+        ts: int,
+        state_account: StateAccount,
+        executor: Optional[Executor] = None,
+    ) -> Dict[Tuple[str, int], List[NodeToFill]]:
+        """
+        Runs `find_nodes_to_fill` for every market as one matching pass and
+        returns the nodes to fill keyed by (market type, market index).
+
+        Resting limit orders are updated for `slot` once for all markets, and
+        markets without orders are skipped. Pass a thread pool `executor` to
+        scan the markets concurrently; the DLOB can't be shared with a process
+        pool.
+        """
+        self.update_resting_limit_orders(slot)
+
+        nodes_to_fill: Dict[Tuple[str, int], List[NodeToFill]] = {}
+        markets_to_scan = []
+        for market in markets:
+            market_type_str, market_index = market.key
+            nodes_to_fill[market.key] = []
+            if market_index in self.order_lists.get(market_type_str, {}):
+                markets_to_scan.append(market)
+
+        def find(market: MarketToScan) -> List[NodeToFill]:
+            return self.find_nodes_to_fill(
+                market.market_account.market_index,
+                slot,
+                ts,
+                market.market_type,
+                market.oracle_price_data,
+                state_account,
+                market.market_account,
+                market.fallback_bid,
+                market.fallback_ask,
+            )
+
+        if executor is None:
+            results = map(find, markets_to_scan)
+        else:
+            results = executor.map(find, markets_to_scan)
+
+        for market, market_nodes_to_fill in zip(markets_to_scan, results):
+            nodes_to_fill[market.key] = market_nodes_to_fill
+
+        return nodes_to_fill
+
+    def find_nodes_to_trigger_for_markets(
+        self,
+        markets: List[MarketToScan],
+        state_account: StateAccount,
+    ) -> Dict[Tuple[str, int], List[NodeToTrigger]]:
+        """
+        Runs `find_nodes_to_trigger` for every market at its oracle price and
+        returns the nodes to trigger keyed by (market type, market index).
+        """
+        nodes_to_trigger: Dict[Tuple[str, int], List[NodeToTrigger]] = {
+            market.key: [] for market in markets
+        }
+        if exchange_paused(state_account):
+            return nodes_to_trigger
+
+        for market in markets:
+            market_type_str, market_index = market.key
+            if market_index not in self.order_lists.get(market_type_str, {}):
+                continue
+            nodes_to_trigger[market.key] = self.find_nodes_to_trigger(
+                market_index,
+                market.oracle_price_data.price,
+                market.market_type,
+                state_account,
+            )
+
+        return nodes_to_trigger
+
     def find_nodes_to_trigger(
         self,
         market_index: int,
@@ -1217,20 +1599,16 @@ class DLOB:
         trigger_above_list = market_node_lists.trigger["above"] or None  # type: ignore
 
         if trigger_above_list:
-            for node in trigger_above_list.get_generator():
-                if oracle_price > node.order.trigger_price:
-                    nodes_to_trigger.append(NodeToTrigger(node))
-                else:
-                    break
+            # sorted by ascending trigger price
+            for node in trigger_above_list.get_nodes_sorted_before(oracle_price):
+                nodes_to_trigger.append(NodeToTrigger(node))
 
         trigger_below_list = market_node_lists.trigger["below"] or None  # type: ignore
 
         if trigger_below_list:
-            for node in trigger_below_list.get_generator():
-                if oracle_price < node.order.trigger_price:
-                    nodes_to_trigger.append(NodeToTrigger(node))
-                else:
-                    break
+            # sorted by descending trigger price
+            for node in trigger_below_list.get_nodes_sorted_before(oracle_price):
+                nodes_to_trigger.append(NodeToTrigger(node))
 
         return nodes_to_trigger
 
@@ -1262,7 +1640,7 @@ class DLOB:
 
         ask_l2_level_generator = merge_l2_level_generators(
             [maker_ask_l2_level_generator] + fallback_ask_generators,
-            lambda a, b: a.price < b.price,
+            key=get_l2_level_price,
         )
 
         asks = create_l2_levels(ask_l2_level_generator, depth)
@@ -1282,7 +1660,7 @@ class DLOB:
 
         bid_l2_level_generator = merge_l2_level_generators(
             [maker_bid_l2_level_generator] + fallback_bid_generators,
-            lambda a, b: a.price > b.price,
+            key=get_negated_l2_level_price,
         )
 
         bids = create_l2_levels(bid_l2_level_generator, depth)
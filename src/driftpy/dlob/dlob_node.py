@@ -7,6 +7,18 @@ from driftpy.math.orders import get_limit_price
 from driftpy.types import OraclePriceData, Order, is_variant
 
 
+def get_auction_end_slot(order: Order) -> int:
+    """
+    Last slot at which `get_limit_price` prices the order off its auction, -1 if
+    it has none.
+    """
+    if order.auction_duration != 0 and (
+        order.auction_start_price != 0 or order.auction_end_price != 0
+    ):
+        return order.slot + order.auction_duration
+    return -1
+
+
 class DLOBNode(ABC):
     @abstractmethod
     def get_price(self, oracle_price_data: OraclePriceData, slot: int) -> int:
@@ -41,9 +53,15 @@ class OrderNode(DLOBNode):
         self.order = order
         self.user_account = user_account
         self.sort_value = self.get_sort_value(order)
+        self.auction_end_slot = get_auction_end_slot(order)
         self.have_filled = False
         self.have_trigger = False
 
+    def update_order(self, order: Order):
+        self.order = order
+        self.auction_end_slot = get_auction_end_slot(order)
+        self.have_filled = False
+
     @abstractmethod
     def get_sort_value(self, order: Order):
         pass
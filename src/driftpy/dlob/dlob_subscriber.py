@@ -1,7 +1,8 @@
 import asyncio
 import json
 import traceback
-from typing import Optional
+from operator import itemgetter
+from typing import Any, AsyncGenerator, Dict, Hashable, List, Optional, Tuple, Union
 import aiohttp
 from events import Events as EventEmitter
 from dataclasses import dataclass
@@ -13,14 +14,27 @@ from driftpy.dlob.orderbook_levels import (
     L3OrderBook,
     L2Level,
     L2OrderBook,
+    L2OrderBookDiff,
     L2OrderBookGenerator,
+    diff_l2_orderbooks,
     get_vamm_l2_generator,
 )
 from driftpy.types import (
     MarketType,
+    OraclePriceData,
     is_variant,
+    market_type_to_string,
 )
 
+try:
+    # optional, faster decoding of DLOB server responses
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+get_l2_level_fields = itemgetter("price", "size", "sources")
+get_l3_level_fields = itemgetter("price", "size", "maker", "orderId")
+
 
 @dataclass
 class MarketId:
@@ -28,8 +42,38 @@ class MarketId:
     kind: MarketType
 
 
+@dataclass
+class CachedOrderBook:
+    dlob: Any
+    dlob_version: int
+    slot: int
+    oracle_price_data: OraclePriceData
+    # the perp market account the vAMM levels were generated from, if any
+    perp_market: Any
+    orderbook: Any
+
+    def is_valid(
+        self,
+        dlob,
+        slot: int,
+        oracle_price_data: OraclePriceData,
+        perp_market=None,
+    ) -> bool:
+        return (
+            self.dlob is dlob
+            and self.dlob_version == dlob.version
+            and self.slot == slot
+            and self.perp_market is perp_market
+            and self.oracle_price_data == oracle_price_data
+        )
+
+
 class DLOBSubscriber:
     _session: Optional[aiohttp.ClientSession] = None
+    # pool of the shared session, kept open between polls of the DLOB server
+    connection_limit: int = 100
+    connection_keepalive_s: float = 30
+    request_timeout_s: float = 10
 
     def __init__(
         self,
@@ -41,6 +85,12 @@ class DLOBSubscriber:
         if url:
             self.url = url.rstrip("/")
         self.dlob = None
+        self.cache_orderbooks = False
+        self.orderbook_cache: Dict[Hashable, CachedOrderBook] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # last book fetched from the DLOB server per endpoint, with its ETag
+        self.fetched_orderbooks: Dict[str, Tuple[Optional[str], Any]] = {}
         self.event_emitter = EventEmitter(("on_dlob_update"))
         self.event_emitter.on("on_dlob_update")
         if config is not None:
@@ -48,6 +98,7 @@ class DLOBSubscriber:
             self.dlob_source = config.dlob_source
             self.slot_source = config.slot_source
             self.update_frequency = config.update_frequency
+            self.cache_orderbooks = config.cache_orderbooks
             self.interval_task = None
 
     async def on_dlob_update(self):
@@ -88,10 +139,62 @@ class DLOBSubscriber:
     def get_dlob(self):
         return self.dlob
 
+    def get_cached_orderbook(
+        self,
+        key: Hashable,
+        slot: int,
+        oracle_price_data: OraclePriceData,
+        perp_market=None,
+    ):
+        cached = self.orderbook_cache.get(key)
+        if cached is not None and cached.is_valid(
+            self.dlob, slot, oracle_price_data, perp_market
+        ):
+            self.cache_hits += 1
+            return cached.orderbook
+        self.cache_misses += 1
+        return None
+
+    def cache_orderbook(
+        self,
+        key: Hashable,
+        slot: int,
+        oracle_price_data: OraclePriceData,
+        orderbook,
+        perp_market=None,
+    ):
+        self.orderbook_cache[key] = CachedOrderBook(
+            self.dlob,
+            self.dlob.version,
+            slot,
+            oracle_price_data,
+            perp_market,
+            orderbook,
+        )
+        return orderbook
+
+    def get_cache_stats(self) -> Dict[str, float]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+        }
+
+    def clear_orderbook_cache(self):
+        self.orderbook_cache.clear()
+
     @classmethod
     async def get_session(cls):
         if cls._session is None or cls._session.closed:
-            cls._session = aiohttp.ClientSession()
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=cls.connection_limit,
+                    keepalive_timeout=cls.connection_keepalive_s,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=cls.request_timeout_s),
+            )
         return cls._session
 
     @classmethod
@@ -100,87 +203,213 @@ class DLOBSubscriber:
             await cls._session.close()
             cls._session = None
 
-    async def get_l2_orderbook(self, market: MarketId) -> L2OrderBook:
+    async def fetch_orderbook(
+        self, endpoint: str, market: MarketId, parse, skip_unchanged: bool = False
+    ):
+        """
+        With `skip_unchanged`, the book fetched last from the same endpoint is
+        returned as is when the server answers 304 to its ETag, or when the
+        response is for the same slot, without building its levels again.
+        """
         session = await self.get_session()
         market_type = "perp" if is_variant(market.kind, "Perp") else "spot"
-        async with session.get(
-            f"{self.url}/l2?marketType={market_type}&marketIndex={market.index}"
-        ) as response:
-            if response.status == 200:
-                data = await response.text()
-                return self.decode_l2_orderbook(data)
-            else:
-                raise Exception("Failed to fetch L2 OrderBook data")
-
-    def decode_l2_orderbook(self, data: str) -> L2OrderBook:
-        data = json.loads(data)
+        url = (
+            f"{self.url}/{endpoint}?marketType={market_type}&marketIndex={market.index}"
+        )
+        etag, previous_orderbook = self.fetched_orderbooks.get(url, (None, None))
+        headers = (
+            {"If-None-Match": etag} if skip_unchanged and etag is not None else None
+        )
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and previous_orderbook is not None:
+                return previous_orderbook
+            if response.status != 200:
+                raise Exception(f"Failed to fetch {endpoint.upper()} OrderBook data")
+            data = json_loads(await response.read())
+            etag = response.headers.get("ETag")
+
+        if (
+            skip_unchanged
+            and previous_orderbook is not None
+            and data.get("slot") is not None
+            and data.get("slot") == previous_orderbook.slot
+        ):
+            orderbook = previous_orderbook
+        else:
+            orderbook = parse(data)
+        self.fetched_orderbooks[url] = (etag, orderbook)
+        return orderbook
 
-        asks = [
-            L2Level(ask["price"], ask["size"], ask["sources"]) for ask in data["asks"]
-        ]
-        bids = [
-            L2Level(bid["price"], bid["size"], bid["sources"]) for bid in data["bids"]
-        ]
+    async def get_l2_orderbook(
+        self, market: MarketId, skip_unchanged: bool = False
+    ) -> L2OrderBook:
+        return await self.fetch_orderbook(
+            "l2", market, self.parse_l2_orderbook, skip_unchanged
+        )
+
+    async def get_l2_orderbooks(
+        self, markets: List[MarketId], skip_unchanged: bool = False
+    ) -> List[L2OrderBook]:
+        """
+        Fetches the books of all `markets` concurrently, over at most
+        `connection_limit` connections, in the order of `markets`.
+        """
+        return await asyncio.gather(
+            *(self.get_l2_orderbook(market, skip_unchanged) for market in markets)
+        )
+
+    def decode_l2_orderbook(self, data: Union[str, bytes]) -> L2OrderBook:
+        return self.parse_l2_orderbook(json_loads(data))
+
+    def parse_l2_orderbook(self, data: Dict[str, Any]) -> L2OrderBook:
+        asks = [L2Level(*get_l2_level_fields(ask)) for ask in data["asks"]]
+        bids = [L2Level(*get_l2_level_fields(bid)) for bid in data["bids"]]
         slot = data.get("slot")
 
         return L2OrderBook(asks, bids, slot)
 
-    async def get_l3_orderbook(self, market: MarketId) -> L3OrderBook:
-        session = await self.get_session()
-        market_type = "perp" if is_variant(market.kind, "Perp") else "spot"
-        async with session.get(
-            f"{self.url}/l3?marketType={market_type}&marketIndex={market.index}"
-        ) as response:
-            if response.status == 200:
-                data = await response.text()
-                return self.decode_l3_orderbook(data)
-            else:
-                raise Exception("Failed to fetch L3 OrderBook data")
-
-    def decode_l3_orderbook(self, data: str) -> L3OrderBook:
-        data = json.loads(data)
+    async def get_l3_orderbook(
+        self, market: MarketId, skip_unchanged: bool = False
+    ) -> L3OrderBook:
+        return await self.fetch_orderbook(
+            "l3", market, self.parse_l3_orderbook, skip_unchanged
+        )
 
+    def decode_l3_orderbook(self, data: Union[str, bytes]) -> L3OrderBook:
+        return self.parse_l3_orderbook(json_loads(data))
+
+    def parse_l3_orderbook(self, data: Dict[str, Any]) -> L3OrderBook:
         asks = [
-            L3Level(
-                ask["price"],
-                ask["size"],
-                Pubkey.from_string(ask["maker"]),
-                ask["orderId"],
-            )
-            for ask in data["asks"]
+            L3Level(price, size, Pubkey.from_string(maker), order_id)
+            for price, size, maker, order_id in map(get_l3_level_fields, data["asks"])
         ]
         bids = [
-            L3Level(
-                bid["price"],
-                bid["size"],
-                Pubkey.from_string(bid["maker"]),
-                bid["orderId"],
-            )
-            for bid in data["bids"]
+            L3Level(price, size, Pubkey.from_string(maker), order_id)
+            for price, size, maker, order_id in map(get_l3_level_fields, data["bids"])
         ]
         slot = data.get("slot")
 
         return L3OrderBook(asks, bids, slot)
 
-    async def subscribe_l2_book(self, market: MarketId, interval_s: int = 1):
+    async def poll_orderbook(
+        self,
+        get_orderbook,
+        name: str,
+        interval_s: float,
+        skip_unchanged: bool,
+        max_retries: Optional[int],
+        max_backoff_s: float,
+        min_backoff_s: float,
+    ):
+        previous_orderbook = None
+        retries = 0
         while True:
             try:
-                orderbook = await self.get_l2_orderbook(market)
-                yield orderbook
-                await asyncio.sleep(interval_s)
+                orderbook = await get_orderbook(skip_unchanged)
             except Exception as e:
-                print(f"Error fetching L2 OrderBook: {e}")
-                break
-
-    async def subscribe_l3_book(self, market: MarketId, interval_s: int = 1):
-        while True:
-            try:
-                orderbook = await self.get_l3_orderbook(market)
+                retries += 1
+                if max_retries is not None and retries > max_retries:
+                    print(f"Error fetching {name} OrderBook: {e}")
+                    break
+                # not off interval_s, which can be 0
+                backoff_s = min(min_backoff_s * 2 ** (retries - 1), max_backoff_s)
+                print(f"Error fetching {name} OrderBook: {e}, retrying in {backoff_s}s")
+                await asyncio.sleep(backoff_s)
+                continue
+
+            retries = 0
+            if orderbook is not previous_orderbook:
+                previous_orderbook = orderbook
                 yield orderbook
-                await asyncio.sleep(interval_s)
-            except Exception as e:
-                print(f"Error fetching L3 OrderBook: {e}")
-                break
+            await asyncio.sleep(interval_s)
+
+    async def subscribe_l2_book(
+        self,
+        market: MarketId,
+        interval_s: float = 1,
+        skip_unchanged: bool = False,
+        max_retries: Optional[int] = None,
+        max_backoff_s: float = 30,
+        min_backoff_s: float = 1,
+    ):
+        """
+        Polls the market's L2 book every `interval_s`. Failed fetches are
+        retried with exponential backoff, from `min_backoff_s` up to
+        `max_backoff_s`, and up to `max_retries` in a row if set.
+        With `skip_unchanged`, only books for a new slot are yielded.
+        """
+        async for orderbook in self.poll_orderbook(
+            lambda skip_unchanged: self.get_l2_orderbook(market, skip_unchanged),
+            "L2",
+            interval_s,
+            skip_unchanged,
+            max_retries,
+            max_backoff_s,
+            min_backoff_s,
+        ):
+            yield orderbook
+
+    async def subscribe_l3_book(
+        self,
+        market: MarketId,
+        interval_s: float = 1,
+        skip_unchanged: bool = False,
+        max_retries: Optional[int] = None,
+        max_backoff_s: float = 30,
+        min_backoff_s: float = 1,
+    ):
+        async for orderbook in self.poll_orderbook(
+            lambda skip_unchanged: self.get_l3_orderbook(market, skip_unchanged),
+            "L3",
+            interval_s,
+            skip_unchanged,
+            max_retries,
+            max_backoff_s,
+            min_backoff_s,
+        ):
+            yield orderbook
+
+    async def subscribe_l2_diffs(
+        self,
+        market: MarketId,
+        depth: int = 10,
+        include_vamm: bool = False,
+        num_vamm_orders: Optional[int] = None,
+    ) -> AsyncGenerator[L2OrderBookDiff, None]:
+        """
+        Yields the levels of the market's local L2 book that changed after every
+        DLOB update of `subscribe`, starting with the whole book as new levels.
+        Updates that leave the book as it was yield nothing.
+
+        With `cache_orderbooks`, an unchanged book is the cached one and isn't
+        diffed at all.
+        """
+        updated = asyncio.Event()
+
+        def on_dlob_update(_dlob):
+            updated.set()
+
+        self.event_emitter.on_dlob_update += on_dlob_update
+        try:
+            previous_orderbook = L2OrderBook([], [])
+            while True:
+                orderbook = self.get_l2_orderbook_sync(
+                    market_index=market.index,
+                    market_type=market.kind,
+                    include_vamm=include_vamm,
+                    num_vamm_orders=num_vamm_orders,
+                    depth=depth,
+                )
+                if orderbook is not previous_orderbook:
+                    diff = diff_l2_orderbooks(previous_orderbook, orderbook)
+                    previous_orderbook = orderbook
+                    if not diff.is_empty():
+                        yield diff
+
+                await updated.wait()
+                updated.clear()
+        finally:
+            self.event_emitter.on_dlob_update -= on_dlob_update
 
     def get_l2_orderbook_sync(
         self,
@@ -218,31 +447,59 @@ class DLOBSubscriber:
                 market_index
             )
 
-        if market_is_perp and include_vamm:
+        slot = self.slot_source.get_slot()
+        include_vamm = market_is_perp and include_vamm
+        perp_market = None
+
+        if include_vamm:
             if not fallback_l2_generators:
                 fallback_l2_generators = []
             if len(fallback_l2_generators) > 0:
                 raise ValueError(
                     "include_vamm can only be used if fallback_l2_generators is empty"
                 )
+            perp_market = self.drift_client.get_perp_market_account(market_index)
+
+        # caller supplied generators can't be compared between calls
+        use_cache = self.cache_orderbooks and not fallback_l2_generators
+        if use_cache:
+            key = (
+                "l2",
+                market_type_to_string(market_type),
+                market_index,
+                depth,
+                include_vamm,
+                num_vamm_orders,
+            )
+            cached = self.get_cached_orderbook(
+                key, slot, oracle_price_data, perp_market
+            )
+            if cached is not None:
+                return cached
 
+        if include_vamm:
             fallback_l2_generators = [
                 get_vamm_l2_generator(
-                    self.drift_client.get_perp_market_account(market_index),
+                    perp_market,
                     oracle_price_data,
                     num_vamm_orders if num_vamm_orders is not None else depth,
                     DEFAULT_TOP_OF_BOOK_QUOTE_AMOUNTS,
                 )
             ]
 
-        return self.dlob.get_l2(
+        orderbook = self.dlob.get_l2(
             market_index,
             market_type,
-            self.slot_source.get_slot(),
+            slot,
             oracle_price_data,
             depth,
             fallback_l2_generators,
         )
+        if use_cache:
+            return self.cache_orderbook(
+                key, slot, oracle_price_data, orderbook, perp_market
+            )
+        return orderbook
 
     def get_l3_orderbook_sync(
         self,
@@ -276,6 +533,17 @@ class DLOBSubscriber:
                 market_index
             )
 
-        return self.dlob.get_l3(
-            market_index, market_type, self.slot_source.get_slot(), oracle_price_data
+        slot = self.slot_source.get_slot()
+        if not self.cache_orderbooks:
+            return self.dlob.get_l3(market_index, market_type, slot, oracle_price_data)
+
+        key = ("l3", market_type_to_string(market_type), market_index)
+        cached = self.get_cached_orderbook(key, slot, oracle_price_data)
+        if cached is not None:
+            return cached
+        return self.cache_orderbook(
+            key,
+            slot,
+            oracle_price_data,
+            self.dlob.get_l3(market_index, market_type, slot, oracle_price_data),
         )
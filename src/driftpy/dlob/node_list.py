@@ -1,4 +1,6 @@
-from typing import Generator, Generic, TypeVar
+from bisect import bisect_left, bisect_right
+from itertools import count
+from typing import Generator, Generic, Literal, Tuple, TypeVar, Union
 
 from solders.pubkey import Pubkey
 
@@ -9,7 +11,7 @@ from driftpy.dlob.dlob_node import (
     VAMMNode,
     create_node,
 )
-from driftpy.types import Order, is_variant
+from driftpy.types import OraclePriceData, Order, is_variant
 
 T = TypeVar("T", bound=DLOBNode)
 
@@ -84,9 +86,7 @@ class NodeList(Generic[T]):
     def update(self, order: Order, user_account: Pubkey):
         order_id = get_order_signature(order.order_id, user_account)
         if order_id in self.node_map:
-            node = self.node_map[order_id]
-            node.order = order
-            node.have_filled = False
+            self.node_map[order_id].update_order(order)
 
     def remove(self, order: Order, user_account: Pubkey):
         order_id = get_order_signature(order.order_id, user_account)
@@ -109,6 +109,23 @@ class NodeList(Generic[T]):
             yield node
             node = node.next
 
+    def get_nodes_sorted_before(self, sort_value: int) -> list[DLOBNode]:
+        """
+        Nodes ordered strictly before `sort_value` in the list's sort direction,
+        e.g. the trigger orders crossed by an oracle price.
+        """
+        nodes = []
+        node = self.head
+        if self.sort_direction == "asc":
+            while node and node.sort_value < sort_value:
+                nodes.append(node)
+                node = node.next
+        else:
+            while node and node.sort_value > sort_value:
+                nodes.append(node)
+                node = node.next
+        return nodes
+
     def has(self, order: Order, user_account: Pubkey):
         return get_order_signature(order.order_id, user_account) in self.node_map
 
@@ -128,6 +145,169 @@ class NodeList(Generic[T]):
             print("---")
 
 
+class SortedNodeList(Generic[T]):
+    """
+    NodeList backend that keeps nodes in bisect-maintained arrays keyed by
+    `(sort_value, slot, insertion order)` instead of a linked list, so insert and
+    remove are O(log n) lookups rather than a walk from `head`.
+
+    Iteration order is identical to `NodeList`: nodes are ordered by sort value in
+    `sort_direction`, ties are broken by ascending order slot and then by
+    insertion order.
+    """
+
+    def __init__(self, node_type: NodeType, sort_direction: SortDirection):
+        self.length = 0
+        self.node_map = {}
+        self.node_type: NodeType = node_type
+        self.sort_direction = sort_direction
+        self._keys: list[tuple] = []
+        self._nodes: list[T] = []
+        self._key_map: dict[str, tuple] = {}
+        self._sequence = count()
+
+    @property
+    def head(self):
+        return self._nodes[0] if self._nodes else None
+
+    def clear(self):
+        # clear in place so that live generators observe the change
+        self._keys.clear()
+        self._nodes.clear()
+        self._key_map.clear()
+        self.node_map.clear()
+        self.length = 0
+
+    def get_key(self, node: T) -> tuple:
+        sort_value = node.sort_value
+        if self.sort_direction == "desc":
+            sort_value = -sort_value
+        return (sort_value, node.order.slot, next(self._sequence))
+
+    def insert(self, order: Order, market_type, user_account: Pubkey):
+        if not is_variant(order.status, "Open"):
+            return
+
+        order_signature = get_order_signature(order.order_id, user_account)
+        if order_signature in self.node_map:
+            return
+
+        new_node = create_node(self.node_type, order, user_account)
+        key = self.get_key(new_node)
+
+        index = bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self._nodes.insert(index, new_node)
+
+        self._key_map[order_signature] = key
+        self.node_map[order_signature] = new_node
+        self.length += 1
+
+    def update(self, order: Order, user_account: Pubkey):
+        order_id = get_order_signature(order.order_id, user_account)
+        if order_id in self.node_map:
+            self.node_map[order_id].update_order(order)
+
+    def remove(self, order: Order, user_account: Pubkey):
+        order_id = get_order_signature(order.order_id, user_account)
+        if order_id in self.node_map:
+            self.node_map.pop(order_id)
+            key = self._key_map.pop(order_id)
+
+            index = bisect_left(self._keys, key)
+            del self._keys[index]
+            del self._nodes[index]
+
+            self.length -= 1
+
+    def get_generator(self) -> Generator[DLOBNode, None, None]:
+        keys = self._keys
+        nodes = self._nodes
+        index = 0
+        while index < len(nodes):
+            key = keys[index]
+            yield nodes[index]
+            # the list may have been mutated while suspended, so re-locate the
+            # cursor from the last yielded key when it is no longer in place
+            if index < len(keys) and keys[index] is key:
+                index += 1
+            else:
+                index = bisect_right(keys, key)
+
+    def get_nodes_sorted_before(self, sort_value: int) -> list[DLOBNode]:
+        """
+        Nodes ordered strictly before `sort_value` in the list's sort direction,
+        found by bisecting the keys.
+        """
+        if self.sort_direction == "desc":
+            sort_value = -sort_value
+        # (sort_value,) sorts before every key starting with sort_value
+        return self._nodes[: bisect_left(self._keys, (sort_value,))]
+
+    def has(self, order: Order, user_account: Pubkey):
+        return get_order_signature(order.order_id, user_account) in self.node_map
+
+    def get(self, order_signature):
+        return self.node_map.get(order_signature)
+
+    def print_list(self):
+        for node in self._nodes:
+            print(node.get_label())
+
+    def print_top(self):
+        if self._nodes:
+            print(self.sort_direction.upper(), self._nodes[0].get_label())
+        else:
+            print("---")
+
+
+NodeListBackend = Literal["linked", "sorted"]
+
+node_list_backend_map: dict[NodeListBackend, type] = {
+    "linked": NodeList,
+    "sorted": SortedNodeList,
+}
+
+
+def create_node_list(
+    backend: NodeListBackend, node_type: NodeType, sort_direction: SortDirection
+) -> Union[NodeList, SortedNodeList]:
+    node_list_class = node_list_backend_map.get(backend)
+    if node_list_class is not None:
+        return node_list_class(node_type, sort_direction)
+    else:
+        raise ValueError(f"Unknown NodeList backend {backend}")
+
+
 def get_vamm_node_generator(price) -> Generator[DLOBNode, None, None]:
     if price is not None:
         yield VAMMNode(price)
+
+
+def get_limit_price_key_generator(
+    node_generator: Generator[DLOBNode, None, None],
+    base_price: int,
+    oracle_price_data: OraclePriceData,
+    slot: int,
+    sign: int = 1,
+) -> Generator[Tuple[int, DLOBNode], None, None]:
+    """
+    Pairs the nodes of a resting or floating limit list with `sign * price`.
+
+    Once its auction is over, a node's price is `base_price` plus its sort value:
+    0 plus the limit price for resting limit orders, the oracle price plus the
+    offset for floating limit orders. Only nodes still in their auction are priced
+    with `get_limit_price`.
+    """
+    if sign == 1:
+        for node in node_generator:
+            if slot > node.auction_end_slot:
+                yield base_price + node.sort_value, node
+            else:
+                yield node.get_price(oracle_price_data, slot), node
+    else:
+        for node in node_generator:
+            if slot > node.auction_end_slot:
+                yield -base_price - node.sort_value, node
+            else:
+                yield -node.get_price(oracle_price_data, slot), node
@@ -1,25 +1,27 @@
+import heapq
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Dict, Generator, List, Optional
+from typing import Any, Callable, Dict, Generator, List, Optional, Sequence, Tuple
+
+import numpy as np
 from solders.pubkey import Pubkey
 
-from driftpy.constants.numeric_constants import BASE_PRECISION, QUOTE_PRECISION
+from driftpy.constants.numeric_constants import (
+    AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO,
+    BASE_PRECISION,
+    QUOTE_PRECISION,
+)
 from driftpy.dlob.dlob_node import DLOBNode
 from driftpy.math.amm import (
-    calculate_amm_reserves_after_swap,
     calculate_market_open_bid_ask,
-    calculate_quote_asset_amount_swapped,
     calculate_spread_reserves,
     calculate_updated_amm,
-    deepcopy_amm,
 )
 from driftpy.math.orders import standardize_price
 from driftpy.types import (
-    AssetType,
     OraclePriceData,
     PerpMarketAccount,
     PositionDirection,
-    SwapDirection,
     is_variant,
 )
 
@@ -42,6 +44,24 @@ class L2OrderBook:
         self.slot = slot
 
 
+class L2OrderBookDiff:
+    """
+    The levels of an L2 book that changed since the previous book of the same
+    market: new levels and levels whose size or sources changed, as they are
+    now, and removed levels with a size of 0 and no sources.
+    """
+
+    def __init__(
+        self, asks: List[L2Level], bids: List[L2Level], slot: Optional[int] = None
+    ):
+        self.asks = asks
+        self.bids = bids
+        self.slot = slot
+
+    def is_empty(self) -> bool:
+        return not self.asks and not self.bids
+
+
 class L3Level:
     def __init__(self, price: int, size: int, maker: Pubkey, order_id: int):
         self.price = price
@@ -93,9 +113,29 @@ def get_l2_generator_from_dlob_nodes(
         )
 
 
+def get_l2_level_price(level: L2Level) -> int:
+    return level.price
+
+
+def get_negated_l2_level_price(level: L2Level) -> int:
+    return -level.price
+
+
 def merge_l2_level_generators(
-    l2_level_generators: List[Generator[L2Level, None, None]], compare: callable
+    l2_level_generators: List[Generator[L2Level, None, None]],
+    compare: Optional[callable] = None,
+    key: Optional[Callable[[L2Level], Any]] = None,
 ) -> Generator[L2Level, None, None]:
+    """
+    Merges generators that are each sorted by `key` with a heap, the earlier
+    generator winning ties. Without a `key`, the generators' heads are scanned
+    for every level and the first one for which `compare(head, best)` holds is
+    yielded.
+    """
+    if key is not None:
+        yield from heapq.merge(*l2_level_generators, key=key)
+        return
+
     generators = [
         {"generator": gen, "next": next(gen, None)} for gen in l2_level_generators
     ]
@@ -138,13 +178,44 @@ def create_l2_levels(
     return levels
 
 
-def get_vamm_l2_generator(
+class VammL2Ladder:
+    """
+    Prices and sizes of a market's vAMM levels, best level first.
+    """
+
+    def __init__(
+        self,
+        bid_prices: np.ndarray,
+        bid_sizes: np.ndarray,
+        ask_prices: np.ndarray,
+        ask_sizes: np.ndarray,
+    ):
+        self.bid_prices = bid_prices
+        self.bid_sizes = bid_sizes
+        self.ask_prices = ask_prices
+        self.ask_sizes = ask_sizes
+
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def get_vamm_l2_ladder(
     market_account: PerpMarketAccount,
     oracle_price_data: OraclePriceData,
     num_orders: int,
     now: Optional[int] = None,
     top_of_book_quote_amounts: Optional[List[int]] = None,
-):
+) -> VammL2Ladder:
+    """
+    Computes every vAMM bid and ask level of a market in one pass.
+
+    The levels match the ones of walking the AMM swap by swap: the top of book
+    levels are swapped one at a time, and the remaining levels, which all swap
+    the same base amount, are computed together with numpy. The swaps are
+    computed on int64 arrays when every intermediate value fits, and on object
+    arrays of python ints otherwise, so the results match either way. Prices
+    and sizes are returned as int64 arrays.
+    """
     num_base_orders = num_orders
     if top_of_book_quote_amounts:
         num_base_orders = num_orders - len(top_of_book_quote_amounts)
@@ -174,139 +245,195 @@ def get_vamm_l2_generator(
         is_variant(market_account.contract_type, "Prediction"),
     )
 
-    num_bids = 0
-    top_of_book_bid_size = 0
-    bid_size = open_bids // num_base_orders
+    invariant = updated_amm.sqrt_k * updated_amm.sqrt_k
+    bid_prices, bid_sizes = get_vamm_l2_ladder_side(
+        bid_reserves[0],
+        bid_reserves[1],
+        invariant,
+        updated_amm.peg_multiplier,
+        open_bids,
+        num_orders,
+        num_base_orders,
+        top_of_book_quote_amounts or [],
+        is_bid=True,
+    )
+    ask_prices, ask_sizes = get_vamm_l2_ladder_side(
+        ask_reserves[0],
+        ask_reserves[1],
+        invariant,
+        updated_amm.peg_multiplier,
+        abs(open_asks),
+        num_orders,
+        num_base_orders,
+        top_of_book_quote_amounts or [],
+        is_bid=False,
+    )
+    return VammL2Ladder(bid_prices, bid_sizes, ask_prices, ask_sizes)
 
-    bid_amm = deepcopy_amm(updated_amm)
-    bid_amm.base_asset_reserve = bid_reserves[0]
-    bid_amm.quote_asset_reserve = bid_reserves[1]
 
-    def get_l2_bids():
-        nonlocal num_bids, top_of_book_bid_size, bid_size, bid_amm
-        while num_bids < num_orders and bid_size > 0:
-            quote_swapped = 0
-            base_swapped = 0
-
-            if top_of_book_quote_amounts and num_bids < len(top_of_book_quote_amounts):
-                remaining_base_liquidity = open_bids - top_of_book_bid_size
-                quote_swapped = top_of_book_quote_amounts[num_bids]
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    bid_amm, AssetType.QUOTE(), quote_swapped, SwapDirection.Remove()
-                )
-                base_swapped = abs(
-                    bid_amm.base_asset_reserve - after_swap_base_reserves
-                )
+def get_vamm_l2_ladder_side(
+    base_asset_reserve: int,
+    quote_asset_reserve: int,
+    invariant: int,
+    peg_multiplier: int,
+    open_liquidity: int,
+    num_orders: int,
+    num_base_orders: int,
+    top_of_book_quote_amounts: List[int],
+    is_bid: bool,
+    dtype=None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bids add base to the AMM and asks remove it. `dtype` forces the dtype the
+    swaps are computed in, by default int64 is used where it can't overflow.
+    """
+    prices = []
+    sizes = []
+    top_of_book_size = 0
+    size = open_liquidity // num_base_orders
+
+    # top of book levels swap a quote amount, each from the previous level's
+    # reserves
+    while len(sizes) < min(num_orders, len(top_of_book_quote_amounts)) and size > 0:
+        remaining_base_liquidity = open_liquidity - top_of_book_size
+        quote_swapped = top_of_book_quote_amounts[len(sizes)]
+        assert quote_swapped > 0, "swap_amount must be gte 0"
+        quote_amount = (
+            quote_swapped * AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO
+        ) // peg_multiplier
+        new_quote_asset_reserve = (
+            quote_asset_reserve - quote_amount
+            if is_bid
+            else quote_asset_reserve + quote_amount
+        )
+        new_base_asset_reserve = invariant // new_quote_asset_reserve
+        base_swapped = abs(base_asset_reserve - new_base_asset_reserve)
+
+        if remaining_base_liquidity < base_swapped:
+            base_swapped = remaining_base_liquidity
+            assert base_swapped > 0, "swap_amount must be gte 0"
+            new_base_asset_reserve = (
+                base_asset_reserve + base_swapped
+                if is_bid
+                else base_asset_reserve - base_swapped
+            )
+            new_quote_asset_reserve = invariant // new_base_asset_reserve
+            quote_swapped = quote_amount_swapped(
+                abs(quote_asset_reserve - new_quote_asset_reserve),
+                peg_multiplier,
+                is_bid,
+            )
 
-                if remaining_base_liquidity < base_swapped:
-                    base_swapped = remaining_base_liquidity
-                    (
-                        after_swap_quote_reserves,
-                        after_swap_base_reserves,
-                    ) = calculate_amm_reserves_after_swap(
-                        bid_amm, AssetType.BASE(), base_swapped, SwapDirection.Add()
-                    )
-                    quote_swapped = calculate_quote_asset_amount_swapped(
-                        abs(bid_amm.quote_asset_reserve - after_swap_quote_reserves),
-                        bid_amm.peg_multiplier,
-                        SwapDirection.Add(),
-                    )
-
-                top_of_book_bid_size += base_swapped
-                bid_size = (open_bids - top_of_book_bid_size) // num_base_orders
-
-            else:
-                base_swapped = bid_size
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    bid_amm, AssetType.BASE(), base_swapped, SwapDirection.Add()
-                )
-                quote_swapped = calculate_quote_asset_amount_swapped(
-                    abs(bid_amm.quote_asset_reserve - after_swap_quote_reserves),
-                    bid_amm.peg_multiplier,
-                    SwapDirection.Add(),
-                )
+        top_of_book_size += base_swapped
+        size = (open_liquidity - top_of_book_size) // num_base_orders
+
+        prices.append((quote_swapped * BASE_PRECISION) // base_swapped)
+        sizes.append(base_swapped)
+        base_asset_reserve = new_base_asset_reserve
+        quote_asset_reserve = new_quote_asset_reserve
+
+    num_levels = num_orders - len(sizes) if size > 0 else 0
+    if dtype is None:
+        # the largest value each vectorized step produces. Bids add base, so the
+        # quote reserve only shrinks, asks remove it and the quote reserve is
+        # largest after the last level
+        max_base_asset_reserve = base_asset_reserve + size * num_levels
+        max_quote_asset_reserve = quote_asset_reserve
+        if not is_bid and num_levels:
+            max_quote_asset_reserve = invariant // max(
+                base_asset_reserve - size * num_levels, 1
+            )
+        max_quote_amount = (
+            (max_quote_asset_reserve + 1) * peg_multiplier
+        ) // AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO + 1
+        fits_int64 = max(
+            invariant,
+            max_base_asset_reserve,
+            (max_quote_asset_reserve + 1) * peg_multiplier,
+            max_quote_amount * BASE_PRECISION,
+        )
+        dtype = np.int64 if fits_int64 <= INT64_MAX else object
+
+    # the remaining levels all swap `size` base, so the base reserves after each
+    # of them are known upfront
+    steps = np.arange(1, num_levels + 1, dtype=dtype)
+    if is_bid:
+        base_asset_reserves = base_asset_reserve + size * steps
+    else:
+        base_asset_reserves = base_asset_reserve - size * steps
+    quote_asset_reserves = invariant // base_asset_reserves
+    previous_quote_asset_reserves = np.concatenate(
+        (np.array([quote_asset_reserve], dtype=dtype), quote_asset_reserves[:-1])
+    )
+    quote_swapped = quote_amount_swapped(
+        np.abs(previous_quote_asset_reserves - quote_asset_reserves),
+        peg_multiplier,
+        is_bid,
+    )
+    level_prices = (quote_swapped * BASE_PRECISION) // size if num_levels else steps
+
+    # AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO is a float, so quote amounts and
+    # prices are whole floats, as they were swap by swap
+    return (
+        np.concatenate(
+            (
+                np.array([int(price) for price in prices], dtype=np.int64),
+                level_prices.astype(np.int64),
+            )
+        ),
+        np.concatenate(
+            (
+                np.array(sizes, dtype=np.int64),
+                np.full(num_levels, size, dtype=np.int64),
+            )
+        ),
+    )
 
-            price = (quote_swapped * BASE_PRECISION) // base_swapped
-            bid_amm.base_asset_reserve = after_swap_base_reserves
-            bid_amm.quote_asset_reserve = after_swap_quote_reserves
 
-            yield L2Level(
-                price=price, size=base_swapped, sources={"vamm": base_swapped}
-            )
-            num_bids += 1
+def quote_amount_swapped(quote_asset_reserves, peg_multiplier: int, is_bid: bool):
+    """
+    `calculate_quote_asset_amount_swapped` for the base swaps of bids (Add) and
+    asks (Remove), on ints or arrays.
+    """
+    if is_bid:
+        return (
+            quote_asset_reserves
+            * peg_multiplier
+            // AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO
+        )
+    return (
+        (quote_asset_reserves + 1) * peg_multiplier
+    ) // AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO + 1
 
-    num_asks = 0
-    top_of_book_ask_size = 0
-    ask_size = abs(open_asks) // num_base_orders
 
-    ask_amm = deepcopy_amm(updated_amm)
-    ask_amm.base_asset_reserve = ask_reserves[0]
-    ask_amm.quote_asset_reserve = ask_reserves[1]
+def get_vamm_l2_generator(
+    market_account: PerpMarketAccount,
+    oracle_price_data: OraclePriceData,
+    num_orders: int,
+    now: Optional[int] = None,
+    top_of_book_quote_amounts: Optional[List[int]] = None,
+):
+    """
+    Returns `(get_l2_bids, get_l2_asks)` generator functions over the levels of
+    `get_vamm_l2_ladder`.
+    """
+    ladder = get_vamm_l2_ladder(
+        market_account, oracle_price_data, num_orders, now, top_of_book_quote_amounts
+    )
 
-    def get_l2_asks():
-        nonlocal num_asks, top_of_book_ask_size, ask_size, ask_amm
-        while num_asks < num_orders and ask_size > 0:
-            quote_swapped = 0
-            base_swapped = 0
-
-            if top_of_book_quote_amounts and num_asks < len(top_of_book_quote_amounts):
-                remaining_base_liquidity = abs(open_asks) - top_of_book_ask_size
-                quote_swapped = top_of_book_quote_amounts[num_asks]
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    ask_amm, AssetType.QUOTE(), quote_swapped, SwapDirection.Add()
-                )
-                base_swapped = abs(
-                    ask_amm.base_asset_reserve - after_swap_base_reserves
-                )
+    def level_generator(prices: np.ndarray, sizes: np.ndarray):
+        for price, size in zip(prices.tolist(), sizes.tolist()):
+            yield L2Level(price=price, size=size, sources={"vamm": size})
 
-                if remaining_base_liquidity < base_swapped:
-                    base_swapped = remaining_base_liquidity
-                    (
-                        after_swap_quote_reserves,
-                        after_swap_base_reserves,
-                    ) = calculate_amm_reserves_after_swap(
-                        ask_amm, AssetType.BASE(), base_swapped, SwapDirection.Remove()
-                    )
-                    quote_swapped = calculate_quote_asset_amount_swapped(
-                        abs(ask_amm.quote_asset_reserve - after_swap_quote_reserves),
-                        ask_amm.peg_multiplier,
-                        SwapDirection.Remove(),
-                    )
-
-                top_of_book_ask_size += base_swapped
-                ask_size = (abs(open_asks) - top_of_book_ask_size) // num_base_orders
-
-            else:
-                base_swapped = ask_size
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    ask_amm, AssetType.BASE(), base_swapped, SwapDirection.Remove()
-                )
-                quote_swapped = calculate_quote_asset_amount_swapped(
-                    abs(ask_amm.quote_asset_reserve - after_swap_quote_reserves),
-                    ask_amm.peg_multiplier,
-                    SwapDirection.Remove(),
-                )
+    # generators are shared, so calling a function again resumes its side
+    bids = level_generator(ladder.bid_prices, ladder.bid_sizes)
+    asks = level_generator(ladder.ask_prices, ladder.ask_sizes)
 
-            price = (quote_swapped * BASE_PRECISION) // base_swapped
-            ask_amm.base_asset_reserve = after_swap_base_reserves
-            ask_amm.quote_asset_reserve = after_swap_quote_reserves
+    def get_l2_bids():
+        yield from bids
 
-            yield L2Level(
-                price=price, size=base_swapped, sources={"vamm": base_swapped}
-            )
-            num_asks += 1
+    def get_l2_asks():
+        yield from asks
 
     return get_l2_bids, get_l2_asks
 
@@ -343,3 +470,57 @@ def group_l2(l2: L2OrderBook, grouping: int, depth: int) -> L2OrderBook:
         asks=group_l2_levels(l2.asks, grouping, PositionDirection.Short, depth),
         slot=l2.slot,
     )
+
+
+def diff_l2_levels(
+    previous_levels: Sequence[L2Level], levels: Sequence[L2Level]
+) -> List[L2Level]:
+    previous_by_price = {level.price: level for level in previous_levels}
+    changed_levels = []
+    for level in levels:
+        previous_level = previous_by_price.pop(level.price, None)
+        if (
+            previous_level is None
+            or previous_level.size != level.size
+            or previous_level.sources != level.sources
+        ):
+            changed_levels.append(level)
+    for price in previous_by_price:
+        changed_levels.append(L2Level(price, 0, {}))
+    return changed_levels
+
+
+def diff_l2_orderbooks(
+    previous_orderbook: L2OrderBook, orderbook: L2OrderBook
+) -> L2OrderBookDiff:
+    return L2OrderBookDiff(
+        asks=diff_l2_levels(previous_orderbook.asks, orderbook.asks),
+        bids=diff_l2_levels(previous_orderbook.bids, orderbook.bids),
+        slot=orderbook.slot,
+    )
+
+
+def apply_l2_levels_diff(
+    levels: Sequence[L2Level], changed_levels: Sequence[L2Level], is_bid: bool
+) -> List[L2Level]:
+    levels_by_price = {level.price: level for level in levels}
+    for level in changed_levels:
+        if level.size == 0:
+            levels_by_price.pop(level.price, None)
+        else:
+            levels_by_price[level.price] = level
+    return sorted(levels_by_price.values(), key=get_l2_level_price, reverse=is_bid)
+
+
+def apply_l2_orderbook_diff(
+    orderbook: L2OrderBook, diff: L2OrderBookDiff
+) -> L2OrderBook:
+    """
+    Rebuilds the book a diff was computed against, e.g. to keep a local copy of
+    a book fed by `DLOBSubscriber.subscribe_l2_diffs`.
+    """
+    return L2OrderBook(
+        asks=apply_l2_levels_diff(orderbook.asks, diff.asks, False),
+        bids=apply_l2_levels_diff(orderbook.bids, diff.bids, True),
+        slot=diff.slot,
+    )
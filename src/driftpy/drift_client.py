@@ -80,6 +80,7 @@ from driftpy.constants.spot_markets import WRAPPED_SOL_MINT
 from driftpy.decode.utils import decode_name
 from driftpy.drift_user import DriftUser
 from driftpy.drift_user_stats import DriftUserStats, UserStatsSubscriptionConfig
+from driftpy.math.margin import MarketRiskTable
 from driftpy.math.perp_position import is_available
 from driftpy.math.spot_market import cast_to_spot_precision
 from driftpy.math.spot_position import is_spot_position_available
@@ -207,6 +208,7 @@ class DriftClient:
 
         self.last_perp_market_seen_cache = {}
         self.last_spot_market_seen_cache = {}
+        self.market_risk_table = MarketRiskTable()
 
         self.account_subscriber = account_subscription.get_drift_client_subscriber(
             self.program, perp_market_indexes, spot_market_indexes, oracle_infos
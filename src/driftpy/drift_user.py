@@ -2,7 +2,7 @@ import copy
 import math
 import time
 from enum import Enum
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple, TypeVar
 
 from solders.pubkey import Pubkey
 
@@ -34,9 +34,8 @@ from driftpy.math.fuel import (
 )
 from driftpy.math.margin import (
     MarginCategory,
-    calculate_asset_weight,
-    calculate_liability_weight,
-    calculate_market_margin_ratio,
+    PerpMarketRisk,
+    SpotMarketRisk,
     calculate_unrealized_asset_weight,
 )
 from driftpy.math.oracles import calculate_live_oracle_twap
@@ -68,6 +67,8 @@ from driftpy.types import (
     is_variant,
 )
 
+T = TypeVar("T")
+
 
 class DriftUser:
     """This class is the main way to retrieve and inspect drift user account data."""
@@ -98,6 +99,12 @@ class DriftUser:
             self.program, self.user_public_key
         )
 
+        self.margin_cache: dict[tuple, object] = {}
+        self.margin_cache_state: Optional[tuple] = None
+        self.margin_cache_markets: tuple = (None, (), ())
+        self.margin_cache_hits = 0
+        self.margin_cache_misses = 0
+
     async def subscribe(self):
         if self.account_subscriber is None:
             raise ValueError("No account subscriber found")
@@ -124,12 +131,120 @@ class DriftUser:
     def get_spot_market_account(self, market_index: int) -> Optional[SpotMarketAccount]:
         return self.drift_client.get_spot_market_account(market_index)
 
+    def get_perp_market_risk(self, market: PerpMarketAccount) -> PerpMarketRisk:
+        return self.drift_client.market_risk_table.get_perp_market_risk(market)
+
+    def get_spot_market_risk(self, market: SpotMarketAccount) -> SpotMarketRisk:
+        return self.drift_client.market_risk_table.get_spot_market_risk(market)
+
     def get_user_account_and_slot(self) -> Optional[DataAndSlot[UserAccount]]:
         return self.account_subscriber.get_user_account_and_slot()
 
     def get_user_account(self) -> UserAccount:
         return self.account_subscriber.get_user_account_and_slot().data
 
+    def get_margin_cache_state(self) -> Optional[tuple]:
+        """
+        What the cached margin components are valid for: the user account's
+        `DataAndSlot`, the accounts of the markets the user holds positions in
+        and their oracle slots, as `(user_account_and_slot, perp_markets,
+        perp_oracle_slots, spot_markets, spot_oracle_slots)`. `None` when the
+        account has no slot (e.g. it was never fetched), in which case nothing
+        is cached.
+
+        Subscribers replace the `DataAndSlot` and market accounts on every
+        update, even within a slot, so those are compared by identity.
+        """
+        user_account_and_slot = self.get_user_account_and_slot()
+        if user_account_and_slot is None:
+            return None
+
+        if self.margin_cache_markets[0] is not user_account_and_slot:
+            user_account = user_account_and_slot.data
+            perp_market_indexes = tuple(
+                perp_position.market_index
+                for perp_position in self.get_active_perp_positions_for_user_account(
+                    user_account
+                )
+            )
+            spot_market_indexes = tuple(
+                sorted(
+                    {QUOTE_SPOT_MARKET_INDEX}
+                    | {
+                        spot_position.market_index
+                        for spot_position in self.get_active_spot_positions_for_user_account(
+                            user_account
+                        )
+                    }
+                )
+            )
+            self.margin_cache_markets = (
+                user_account_and_slot,
+                perp_market_indexes,
+                spot_market_indexes,
+            )
+
+        _, perp_market_indexes, spot_market_indexes = self.margin_cache_markets
+        return (
+            user_account_and_slot,
+            tuple(
+                self.get_perp_market_account(market_index)
+                for market_index in perp_market_indexes
+            ),
+            tuple(
+                self.get_oracle_data_for_perp_market(market_index).slot
+                for market_index in perp_market_indexes
+            ),
+            tuple(
+                self.get_spot_market_account(market_index)
+                for market_index in spot_market_indexes
+            ),
+            tuple(
+                self.get_oracle_data_for_spot_market(market_index).slot
+                for market_index in spot_market_indexes
+            ),
+        )
+
+    def is_margin_cache_state(self, state: tuple) -> bool:
+        cached = self.margin_cache_state
+        return (
+            cached is not None
+            and cached[0] is state[0]
+            and all(a is b for a, b in zip(cached[1], state[1]))
+            and cached[2] == state[2]
+            and all(a is b for a, b in zip(cached[3], state[3]))
+            and cached[4] == state[4]
+        )
+
+    def get_cached_margin_component(self, key: tuple, calculate: Callable[[], T]) -> T:
+        """
+        Returns the margin component stored under `key` for the current user
+        account, market accounts and oracle slots, calling `calculate` on a miss.
+        The cache is dropped as soon as the account subscriber or any of the
+        markets is updated, or any of the oracles moves to a new slot.
+        """
+        state = self.get_margin_cache_state()
+        if state is None:
+            return calculate()
+
+        if not self.is_margin_cache_state(state):
+            self.margin_cache = {}
+            self.margin_cache_state = state
+
+        if key in self.margin_cache:
+            self.margin_cache_hits += 1
+            return self.margin_cache[key]
+
+        self.margin_cache_misses += 1
+        value = calculate()
+        self.margin_cache[key] = value
+        return value
+
+    def clear_margin_cache(self):
+        self.margin_cache = {}
+        self.margin_cache_state = None
+        self.margin_cache_markets = (None, (), ())
+
     def get_token_amount(self, market_index: int) -> int:
         spot_position = self.get_spot_position(market_index)
         if spot_position is None:
@@ -306,8 +421,7 @@ class DriftUser:
         base_asset_value = (abs(base_asset_amount) * valuation_price) // BASE_PRECISION
 
         if margin_category is not None:
-            margin_ratio = calculate_market_margin_ratio(
-                market,
+            margin_ratio = self.get_perp_market_risk(market).get_margin_ratio(
                 abs(base_asset_amount),
                 margin_category,
                 self.get_user_account().max_margin_ratio,
@@ -681,8 +795,7 @@ class DriftUser:
         worst_case_base_amount = worst_case["worst_case_base_asset_amount"]
         worst_case_liability_value = worst_case["worst_case_liability_value"]
 
-        margin_ratio = calculate_market_margin_ratio(
-            perp_market,
+        margin_ratio = self.get_perp_market_risk(perp_market).get_margin_ratio(
             abs(worst_case_base_amount),
             margin_category,
             self.get_user_account().max_margin_ratio,
@@ -735,6 +848,26 @@ class DriftUser:
         market_index: int = None,
         with_weight_margin_category: Optional[MarginCategory] = None,
         strict: bool = False,
+    ):
+        return self.get_cached_margin_component(
+            (
+                "unrealized_pnl",
+                with_funding,
+                market_index,
+                with_weight_margin_category,
+                strict,
+            ),
+            lambda: self.calculate_unrealized_pnl(
+                with_funding, market_index, with_weight_margin_category, strict
+            ),
+        )
+
+    def calculate_unrealized_pnl(
+        self,
+        with_funding: bool = False,
+        market_index: int = None,
+        with_weight_margin_category: Optional[MarginCategory] = None,
+        strict: bool = False,
     ):
         user = self.get_user_account()
         quote_spot_market = self.drift_client.get_spot_market_account(
@@ -826,6 +959,37 @@ class DriftUser:
         include_open_orders: bool = True,
         strict: bool = False,
         now: Optional[int] = None,
+    ) -> tuple[int, int]:
+        now = now or int(time.time())
+        # only the strict twap depends on the timestamp
+        return self.get_cached_margin_component(
+            (
+                "spot_market_asset_and_liability_value",
+                market_index,
+                margin_category,
+                liquidation_buffer,
+                include_open_orders,
+                strict,
+                now if strict else None,
+            ),
+            lambda: self.calculate_spot_market_asset_and_liability_value(
+                market_index,
+                margin_category,
+                liquidation_buffer,
+                include_open_orders,
+                strict,
+                now,
+            ),
+        )
+
+    def calculate_spot_market_asset_and_liability_value(
+        self,
+        market_index: Optional[int] = None,
+        margin_category: Optional[MarginCategory] = None,
+        liquidation_buffer: Optional[int] = None,
+        include_open_orders: bool = True,
+        strict: bool = False,
+        now: Optional[int] = None,
     ) -> tuple[int, int]:
         now = now or int(time.time())
         net_quote_value = 0
@@ -1001,11 +1165,8 @@ class DriftUser:
         )
 
         if margin_category is not None:
-            weight = calculate_asset_weight(
-                token_amount,
-                strict_oracle_price.current,
-                spot_market_account,
-                margin_category,
+            weight = self.get_spot_market_risk(spot_market_account).get_asset_weight(
+                token_amount, strict_oracle_price.current, margin_category
             )
 
             if (
@@ -1036,9 +1197,9 @@ class DriftUser:
         )
 
         if margin_category is not None:
-            weight = calculate_liability_weight(
-                token_amount, spot_market_account, margin_category
-            )
+            weight = self.get_spot_market_risk(
+                spot_market_account
+            ).get_liability_weight(token_amount, margin_category)
 
             if (
                 margin_category == MarginCategory.INITIAL
@@ -1180,8 +1341,8 @@ class DriftUser:
         max_size = max(0, rhs)
 
         # accounting for max size
-        margin_ratio = calculate_market_margin_ratio(
-            market, max_size, margin_category, self.get_user_account().max_margin_ratio
+        margin_ratio = self.get_perp_market_risk(market).get_margin_ratio(
+            max_size, margin_category, self.get_user_account().max_margin_ratio
         )
 
         attempts = 0
@@ -1196,8 +1357,7 @@ class DriftUser:
 
             target_size = max(0, rhs)
 
-            margin_ratio = calculate_market_margin_ratio(
-                market,
+            margin_ratio = self.get_perp_market_risk(market).get_margin_ratio(
                 target_size,
                 margin_category,
                 self.get_user_account().max_margin_ratio,
@@ -1227,8 +1387,7 @@ class DriftUser:
         order_base_asset_amount = base_asset_amount - perp_position.base_asset_amount
         proposed_base_asset_amount = base_asset_amount + position_base_size_change
 
-        margin_ratio = calculate_market_margin_ratio(
-            market,
+        margin_ratio = self.get_perp_market_risk(market).get_margin_ratio(
             abs(proposed_base_asset_amount),
             margin_category,
             self.get_user_account().max_margin_ratio,
@@ -1278,10 +1437,9 @@ class DriftUser:
         token_precision = 10**market.decimals
 
         if signed_token_amount > 0:
-            asset_weight = calculate_asset_weight(
+            asset_weight = self.get_spot_market_risk(market).get_asset_weight(
                 signed_token_amount,
                 self.get_oracle_data_for_spot_market(market.market_index).price,
-                market,
                 MarginCategory.MAINTENANCE,
             )
 
@@ -1291,8 +1449,8 @@ class DriftUser:
             ) // token_precision
 
         else:
-            liability_weight = calculate_liability_weight(
-                abs(signed_token_amount), market, MarginCategory.MAINTENANCE
+            liability_weight = self.get_spot_market_risk(market).get_liability_weight(
+                abs(signed_token_amount), MarginCategory.MAINTENANCE
             )
 
             return (
@@ -1773,8 +1931,8 @@ class DriftUser:
     def get_perp_buying_power_from_free_collateral_and_base_asset_amount(
         self, market_index: int, free_collateral: int, base_asset_amount: int
     ) -> int:
-        margin_ratio = calculate_market_margin_ratio(
-            self.drift_client.get_perp_market_account(market_index),
+        market = self.drift_client.get_perp_market_account(market_index)
+        margin_ratio = self.get_perp_market_risk(market).get_margin_ratio(
             base_asset_amount,
             MarginCategory.INITIAL,
             self.get_user_account().max_margin_ratio,
@@ -1787,6 +1945,26 @@ class DriftUser:
         liquidation_buffer: int = 0,
         include_open_orders: bool = False,
         strict: bool = False,
+    ):
+        return self.get_cached_margin_component(
+            (
+                "total_perp_position_liability",
+                margin_category,
+                liquidation_buffer,
+                include_open_orders,
+                strict,
+            ),
+            lambda: self.calculate_total_perp_position_liability(
+                margin_category, liquidation_buffer, include_open_orders, strict
+            ),
+        )
+
+    def calculate_total_perp_position_liability(
+        self,
+        margin_category: Optional[MarginCategory] = None,
+        liquidation_buffer: int = 0,
+        include_open_orders: bool = False,
+        strict: bool = False,
     ):
         total_perp_value = 0
         for perp_position in self.get_active_perp_positions():
@@ -1847,8 +2025,7 @@ class DriftUser:
             )
 
         if margin_category:
-            margin_ratio = calculate_market_margin_ratio(
-                market,
+            margin_ratio = self.get_perp_market_risk(market).get_margin_ratio(
                 abs(base_asset_amount),
                 margin_category,
                 self.get_user_account().max_margin_ratio,
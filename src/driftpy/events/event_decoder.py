@@ -0,0 +1,298 @@
+import struct
+from keyword import kwlist
+from typing import Any, Callable, Optional, Tuple
+
+import borsh_construct
+from anchorpy.borsh_extension import BorshPubkeyAdapter, _DataclassStruct
+from construct import (
+    Array,
+    BytesInteger,
+    Construct,
+    Flag,
+    FocusedSeq,
+    FormatField,
+    Renamed,
+)
+from solders.pubkey import Pubkey
+
+_U32 = struct.Struct("<I")
+
+# decodes the value at `offset` of `data`, returning it and the offset after it
+Decoder = Callable[[bytes, int], Tuple[Any, int]]
+
+
+class UnsupportedLayout(Exception):
+    pass
+
+
+class FixedField:
+    """
+    A fixed size field that can be unpacked as part of a `struct.Struct`
+    together with its neighbours.
+    """
+
+    def __init__(self, fmt: str, convert: Optional[Callable[[Any], Any]] = None):
+        self.fmt = fmt
+        self.convert = convert
+
+
+def _u128(value: bytes) -> int:
+    return int.from_bytes(value, "little")
+
+
+def _i128(value: bytes) -> int:
+    return int.from_bytes(value, "little", signed=True)
+
+
+def compile_field(subcon: Construct):
+    """
+    Compiles a construct node of an anchorpy layout into a `FixedField` or a
+    `Decoder`, raising `UnsupportedLayout` for nodes that aren't handled.
+    """
+    while isinstance(subcon, Renamed):
+        subcon = subcon.subcon
+
+    if isinstance(subcon, FormatField):
+        if subcon.fmtstr[0] != "<":
+            raise UnsupportedLayout(subcon)
+        return FixedField(subcon.fmtstr[1:])
+    if subcon is Flag:
+        return FixedField("?")
+    if isinstance(subcon, BorshPubkeyAdapter):
+        return FixedField("32s", Pubkey)
+    if isinstance(subcon, BytesInteger):
+        if subcon.length != 16 or not subcon.swapped:
+            raise UnsupportedLayout(subcon)
+        return FixedField("16s", _i128 if subcon.signed else _u128)
+    if isinstance(subcon, _DataclassStruct):
+        return compile_dataclass(subcon)
+    if isinstance(subcon, borsh_construct.Option):
+        # CStruct(discriminator / U8, value / IfThenElse(..., Pass, subcon))
+        return compile_option(subcon.subcon.subcons[1].subcon.elsesubcon)
+    if isinstance(subcon, borsh_construct.Enum):
+        return compile_enum(subcon)
+    if subcon is borsh_construct.String:
+        return compile_bytes(lambda value: value.decode("utf8"))
+    if subcon is borsh_construct.Bytes:
+        return compile_bytes(bytes)
+    if isinstance(subcon, Array) and isinstance(subcon.count, int):
+        return compile_array(subcon.subcon, subcon.count)
+    if isinstance(subcon, FocusedSeq) and subcon.parsebuildfrom == "items":
+        # borsh_construct.Vec: PrefixedArray(U32, subcon)
+        items = subcon.subcons[1].subcon
+        if isinstance(items, Array):
+            return compile_array(items.subcon, None)
+    raise UnsupportedLayout(subcon)
+
+
+def as_decoder(field) -> Decoder:
+    if not isinstance(field, FixedField):
+        return field
+
+    unpack_from = struct.Struct("<" + field.fmt).unpack_from
+    size = struct.calcsize("<" + field.fmt)
+    convert = field.convert
+
+    if convert is None:
+
+        def decode(data, offset):
+            return unpack_from(data, offset)[0], offset + size
+
+    else:
+
+        def decode(data, offset):
+            return convert(unpack_from(data, offset)[0]), offset + size
+
+    return decode
+
+
+def compile_fields(subcons: list) -> Callable[[bytes, int], Tuple[dict, int]]:
+    """
+    Compiles the named fields of a struct into a decoder returning a dict of the
+    field values. Runs of consecutive fixed size fields are read with a single
+    `struct.Struct`.
+    """
+    steps = []
+    run: list = []
+
+    def end_run():
+        if not run:
+            return
+        fmt = "<" + "".join(field.fmt for _, field in run)
+        names = tuple(name for name, _ in run)
+        converters = tuple(
+            (i, field.convert)
+            for i, (_, field) in enumerate(run)
+            if field.convert is not None
+        )
+        steps.append((struct.Struct(fmt), names, converters))
+        run.clear()
+
+    for subcon in subcons:
+        name = subcon.name
+        field = compile_field(subcon)
+        if isinstance(field, FixedField):
+            run.append((name, field))
+        else:
+            end_run()
+            steps.append((None, name, field))
+    end_run()
+
+    def decode(data, offset):
+        values = {}
+        for layout, names, step in steps:
+            if layout is None:
+                values[names], offset = step(data, offset)
+                continue
+            unpacked = layout.unpack_from(data, offset)
+            offset += layout.size
+            if step:
+                unpacked = list(unpacked)
+                for i, convert in step:
+                    unpacked[i] = convert(unpacked[i])
+            values.update(zip(names, unpacked))
+        return values, offset
+
+    return decode
+
+
+def compile_dataclass(subcon: _DataclassStruct) -> Decoder:
+    decode_fields = compile_fields(subcon.subcon.subcons)
+    datacls = subcon.datacls
+    # mirrors _DataclassStruct._decode
+    renames = {
+        name: f"{name}_"
+        for name in (field.name for field in subcon.subcon.subcons)
+        if name in kwlist
+    }
+    if any(field.name[0] == "_" for field in subcon.subcon.subcons):
+        raise UnsupportedLayout(subcon)
+
+    if renames:
+
+        def decode(data, offset):
+            values, offset = decode_fields(data, offset)
+            kwargs = {renames.get(key, key): value for key, value in values.items()}
+            return datacls(**kwargs), offset
+
+    else:
+
+        def decode(data, offset):
+            values, offset = decode_fields(data, offset)
+            return datacls(**values), offset
+
+    return decode
+
+
+def compile_option(subcon: Construct) -> Decoder:
+    decode_value = as_decoder(compile_field(subcon))
+
+    def decode(data, offset):
+        if data[offset] == 0:
+            return None, offset + 1
+        return decode_value(data, offset + 1)
+
+    return decode
+
+
+def compile_enum(subcon: borsh_construct.Enum) -> Decoder:
+    variants = []
+    for index, variant in enumerate(subcon.variants):
+        constructor = subcon.enum.getitem(index)
+        if isinstance(variant, str):
+            variants.append((constructor, None, False))
+            continue
+        underlying = variant.subcon if isinstance(variant, Renamed) else variant
+        if isinstance(underlying, borsh_construct.TupleStruct):
+            decoders = [as_decoder(compile_field(s)) for s in underlying.subcons]
+
+            def decode_tuple(data, offset, decoders=decoders):
+                values = []
+                for decode_value in decoders:
+                    value, offset = decode_value(data, offset)
+                    values.append(value)
+                return values, offset
+
+            variants.append((constructor, decode_tuple, False))
+        elif isinstance(underlying, borsh_construct.CStruct):
+            variants.append((constructor, compile_fields(underlying.subcons), True))
+        else:
+            raise UnsupportedLayout(variant)
+
+    def decode(data, offset):
+        constructor, decode_value, named = variants[data[offset]]
+        offset += 1
+        if decode_value is None:
+            return constructor(), offset
+        value, offset = decode_value(data, offset)
+        if named:
+            return constructor(**value), offset
+        return constructor(value), offset
+
+    return decode
+
+
+def compile_bytes(convert: Callable[[bytes], Any]) -> Decoder:
+    def decode(data, offset):
+        (length,) = _U32.unpack_from(data, offset)
+        offset += 4
+        value = data[offset : offset + length]
+        if len(value) != length:
+            raise struct.error("unexpected end of data")
+        return convert(value), offset + length
+
+    return decode
+
+
+def compile_array(subcon: Construct, count: Optional[int]) -> Decoder:
+    """
+    Compiles a fixed length array, or a u32 length prefixed one if `count` is
+    None.
+    """
+    field = compile_field(subcon)
+
+    if isinstance(field, FixedField) and field.convert is None:
+        item_size = struct.calcsize("<" + field.fmt)
+
+        def decode(data, offset):
+            length = count
+            if length is None:
+                (length,) = _U32.unpack_from(data, offset)
+                offset += 4
+            values = list(struct.unpack_from(f"<{length}{field.fmt}", data, offset))
+            return values, offset + item_size * length
+
+        return decode
+
+    decode_item = as_decoder(field)
+
+    def decode(data, offset):
+        length = count
+        if length is None:
+            (length,) = _U32.unpack_from(data, offset)
+            offset += 4
+        values = []
+        for _ in range(length):
+            value, offset = decode_item(data, offset)
+            values.append(value)
+        return values, offset
+
+    return decode
+
+
+def compile_event_decoder(layout: Construct) -> Callable[[bytes], Any]:
+    """
+    Compiles the anchorpy layout of an event into a function decoding the event
+    data, i.e. everything after the 8 byte discriminator. Decoded events compare
+    equal to the ones anchorpy builds, but are read with `struct` rather than
+    construct's per-field parsing.
+
+    Falls back to parsing with the layout itself if it contains construct nodes
+    the compiler doesn't know about.
+    """
+    try:
+        decode = as_decoder(compile_field(layout))
+    except UnsupportedLayout:
+        return lambda data: layout.parse(data[8:])
+
+    return lambda data: decode(data, 8)[0]
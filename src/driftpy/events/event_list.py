@@ -1,7 +1,50 @@
-from typing import Optional
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
+from functools import cmp_to_key
+from typing import Hashable, Iterable, Optional, Union
 
-from driftpy.events.types import WrappedEvent, EventSubscriptionOrderDirection, SortFn
+from solders.pubkey import Pubkey
+
+from driftpy.events.sort import blockchain_sort_fn
+from driftpy.events.types import EventSubscriptionOrderDirection, SortFn, WrappedEvent
+
+# (user field, order id field) pairs of event data that are indexed by `EventList`
+USER_ORDER_FIELDS = (
+    ("user", "order_id"),
+    ("taker", "taker_order_id"),
+    ("maker", "maker_order_id"),
+    ("liquidator", None),
+)
+
+
+def get_event_index_keys(event: WrappedEvent) -> list[Hashable]:
+    """
+    Returns the ("user", pubkey), ("market_index", index), ("order_id", id) and
+    ("user_order_id", pubkey, id) keys an event is indexed under.
+    """
+    data = event.data
+    order = getattr(data, "order", None)
+    keys = []
+    for user_field, order_id_field in USER_ORDER_FIELDS:
+        user = getattr(data, user_field, None)
+        order_id = getattr(data, order_id_field, None) if order_id_field else None
+        if user_field == "user" and order is not None:
+            order_id = order.order_id
+        if user is not None:
+            keys.append(("user", user))
+        if order_id is not None:
+            keys.append(("order_id", order_id))
+            if user is not None:
+                keys.append(("user_order_id", user, order_id))
+
+    market_index = getattr(data, "market_index", None)
+    if market_index is None and order is not None:
+        market_index = order.market_index
+    if market_index is not None:
+        keys.append(("market_index", market_index))
+
+    # an event can name the same user or order twice, e.g. self-trades
+    return list(dict.fromkeys(keys))
 
 
 @dataclass
@@ -11,7 +54,93 @@ class Node:
     prev: Optional[any] = None
 
 
+class EventNode(Node):
+    """
+    The `Node` of an event of `EventList`, linked to its neighbours on access.
+    Nodes are read from the list as it is when they are walked, so they should
+    not be held across inserts.
+    """
+
+    def __init__(self, events: "SortedEvents", position: int):
+        self.events = events
+        self.position = position
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EventNode):
+            return NotImplemented
+        return self.events is other.events and self.position == other.position
+
+    def __repr__(self) -> str:
+        return f"EventNode(event={self.event!r})"
+
+    @property
+    def event(self) -> WrappedEvent:
+        return self.events.events[self.position]
+
+    @property
+    def next(self) -> Optional["EventNode"]:
+        # events are stored tail first
+        if self.position <= self.events.start:
+            return None
+        return EventNode(self.events, self.position - 1)
+
+    @property
+    def prev(self) -> Optional["EventNode"]:
+        if self.position >= len(self.events.events) - 1:
+            return None
+        return EventNode(self.events, self.position + 1)
+
+
+class SortedEvents:
+    """
+    Events sorted by key, stored tail first so that events arriving in order are
+    appended. Evicted events are skipped with an offset and only dropped from the
+    underlying lists once they make up half of them.
+    """
+
+    def __init__(self, bisect):
+        self.bisect = bisect
+        self.keys: list = []
+        self.events: list[WrappedEvent] = []
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.events) - self.start
+
+    def position(self, key) -> int:
+        return self.bisect(self.keys, key, self.start)
+
+    def insert(self, key, event: WrappedEvent, position: Optional[int] = None):
+        if position is None:
+            position = self.position(key)
+        self.keys.insert(position, key)
+        self.events.insert(position, event)
+
+    def pop_tail(self) -> WrappedEvent:
+        event = self.events[self.start]
+        self.start += 1
+        if self.start * 2 >= len(self.events):
+            del self.keys[: self.start]
+            del self.events[: self.start]
+            self.start = 0
+        return event
+
+    def to_list(self) -> list[WrappedEvent]:
+        return self.events[self.start :][::-1]
+
+
 class EventList:
+    """
+    Bounded list of events kept in `sort_fn` order.
+
+    A new event goes in front of the first event `e` for which
+    `sort_fn(e, new_event)` returns -1 ("asc") or 1 ("desc"), and the last event
+    is evicted once the list holds more than `max_size`. The insert position is
+    found by bisection. Events are also indexed by user, market index and order
+    id so they can be looked up without walking the whole list; the index is
+    built by the first lookup and only kept up to date from then on.
+    """
+
     def __init__(
         self,
         max_size: int,
@@ -22,62 +151,127 @@ class EventList:
         self.max_size = max_size
         self.sort_fn = sort_fn
         self.order_direction = order_direction
-        self.head = None
-        self.tail = None
 
-    def insert(self, event: WrappedEvent) -> None:
-        self.size += 1
-        new_node = Node(event)
-        if self.head is None:
-            self.head = self.tail = new_node
-            return
-
-        halt_condition = -1 if self.order_direction == "asc" else 1
+        halt_condition = -1 if order_direction == "asc" else 1
 
-        if self.sort_fn(self.head.event, new_node.event) == halt_condition:
-            self.head.prev = new_node
-            new_node.next = self.head
-            self.head = new_node
-        else:
-            current_node = self.head
-            while (
-                current_node.next is not None
-                and self.sort_fn(current_node.next.event, new_node.event)
-                != halt_condition
-            ):
-                current_node = current_node.next
-
-            new_node.next = current_node.next
-            if current_node.next is not None:
-                new_node.next.prev = new_node
+        # events are stored tail first, so the new event goes after the last
+        # stored event that would halt the insert
+        if sort_fn is blockchain_sort_fn:
+            # blockchain_sort_fn orders by (slot, tx_sig_index), so plain tuples
+            # can be bisected
+            if order_direction == "asc":
+                self.key = lambda event: (event.slot, event.tx_sig_index)
+                bisect = bisect_left
             else:
-                self.tail = new_node
+                self.key = lambda event: (-event.slot, -event.tx_sig_index)
+                bisect = bisect_right
+        else:
+
+            def compare(new_event: WrappedEvent, event: WrappedEvent) -> int:
+                return -1 if sort_fn(event, new_event) != halt_condition else 1
 
-            current_node.next = new_node
-            new_node.prev = current_node
+            self.key = cmp_to_key(compare)
+            bisect = bisect_right
+
+        self.events = SortedEvents(bisect)
+        # events of every index key, in the same order as the list. None until
+        # the first lookup
+        self.index: Optional[dict[Hashable, SortedEvents]] = None
+
+    @property
+    def head(self) -> Optional[Node]:
+        if not self.size:
+            return None
+        return EventNode(self.events, len(self.events.events) - 1)
+
+    @property
+    def tail(self) -> Optional[Node]:
+        return EventNode(self.events, self.events.start) if self.size else None
+
+    def insert(self, event: WrappedEvent) -> None:
+        key = self.key(event)
+        position = self.events.position(key)
+        if self.size >= self.max_size and position == self.events.start:
+            # the event would become the tail and be evicted right away
+            return
 
+        self.add(event, key, position)
         if self.size > self.max_size:
             self.detach()
 
-    def detach(self) -> None:
-        node = self.tail
-        if node.prev is not None:
-            node.prev.next = node.next
-        else:
-            self.head = node.next
+    def insert_many(self, events: Iterable[WrappedEvent]) -> None:
+        """
+        Inserts every event in order, evicting only once all of them are in.
+        """
+        for event in events:
+            self.add(event, self.key(event))
+        while self.size > self.max_size:
+            self.detach()
 
-        if node.next is not None:
-            node.next.prev = node.prev
-        else:
-            self.tail = node.prev
+    def add(self, event: WrappedEvent, key, position: Optional[int] = None) -> None:
+        self.events.insert(key, event, position)
+        if self.index is not None:
+            for index_key in get_event_index_keys(event):
+                indexed = self.index.get(index_key)
+                if indexed is None:
+                    indexed = self.index[index_key] = SortedEvents(self.events.bisect)
+                indexed.insert(key, event)
+        self.size += 1
 
+    def detach(self) -> None:
+        event = self.events.pop_tail()
         self.size -= 1
+        if self.index is None:
+            return
+        for index_key in get_event_index_keys(event):
+            # index lists share the list's order, so the evicted event is their tail
+            indexed = self.index[index_key]
+            indexed.pop_tail()
+            if not indexed:
+                del self.index[index_key]
+
+    def build_index(self) -> None:
+        self.index = {}
+        events = self.events
+        for position in range(events.start, len(events.events)):
+            key = events.keys[position]
+            event = events.events[position]
+            for index_key in get_event_index_keys(event):
+                indexed = self.index.get(index_key)
+                if indexed is None:
+                    indexed = self.index[index_key] = SortedEvents(events.bisect)
+                # events are visited in the list's order, so each goes last
+                indexed.keys.append(key)
+                indexed.events.append(event)
+
+    def get_by_user(self, user: Union[Pubkey, str]) -> list[WrappedEvent]:
+        if isinstance(user, str):
+            user = Pubkey.from_string(user)
+        return self.get_indexed(("user", user))
+
+    def get_by_market_index(self, market_index: int) -> list[WrappedEvent]:
+        return self.get_indexed(("market_index", market_index))
+
+    def get_by_order_id(
+        self, order_id: int, user: Optional[Union[Pubkey, str]] = None
+    ) -> list[WrappedEvent]:
+        """
+        Order ids are only unique per user, pass `user` to narrow them down.
+        """
+        if user is None:
+            return self.get_indexed(("order_id", order_id))
+        if isinstance(user, str):
+            user = Pubkey.from_string(user)
+        return self.get_indexed(("user_order_id", user, order_id))
+
+    def get_indexed(self, index_key: Hashable) -> list[WrappedEvent]:
+        if self.index is None:
+            self.build_index()
+        indexed = self.index.get(index_key)
+        return [] if indexed is None else indexed.to_list()
 
     def to_array(self) -> list[WrappedEvent]:
-        return list(self)
+        return self.events.to_list()
 
     def __iter__(self):
-        node = self.head
-        while node:
-            yield node.event
-            node = node.next
+        return iter(self.to_array())
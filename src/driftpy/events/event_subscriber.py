@@ -6,7 +6,7 @@ from solana.rpc.async_api import AsyncClient
 from solders.signature import Signature
 
 from driftpy.events.event_list import EventList
-from driftpy.events.parse import parse_logs
+from driftpy.events.parse import EventLogParser
 from driftpy.events.sort import get_sort_fn
 from driftpy.events.tx_event_cache import TxEventCache
 from driftpy.events.types import EventSubscriptionOptions, EventType, WrappedEvent
@@ -31,6 +31,9 @@ class EventSubscriber:
                 self.options.order_dir,
             )
         self.event_parser = EventParser(self.program.program_id, self.program.coder)
+        self.event_log_parser = EventLogParser(
+            self.program, event_names=self.options.event_types
+        )
         self.log_provider = self.options.get_log_provider(connection)
         self.tx_event_cache = TxEventCache(self.options.max_tx)
         self.event_emitter = EventEmitter(("new_event",))
@@ -53,8 +56,13 @@ class EventSubscriber:
             return
 
         wrapped_events = self.parse_events_from_logs(tx_sig, slot, logs)
+        events_by_type: dict[EventType, list[WrappedEvent]] = {}
         for wrapped_event in wrapped_events:
-            self.event_list_map.get(wrapped_event.event_type).insert(wrapped_event)
+            events_by_type.setdefault(wrapped_event.event_type, []).append(
+                wrapped_event
+            )
+        for event_type, events in events_by_type.items():
+            self.event_list_map.get(event_type).insert_many(events)
 
         for wrapped_event in wrapped_events:
             self.event_emitter.new_event(wrapped_event)
@@ -64,18 +72,17 @@ class EventSubscriber:
     def parse_events_from_logs(self, tx_sig: Signature, slot: int, logs: list[str]):
         wrapped_events = []
 
-        events = parse_logs(self.program, logs)
-
-        for index, event in enumerate(events):
-            if event.name in self.event_list_map:
-                wrapped_event = WrappedEvent(
-                    event_type=event.name,
-                    tx_sig=tx_sig,
-                    slot=slot,
-                    tx_sig_index=index,
-                    data=event.data,
-                )
-                wrapped_events.append(wrapped_event)
+        events = self.event_log_parser.parse_indexed_logs(logs)
+
+        for index, event in events:
+            wrapped_event = WrappedEvent(
+                event_type=event.name,
+                tx_sig=tx_sig,
+                slot=slot,
+                tx_sig_index=index,
+                data=event.data,
+            )
+            wrapped_events.append(wrapped_event)
 
         return wrapped_events
 
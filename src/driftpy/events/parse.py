@@ -2,9 +2,11 @@ import binascii
 import re
 import base64
 
-from typing import Tuple, Optional
+from typing import Callable, Iterable, Tuple, Optional
 from anchorpy import Program, Event
 
+from driftpy.events.event_decoder import compile_event_decoder
+
 DRIFT_PROGRAM_ID: str = "dRiftyHA39MWEi3m9aunc5MzRF1JYuBsbn6VPcn33UH"
 DRIFT_PROGRAM_START: str = f"Program {DRIFT_PROGRAM_ID} invoke"
 PROGRAM_LOG: str = "Program log: "
@@ -90,3 +92,86 @@ def handle_system_log(log: str) -> Tuple[Optional[str], bool]:
         return ("cpi", False)
     else:
         return (None, False)
+
+
+SUCCESS_PATTERN = re.compile(r"Program (.*) success")
+
+
+class EventLogParser:
+    """
+    Parses Drift events out of transaction logs, returning the same events as
+    `parse_logs`.
+
+    Invoke / success lines are matched with prefix checks and a precompiled
+    pattern, and event data is dispatched on its discriminator to a decoder
+    compiled from the event's IDL layout (see `compile_event_decoder`). If
+    `event_names` is given, the other events are still counted but not decoded.
+    """
+
+    def __init__(self, program: Program, event_names: Optional[Iterable[str]] = None):
+        self.program = program
+        events = program.coder.events
+        names = None if event_names is None else set(event_names)
+        self.decoders: dict[bytes, Optional[Tuple[str, Callable]]] = {
+            discriminator: (
+                (name, compile_event_decoder(events.layouts[name]))
+                if names is None or name in names
+                else None
+            )
+            for discriminator, name in events.discriminators.items()
+        }
+
+    def parse_logs(self, logs: list[str]) -> list[Event]:
+        return [event for _, event in self.parse_indexed_logs(logs)]
+
+    def parse_indexed_logs(self, logs: list[str]) -> list[Tuple[int, Event]]:
+        """
+        Returns `(index, event)` pairs, where `index` is the event's position in
+        the `parse_logs(program, logs)` result.
+        """
+        events = []
+        index = 0
+        stack: list[str] = []
+        decoders = self.decoders
+        for log in logs:
+            if log.startswith("Log truncated"):
+                break
+
+            if stack and stack[-1] == DRIFT_PROGRAM_ID:
+                if log.startswith(PROGRAM_DATA):
+                    data = log[PROGRAM_DATA_START_INDEX:]
+                elif log.startswith(PROGRAM_LOG):
+                    data = log[PROGRAM_LOG_START_INDEX:]
+                else:
+                    data = None
+                if data is not None:
+                    try:
+                        decoded = base64.b64decode(data)
+                    except binascii.Error:
+                        continue
+                    discriminator = decoded[:8]
+                    if len(decoded) < 8 or discriminator not in decoders:
+                        continue
+                    decoder = decoders[discriminator]
+                    if decoder is not None:
+                        name, decode = decoder
+                        try:
+                            event = Event(data=decode(decoded), name=name)
+                        except Exception:
+                            # malformed data, let anchorpy raise or decode it
+                            event = self.program.coder.events.parse(decoded)
+                        events.append((index, event))
+                    index += 1
+                    continue
+
+            log_start = log.partition(":")[0]
+            if " success" in log_start and SUCCESS_PATTERN.search(log_start):
+                if not stack:
+                    raise ValueError("Expected the stack to have elements")
+                stack.pop()
+            elif log_start.startswith(DRIFT_PROGRAM_START):
+                stack.append(DRIFT_PROGRAM_ID)
+            elif "invoke" in log_start:
+                stack.append("cpi")
+
+        return events
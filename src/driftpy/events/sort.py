@@ -6,11 +6,11 @@ from driftpy.events.types import (
 )
 
 
-def client_sort_asc_fn() -> int:
+def client_sort_asc_fn(current_event: WrappedEvent, new_event: WrappedEvent) -> int:
     return -1
 
 
-def client_sort_desc_fn() -> int:
+def client_sort_desc_fn(current_event: WrappedEvent, new_event: WrappedEvent) -> int:
     return 1
 
 
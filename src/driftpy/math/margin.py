@@ -1,5 +1,6 @@
 import math
 from enum import Enum
+from typing import Callable, Optional, Tuple
 
 from driftpy.constants.numeric_constants import (
     AMM_RESERVE_PRECISION,
@@ -323,3 +324,265 @@ def calculate_market_margin_ratio(
         margin_ratio = max(margin_ratio, custom_margin_ratio)
 
     return margin_ratio
+
+
+def calculate_max_flat_size(is_flat: Callable[[int], bool]) -> int:
+    """
+    The largest size for which `is_flat` holds, for a predicate that holds up
+    to some size and not beyond, e.g. the IMF factor leaving a weight unchanged.
+    -1 when it never holds. Past 2**53 the bound is pulled in a little, as float
+    sizes there may round differently than the integer sizes searched.
+    """
+    if not is_flat(0):
+        return -1
+
+    hi = 1
+    while is_flat(hi):
+        if hi > 2**128:
+            return hi
+        hi *= 2
+
+    lo = hi // 2
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if is_flat(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo - (lo >> 40)
+
+
+class SpotMarketRisk:
+    """
+    The margin parameters of a spot market, derived once per account update.
+    `get_asset_weight` and `get_liability_weight` return exactly what
+    `calculate_asset_weight` and `calculate_liability_weight` do, skipping the
+    size discount or premium for sizes below the first IMF step.
+    """
+
+    def __init__(self, spot_market: SpotMarketAccount):
+        self.spot_market = spot_market
+        self.imf_factor = spot_market.imf_factor
+        self.size_precision = 10**spot_market.decimals
+        self.amm_reserve_precision_ratio = (
+            self.size_precision / AMM_RESERVE_PRECISION
+            if self.size_precision > AMM_RESERVE_PRECISION
+            else None
+        )
+        self.maintenance_asset_weight = spot_market.maintenance_asset_weight
+        self.liability_weights = {
+            MarginCategory.INITIAL: spot_market.initial_liability_weight,
+            MarginCategory.MAINTENANCE: spot_market.maintenance_liability_weight,
+        }
+        self.deposits = (
+            get_token_amount(
+                spot_market.deposit_balance,
+                spot_market,
+                SpotBalanceType.Deposit(),  # type: ignore
+            )
+            if spot_market.scale_initial_asset_weight_start != 0
+            else 0
+        )
+        self.scaled_initial_asset_weight: Optional[Tuple[int, int]] = None
+        self.max_flat_sizes: dict[Tuple[str, int], int] = {}
+
+    def get_size_in_amm_reserve_precision(self, amount: int):
+        if self.amm_reserve_precision_ratio is not None:
+            return amount / self.amm_reserve_precision_ratio
+        return amount * AMM_RESERVE_PRECISION / self.size_precision
+
+    def get_scaled_initial_asset_weight(self, oracle_price: int) -> int:
+        spot_market = self.spot_market
+        if spot_market.scale_initial_asset_weight_start == 0:
+            return spot_market.initial_asset_weight
+
+        if (
+            self.scaled_initial_asset_weight is None
+            or self.scaled_initial_asset_weight[0] != oracle_price
+        ):
+            deposits_value = get_token_value(
+                self.deposits, spot_market.decimals, oracle_price
+            )
+            if deposits_value < spot_market.scale_initial_asset_weight_start:
+                asset_weight = spot_market.initial_asset_weight
+            else:
+                asset_weight = (
+                    spot_market.initial_asset_weight
+                    * spot_market.scale_initial_asset_weight_start
+                    // deposits_value
+                )
+            self.scaled_initial_asset_weight = (oracle_price, asset_weight)
+        return self.scaled_initial_asset_weight[1]
+
+    def get_max_undiscounted_size(self, asset_weight: int) -> int:
+        key = ("asset", asset_weight)
+        if key not in self.max_flat_sizes:
+            self.max_flat_sizes[key] = calculate_max_flat_size(
+                lambda size: calculate_size_discount_asset_weight(
+                    size, self.imf_factor, asset_weight
+                )
+                == asset_weight
+            )
+        return self.max_flat_sizes[key]
+
+    def get_max_unpremium_size(self, liability_weight: int) -> int:
+        key = ("liability", liability_weight)
+        if key not in self.max_flat_sizes:
+            self.max_flat_sizes[key] = calculate_max_flat_size(
+                lambda size: calculate_size_premium_liability_weight(
+                    size, self.imf_factor, liability_weight, SPOT_WEIGHT_PRECISION
+                )
+                == liability_weight
+            )
+        return self.max_flat_sizes[key]
+
+    def get_asset_weight(
+        self, amount: int, oracle_price: int, margin_category: MarginCategory
+    ):
+        match margin_category:
+            case MarginCategory.INITIAL:
+                asset_weight = self.get_scaled_initial_asset_weight(oracle_price)
+            case MarginCategory.MAINTENANCE:
+                asset_weight = self.maintenance_asset_weight
+            case None:
+                return self.get_scaled_initial_asset_weight(oracle_price)
+            case _:
+                raise Exception(f"Invalid margin category: {margin_category}")
+
+        if self.imf_factor == 0:
+            return asset_weight
+
+        size_in_amm_precision = self.get_size_in_amm_reserve_precision(amount)
+        if abs(size_in_amm_precision) <= self.get_max_undiscounted_size(asset_weight):
+            return asset_weight
+
+        return calculate_size_discount_asset_weight(
+            size_in_amm_precision, self.imf_factor, asset_weight
+        )
+
+    def get_liability_weight(
+        self, balance_amount: int, margin_category: MarginCategory
+    ) -> int:
+        liability_weight = self.liability_weights.get(margin_category)
+        if liability_weight is None:
+            return self.spot_market.initial_liability_weight
+
+        if self.imf_factor == 0:
+            return liability_weight
+
+        size_in_amm_reserve_precision = self.get_size_in_amm_reserve_precision(
+            balance_amount
+        )
+        if abs(size_in_amm_reserve_precision) <= self.get_max_unpremium_size(
+            liability_weight
+        ):
+            return liability_weight
+
+        return calculate_size_premium_liability_weight(
+            size_in_amm_reserve_precision,
+            self.imf_factor,
+            liability_weight,
+            SPOT_WEIGHT_PRECISION,
+        )
+
+
+class PerpMarketRisk:
+    """
+    The margin parameters of a perp market, derived once per account update.
+    `get_margin_ratio` returns exactly what `calculate_market_margin_ratio`
+    does, skipping the size premium for sizes below the first IMF step.
+    """
+
+    def __init__(self, perp_market: PerpMarketAccount):
+        self.perp_market = perp_market
+        self.is_settlement = is_variant(perp_market.status, "Settlement")
+        self.has_high_leverage_mode = (
+            perp_market.high_leverage_margin_ratio_initial > 0
+            and perp_market.high_leverage_margin_ratio_maintenance > 0
+        )
+        self.imf_factor = perp_market.imf_factor
+        self.margin_ratios = {
+            MarginCategory.INITIAL: perp_market.margin_ratio_initial,
+            MarginCategory.MAINTENANCE: perp_market.margin_ratio_maintenance,
+        }
+        self.max_flat_sizes: dict[int, int] = {}
+
+    def get_max_unpremium_size(self, margin_ratio: int) -> int:
+        if margin_ratio not in self.max_flat_sizes:
+            self.max_flat_sizes[margin_ratio] = calculate_max_flat_size(
+                lambda size: calculate_size_premium_liability_weight(
+                    size, self.imf_factor, margin_ratio, MARGIN_PRECISION
+                )
+                == margin_ratio
+            )
+        return self.max_flat_sizes[margin_ratio]
+
+    def get_margin_ratio(
+        self,
+        size: int,
+        margin_category: MarginCategory,
+        custom_margin_ratio: int = 0,
+        user_high_leverage_mode: bool = False,
+    ) -> int:
+        if self.is_settlement:
+            return 0
+
+        if user_high_leverage_mode and self.has_high_leverage_mode:
+            return calculate_market_margin_ratio(
+                self.perp_market,
+                size,
+                margin_category,
+                custom_margin_ratio,
+                user_high_leverage_mode,
+            )
+
+        default_margin_ratio = self.margin_ratios.get(margin_category)
+        if default_margin_ratio is None:
+            raise Exception("Invalid margin category")
+
+        if self.imf_factor == 0 or abs(size) <= self.get_max_unpremium_size(
+            default_margin_ratio
+        ):
+            margin_ratio = default_margin_ratio
+        else:
+            margin_ratio = max(
+                default_margin_ratio,
+                calculate_size_premium_liability_weight(
+                    size,
+                    self.imf_factor,
+                    default_margin_ratio,
+                    MARGIN_PRECISION,
+                    True,
+                ),
+            )
+
+        if margin_category == MarginCategory.INITIAL:
+            margin_ratio = max(margin_ratio, custom_margin_ratio)
+
+        return margin_ratio
+
+
+class MarketRiskTable:
+    """
+    `PerpMarketRisk` and `SpotMarketRisk` by market index. An entry is rebuilt
+    when it is asked for with a different market account object than it was
+    built from, i.e. once per market account update.
+    """
+
+    def __init__(self):
+        self.perp_markets: dict[int, PerpMarketRisk] = {}
+        self.spot_markets: dict[int, SpotMarketRisk] = {}
+
+    def get_perp_market_risk(self, perp_market: PerpMarketAccount) -> PerpMarketRisk:
+        perp_market_risk = self.perp_markets.get(perp_market.market_index)
+        if perp_market_risk is None or perp_market_risk.perp_market is not perp_market:
+            perp_market_risk = PerpMarketRisk(perp_market)
+            self.perp_markets[perp_market.market_index] = perp_market_risk
+        return perp_market_risk
+
+    def get_spot_market_risk(self, spot_market: SpotMarketAccount) -> SpotMarketRisk:
+        spot_market_risk = self.spot_markets.get(spot_market.market_index)
+        if spot_market_risk is None or spot_market_risk.spot_market is not spot_market:
+            spot_market_risk = SpotMarketRisk(spot_market)
+            self.spot_markets[spot_market.market_index] = spot_market_risk
+        return spot_market_risk
@@ -96,20 +96,49 @@ def is_resting_limit_order(order: Order, slot: int) -> bool:
     return order.post_only or is_auction_complete(order, slot)
 
 
+def get_resting_limit_order_slot(order: Order) -> Optional[int]:
+    """
+    First slot at which `is_resting_limit_order` holds for the order, or None if
+    it never does.
+    """
+    if not is_limit_order(order):
+        return None
+
+    if is_variant(order.order_type, "TriggerLimit"):
+        if is_variant(order.direction, "Long") and order.trigger_price < order.price:
+            return None
+        elif is_variant(order.direction, "Short") and order.trigger_price > order.price:
+            return None
+    elif order.post_only:
+        return 0
+
+    if order.auction_duration == 0:
+        return 0
+
+    return order.slot + order.auction_duration + 1
+
+
 def is_order_expired(order: Order, ts: int, enforce_buffer: bool = False) -> bool:
+    max_ts = get_order_max_ts(order, enforce_buffer)
+    return max_ts is not None and ts > max_ts
+
+
+def get_order_max_ts(order: Order, enforce_buffer: bool = False) -> Optional[int]:
+    """
+    Last ts before `is_order_expired` holds for the order, or None if it never
+    expires.
+    """
     if (
         must_be_triggered(order)
         or not is_variant(order.status, "Open")
         or order.max_ts == 0
     ):
-        return False
+        return None
 
     if enforce_buffer and is_limit_order(order):
-        max_ts = order.max_ts + 15
-    else:
-        max_ts = order.max_ts
+        return order.max_ts + 15
 
-    return ts > max_ts
+    return order.max_ts
 
 
 def is_taking_order(order: Order, slot: int) -> bool:
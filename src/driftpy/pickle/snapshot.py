@@ -0,0 +1,152 @@
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from solders.pubkey import Pubkey
+
+# file layout:
+#   header | index (one entry per account) | account bytes, stored contiguously
+SNAPSHOT_MAGIC = b"DRIFTSNP"
+SNAPSHOT_VERSION = 1
+# magic, version, compression, slot, number of accounts
+SNAPSHOT_HEADER_STRUCT = struct.Struct("<8sHHQI4x")
+# pubkey, data offset, stored length, decompressed length
+SNAPSHOT_INDEX_STRUCT = struct.Struct("<32sQII")
+
+COMPRESSION_NONE = 0
+# zlib at level 1, compressed per account so accounts can be read independently
+COMPRESSION_ZLIB = 1
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def is_snapshot(filename: str) -> bool:
+    with open(filename, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def write_snapshot(
+    filename: str,
+    slot: int,
+    accounts: Iterable[Tuple[Union[str, Pubkey], Buffer]],
+    compress: bool = False,
+):
+    """
+    Writes `(pubkey, account bytes)` pairs to a snapshot file that can be
+    memory-mapped by `Snapshot`.
+
+    The file is written next to `filename` and moved over it once complete, so
+    a `Snapshot` of the file it replaces, and the views into it, stay valid.
+    """
+    index = []
+    chunks = []
+    offset = 0
+    for pubkey, data in accounts:
+        if isinstance(pubkey, str):
+            pubkey = Pubkey.from_string(pubkey)
+        stored = zlib.compress(data, level=1) if compress else data
+        index.append((bytes(pubkey), offset, len(stored), len(data)))
+        chunks.append(stored)
+        offset += len(stored)
+
+    data_start = SNAPSHOT_HEADER_STRUCT.size + SNAPSHOT_INDEX_STRUCT.size * len(index)
+    tmp_filename = f"{filename}.tmp"
+    try:
+        with open(tmp_filename, "wb") as f:
+            f.write(
+                SNAPSHOT_HEADER_STRUCT.pack(
+                    SNAPSHOT_MAGIC,
+                    SNAPSHOT_VERSION,
+                    COMPRESSION_ZLIB if compress else COMPRESSION_NONE,
+                    slot,
+                    len(index),
+                )
+            )
+            for pubkey, offset, length, raw_length in index:
+                f.write(
+                    SNAPSHOT_INDEX_STRUCT.pack(
+                        pubkey, data_start + offset, length, raw_length
+                    )
+                )
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+
+class Snapshot:
+    """
+    Read-only view over a snapshot file. Only the header and index are parsed on
+    open; account bytes are read from the memory map on access.
+
+    Uncompressed accounts are returned as memoryviews into the map, so the
+    snapshot must stay open for as long as they are in use. `close` releases
+    the map once they are not, and a snapshot can be used as a context manager.
+    """
+
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.compression, self.slot, count = (
+            SNAPSHOT_HEADER_STRUCT.unpack_from(self.mmap, 0)
+        )
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{filename} is not a snapshot file")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+
+        self.view = memoryview(self.mmap)
+        self.index: Dict[str, Tuple[int, int]] = {}
+        for pubkey, offset, length, _ in SNAPSHOT_INDEX_STRUCT.iter_unpack(
+            self.view[
+                SNAPSHOT_HEADER_STRUCT.size : SNAPSHOT_HEADER_STRUCT.size
+                + SNAPSHOT_INDEX_STRUCT.size * count
+            ]
+        ):
+            self.index[str(Pubkey.from_bytes(pubkey))] = (offset, length)
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file. Raises `BufferError` while views into it returned by
+        `get`, `read` or `items` are still alive.
+        """
+        self.view.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            self.view = memoryview(self.mmap)
+            raise
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, pubkey: str) -> bool:
+        return pubkey in self.index
+
+    def get(self, pubkey: str) -> Optional[Buffer]:
+        entry = self.index.get(pubkey)
+        if entry is None:
+            return None
+        return self.read(*entry)
+
+    def read(self, offset: int, length: int) -> Buffer:
+        data = self.view[offset : offset + length]
+        if self.compression == COMPRESSION_ZLIB:
+            return zlib.decompress(data)
+        return data
+
+    def items(self) -> Iterator[Tuple[str, Buffer]]:
+        for pubkey, entry in self.index.items():
+            yield pubkey, self.read(*entry)
@@ -28,7 +28,14 @@ class Vat:
         self.perp_oracles = {}
         self.spot_oracles = {}
 
-    async def pickle(self, file_prefix: Optional[str] = None) -> dict[str, str]:
+    async def pickle(
+        self, file_prefix: Optional[str] = None, snapshot: bool = False
+    ) -> dict[str, str]:
+        """
+        Dumps users, user stats, markets and oracles to files.
+        If `snapshot` is True, users are written in the memory-mapped snapshot
+        format (see `driftpy.pickle.snapshot`), which `unpickle` memory-maps.
+        """
         users_sync = asyncio.create_task(self.users.sync())
         user_stats_sync = asyncio.create_task(self.user_stats.sync())
         spot_markets_pre_dump = asyncio.create_task(self.spot_markets.pre_dump())
@@ -46,9 +53,12 @@ class Vat:
         spot_market_raw = spot_markets_pre_dump.result()
         perp_market_raw = perp_markets_pre_dump.result()
 
-        filenames = self.get_filenames(file_prefix)
+        filenames = self.get_filenames(file_prefix, snapshot)
 
-        self.users.dump(filenames["users"])
+        if snapshot:
+            self.users.dump_snapshot(filenames["users"])
+        else:
+            self.users.dump(filenames["users"])
 
         self.user_stats.dump(filenames["userstats"])
 
@@ -145,8 +155,11 @@ class Vat:
         else:
             raise FileNotFoundError(f"File {spot_filename} not found")
 
-    def get_filenames(self, prefix: Optional[str]) -> dict[str, str]:
+    def get_filenames(
+        self, prefix: Optional[str], snapshot: bool = False
+    ) -> dict[str, str]:
         filenames = {}
+        users_ext = "snap" if snapshot else "pkl"
 
         usermap_slot = self.users.get_slot()
         userstats_slot = self.user_stats.latest_slot
@@ -155,14 +168,14 @@ class Vat:
         oracle_slot = self.last_oracle_slot
 
         if prefix:
-            filenames["users"] = f"{prefix}usermap_{usermap_slot}.pkl"
+            filenames["users"] = f"{prefix}usermap_{usermap_slot}.{users_ext}"
             filenames["userstats"] = f"{prefix}userstats_{userstats_slot}.pkl"
             filenames["spot_markets"] = f"{prefix}spot_{spot_markets_slot}.pkl"
             filenames["perp_markets"] = f"{prefix}perp_{perp_markets_slot}.pkl"
             filenames["spot_oracles"] = f"{prefix}spotoracles_{oracle_slot}.pkl"
             filenames["perp_oracles"] = f"{prefix}perporacles_{oracle_slot}.pkl"
         else:
-            filenames["users"] = f"usermap_{usermap_slot}.pkl"
+            filenames["users"] = f"usermap_{usermap_slot}.{users_ext}"
             filenames["userstats"] = f"userstats_{userstats_slot}.pkl"
             filenames["spot_markets"] = f"spot_{spot_markets_slot}.pkl"
             filenames["perp_markets"] = f"perp_{perp_markets_slot}.pkl"
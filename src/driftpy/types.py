@@ -12,7 +12,21 @@ from sumtypes import constructor
 from typing_extensions import NotRequired
 
 
-def is_variant(enum, _type: str) -> bool:
+_variant_tags: dict[str, int] = {}
+
+
+def variant_tag(_type: str) -> int:
+    """
+    Interned integer tag for a variant name, shared by every sumtype variant class
+    with that name.
+    """
+    tag = _variant_tags.get(_type)
+    if tag is None:
+        tag = _variant_tags.setdefault(_type, len(_variant_tags))
+    return tag
+
+
+def _check_variant_instance(enum):
     if isinstance(enum, py_enum.EnumMeta):
         raise TypeError(
             f"is_variant expected a sumtypes variant instance, got Enum class {enum}"
@@ -26,7 +40,39 @@ def is_variant(enum, _type: str) -> bool:
             "enum.__class__.__name__ is 'type' You most likely passed the class itself rather than an instance. Use the instance instead for example MarketType.Perp() instead of MarketType.Perp"
         )
 
-    return _type == enum.__class__.__name__
+
+def get_variant_tag(enum) -> int:
+    """
+    Integer tag of a sumtype variant instance, cached on the variant class the first
+    time the class is seen so later checks skip validation and name lookups.
+    """
+    variant_class = type(enum)
+    try:
+        return variant_class._variant_tag
+    except AttributeError:
+        pass
+
+    _check_variant_instance(enum)
+    tag = variant_tag(variant_class.__name__)
+    try:
+        variant_class._variant_tag = tag
+    except TypeError:
+        # builtins such as int can't hold the cache, fall back to the name
+        return tag
+    # fieldless variants always render the same, so is_one_of_variant results
+    # can be memoized per class
+    if not getattr(enum, "_sumtype_attribs", None):
+        variant_class._one_of_variant_cache = {}
+    return tag
+
+
+def is_variant(enum, _type: str) -> bool:
+    try:
+        tag = type(enum)._variant_tag
+    except AttributeError:
+        tag = get_variant_tag(enum)
+    # names that were never interned can't match any variant
+    return tag == _variant_tags.get(_type)
 
 
 def is_variant_str(enum, type: str) -> bool:
@@ -34,7 +80,21 @@ def is_variant_str(enum, type: str) -> bool:
 
 
 def is_one_of_variant(enum, types):
-    return any(type in str(enum) for type in types)
+    # matches on the variant's string form, e.g. "Market" also matches
+    # OrderType.TriggerMarket(), so results are cached rather than re-derived
+    try:
+        cache = type(enum)._one_of_variant_cache
+    except AttributeError:
+        get_variant_tag(enum)
+        cache = getattr(type(enum), "_one_of_variant_cache", None)
+        if cache is None:
+            return any(type in str(enum) for type in types)
+
+    key = tuple(types)
+    result = cache.get(key)
+    if result is None:
+        result = cache[key] = any(type in str(enum) for type in key)
+    return result
 
 
 def get_ws_url(url: str) -> str:
@@ -0,0 +1,79 @@
+import asyncio
+import base64
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+DEFAULT_SHARD_SIZE = 1000
+
+
+def b64decode_shard(payloads: List[str]) -> List[bytes]:
+    return [base64.b64decode(payload) for payload in payloads]
+
+
+class DecodePool:
+    """
+    Base64-decodes getProgramAccounts payloads in a ProcessPoolExecutor.
+
+    Workers hand back the raw account bytes rather than decoded accounts:
+    solders Pubkeys and sumtypes variants can't be pickled, and raw bytes are the
+    cheapest thing to send across processes. Shards are yielded as they complete,
+    so callers decode one shard on the loop while the workers are still busy with
+    the next and the loop gets a chance to run other tasks in between.
+    """
+
+    def __init__(self, max_workers: int, shard_size: int = DEFAULT_SHARD_SIZE):
+        self.max_workers = max_workers
+        self.shard_size = shard_size
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def b64decode(
+        self, payloads: List[str]
+    ) -> AsyncIterator[Tuple[int, List[bytes]]]:
+        """
+        Yields `(start, raw)` for every shard of `payloads`, where `raw[i]` is the
+        decoded `payloads[start + i]`. Shards are yielded in completion order.
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.max_workers)
+
+        loop = asyncio.get_running_loop()
+
+        async def decode_shard(start: int) -> Tuple[int, List[bytes]]:
+            shard = payloads[start : start + self.shard_size]
+            raw = await loop.run_in_executor(self.executor, b64decode_shard, shard)
+            return start, raw
+
+        tasks = [
+            decode_shard(start) for start in range(0, len(payloads), self.shard_size)
+        ]
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+async def iter_program_accounts(
+    values: list, pool: Optional[DecodePool] = None
+) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    Yields `(pubkey, raw_bytes)` for every account of a base64 encoded
+    getProgramAccounts response, decoding on the loop if no pool is given.
+    """
+    if pool is None:
+        for program_account in values:
+            yield (
+                program_account["pubkey"],
+                base64.b64decode(program_account["account"]["data"][0]),
+            )
+        return
+
+    pubkeys = [program_account["pubkey"] for program_account in values]
+    payloads = [program_account["account"]["data"][0] for program_account in values]
+    async for start, raw in pool.b64decode(payloads):
+        for i, raw_bytes in enumerate(raw, start):
+            yield pubkeys[i], raw_bytes
+        # let the loop breathe between shards
+        await asyncio.sleep(0)
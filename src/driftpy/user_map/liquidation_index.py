@@ -0,0 +1,245 @@
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from solders.pubkey import Pubkey
+
+from driftpy.constants.numeric_constants import QUOTE_SPOT_MARKET_INDEX
+from driftpy.drift_user import DriftUser
+from driftpy.user_map.risk_engine import RiskEngine
+
+
+class LiquidationCandidateIndex:
+    """
+    Keeps the users that can be liquidated, re-evaluating only the users an
+    oracle move may have liquidated instead of scanning every user.
+
+    Each user is filed under the oracle of every position it has, in the band
+    of its estimated liquidation price on that oracle, or of the oracle price
+    for positions with open orders. Bands are geometric, `bucket_width` wide
+    (0.5% by default). When an oracle moves, the users in the bands between
+    its previous and current price are re-evaluated, along with the users that
+    changed and the users that could already be liquidated.
+
+    The estimates are linear, so positions whose margin isn't, e.g. with size
+    premiums, can drift from them. `refresh` re-evaluates every user and
+    should be run from time to time, `UserMap` does every
+    `liquidation_index_refresh_syncs` syncs.
+    """
+
+    def __init__(self, drift_client, bucket_width: float = 0.005):
+        self.drift_client = drift_client
+        self.risk_engine = RiskEngine(drift_client)
+        self.log_bucket_width = math.log1p(bucket_width)
+        self.users: Dict[str, DriftUser] = {}
+        # keys of the users added or changed since the last evaluation
+        self.pending: Set[str] = set()
+        self.liquidatable: Set[str] = set()
+        # oracle -> band -> keys of the users filed in it
+        self.buckets: Dict[Pubkey, Dict[int, Set[str]]] = {}
+        self.user_buckets: Dict[str, Set[Tuple[Pubkey, int]]] = {}
+        # oracle -> (is perp market, market index) to read its price from
+        self.oracle_markets: Dict[Pubkey, Tuple[bool, int]] = {}
+        # oracle -> price at the last evaluation
+        self.oracle_prices: Dict[Pubkey, int] = {}
+        # number of users re-evaluated by the last get_liquidation_candidates
+        self.last_evaluated = 0
+
+    def get_bucket(self, price) -> int:
+        return math.floor(math.log(max(price, 1)) / self.log_bucket_width)
+
+    def get_oracle(self, is_perp: bool, market_index: int) -> Pubkey:
+        if is_perp:
+            oracle = self.drift_client.get_perp_market_account(market_index).amm.oracle
+        else:
+            oracle = self.drift_client.get_spot_market_account(market_index).oracle
+        if oracle not in self.oracle_markets:
+            self.oracle_markets[oracle] = (is_perp, market_index)
+            self.oracle_prices[oracle] = self.get_oracle_price(oracle)
+        return oracle
+
+    def get_oracle_price(self, oracle: Pubkey) -> int:
+        is_perp, market_index = self.oracle_markets[oracle]
+        if is_perp:
+            return self.drift_client.get_oracle_price_data_for_perp_market(
+                market_index
+            ).price
+        return self.drift_client.get_oracle_price_data_for_spot_market(
+            market_index
+        ).price
+
+    def update_user(self, key: str, user: DriftUser):
+        """
+        Adds `user`, keyed as in `UserMap`, or marks it changed. It is
+        evaluated by the next `get_liquidation_candidates`.
+        """
+        self.users[key] = user
+        self.pending.add(key)
+
+    def remove_user(self, key: str):
+        self.users.pop(key, None)
+        self.pending.discard(key)
+        self.liquidatable.discard(key)
+        self.remove_user_buckets(key)
+
+    def remove_user_buckets(self, key: str):
+        for oracle, bucket in self.user_buckets.pop(key, ()):
+            oracle_buckets = self.buckets[oracle]
+            oracle_buckets[bucket].discard(key)
+            if not oracle_buckets[bucket]:
+                del oracle_buckets[bucket]
+
+    def refresh(self):
+        self.pending.update(self.users)
+
+    def evaluate_users(self, keys: Iterable[str], now: Optional[int] = None):
+        keys = list(keys)
+        if not keys:
+            return
+
+        risk = self.risk_engine.get_user_risk([self.users[key] for key in keys], now)
+
+        # users that can be liquidated are re-evaluated by every call, so they
+        # aren't filed. For the others, liquidation prices are where the
+        # maintenance collateral runs out, but `can_be_liquidated` weighs the
+        # collateral with initial weights, which runs out first: the distance
+        # to each price is scaled down by the share of the maintenance free
+        # collateral it leaves
+        distance_scales = {}
+        free_collateral = (
+            risk.total_collateral - risk.maintenance_margin_requirement
+        ).tolist()
+        liquidation_margin = risk.liquidation_margin.tolist()
+        for i, can_be_liquidated in enumerate(risk.can_be_liquidated.tolist()):
+            key = keys[i]
+            self.remove_user_buckets(key)
+            if can_be_liquidated:
+                self.liquidatable.add(key)
+                continue
+
+            self.liquidatable.discard(key)
+            self.user_buckets[key] = set()
+            if (
+                self.users[key].is_being_liquidated()
+                or free_collateral[i] <= 0
+                or liquidation_margin[i] <= 0
+            ):
+                distance_scales[key] = 0
+            else:
+                distance_scales[key] = min(
+                    1, liquidation_margin[i] / free_collateral[i]
+                )
+
+        keys = list(distance_scales)
+        if not keys:
+            return
+        users = [self.users[key] for key in keys]
+        keys_by_public_key = {
+            user.user_public_key: key for key, user in zip(keys, users)
+        }
+        liquidation_prices = self.risk_engine.get_liquidation_prices(users, now)
+
+        # key -> oracle -> distance from its price to the nearest liquidation
+        # price of the positions on it. Liquidation prices leave out open
+        # orders, so it is 0 where the user has orders, as where it has a
+        # position without a price, and any move out of the band of the
+        # oracle price re-evaluates it
+        distances: Dict[str, Dict[Pubkey, Optional[float]]] = {}
+        for key, user in zip(keys, users):
+            user_distances = distances[key] = {}
+            user_account = user.get_user_account()
+            for is_perp, positions in (
+                (True, user_account.perp_positions),
+                (False, user_account.spot_positions),
+            ):
+                for position in positions:
+                    if not is_perp and position.market_index == QUOTE_SPOT_MARKET_INDEX:
+                        continue
+                    has_orders = (
+                        position.open_orders != 0
+                        or position.open_bids != 0
+                        or position.open_asks != 0
+                    )
+                    if is_perp:
+                        has_position = (
+                            position.base_asset_amount != 0
+                            or position.quote_asset_amount != 0
+                        )
+                    else:
+                        has_position = position.scaled_balance != 0
+                    if has_orders:
+                        oracle = self.get_oracle(is_perp, position.market_index)
+                        user_distances[oracle] = 0
+                    elif has_position:
+                        oracle = self.get_oracle(is_perp, position.market_index)
+                        user_distances.setdefault(oracle, None)
+
+        for is_perp, public_keys, market_indexes, liq_prices in (
+            (
+                True,
+                liquidation_prices.perp_user_public_keys,
+                liquidation_prices.perp_market_indexes.tolist(),
+                liquidation_prices.perp_liq_prices.tolist(),
+            ),
+            (
+                False,
+                liquidation_prices.spot_user_public_keys,
+                liquidation_prices.spot_market_indexes.tolist(),
+                liquidation_prices.spot_liq_prices.tolist(),
+            ),
+        ):
+            for public_key, market_index, liq_price in zip(
+                public_keys, market_indexes, liq_prices
+            ):
+                oracle = self.get_oracle(is_perp, market_index)
+                user_distances = distances[keys_by_public_key[public_key]]
+                nearest = user_distances[oracle]
+                if nearest == 0:
+                    continue
+                # -1 where moving the oracle alone down to 0 doesn't liquidate
+                distance = self.oracle_prices[oracle] - max(liq_price, 0)
+                if nearest is None or abs(distance) < abs(nearest):
+                    user_distances[oracle] = distance
+
+        # each estimate holds the other oracles fixed, so the collateral is
+        # split evenly between the oracles of a user: it can't be liquidated
+        # before one of them moves past its share
+        for key, user_distances in distances.items():
+            if not user_distances:
+                continue
+            distance_scale = distance_scales[key] / len(user_distances)
+            for oracle, distance in user_distances.items():
+                bucket = self.get_bucket(
+                    self.oracle_prices[oracle] - (distance or 0) * distance_scale
+                )
+                self.buckets.setdefault(oracle, {}).setdefault(bucket, set()).add(key)
+                self.user_buckets[key].add((oracle, bucket))
+
+    def get_liquidation_candidates(self, now: Optional[int] = None) -> List[DriftUser]:
+        """
+        The users that can be liquidated at the current oracle prices. Only the
+        users in the bands crossed since the last call, the users updated since
+        and the users that could already be liquidated are re-evaluated.
+        """
+        keys = self.pending | self.liquidatable
+        self.pending = set()
+        for oracle, last_price in self.oracle_prices.items():
+            price = self.get_oracle_price(oracle)
+            if price == last_price:
+                continue
+            self.oracle_prices[oracle] = price
+
+            oracle_buckets = self.buckets.get(oracle)
+            if not oracle_buckets:
+                continue
+            low, high = sorted((self.get_bucket(last_price), self.get_bucket(price)))
+            if high - low < len(oracle_buckets):
+                for bucket in range(low, high + 1):
+                    keys.update(oracle_buckets.get(bucket, ()))
+            else:
+                for bucket, bucket_keys in oracle_buckets.items():
+                    if low <= bucket <= high:
+                        keys.update(bucket_keys)
+
+        self.last_evaluated = len(keys)
+        self.evaluate_users(keys, now)
+        return [self.users[key] for key in self.liquidatable]
@@ -0,0 +1,954 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+from driftpy.constants.numeric_constants import (
+    AMM_RESERVE_PRECISION,
+    BASE_PRECISION,
+    FIVE_MINUTE,
+    FUNDING_RATE_BUFFER,
+    MARGIN_PRECISION,
+    MAX_PREDICTION_PRICE,
+    OPEN_ORDER_MARGIN_REQUIREMENT,
+    PRICE_PRECISION,
+    QUOTE_PRECISION,
+    QUOTE_SPOT_MARKET_INDEX,
+    SPOT_IMF_PRECISION,
+    SPOT_MARKET_WEIGHT_PRECISION,
+    SPOT_WEIGHT_PRECISION,
+)
+from driftpy.drift_user import DriftUser
+from driftpy.math.margin import (
+    MarginCategory,
+    calculate_net_user_pnl_imbalance,
+)
+from driftpy.math.oracles import calculate_live_oracle_twap
+from driftpy.math.spot_market import get_signed_token_amount, get_token_amount
+from driftpy.math.spot_position import is_spot_position_available
+from driftpy.types import (
+    PerpMarketAccount,
+    SpotMarketAccount,
+    SpotPosition,
+    UserStatus,
+    is_variant,
+)
+
+ceil = np.frompyfunc(math.ceil, 1, 1)
+to_int = np.frompyfunc(int, 1, 1)
+to_rounded = np.frompyfunc(round, 1, 1)
+
+
+def object_array(values) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def sum_by_user(terms: np.ndarray, owners: np.ndarray, num_users: int) -> np.ndarray:
+    """
+    Adds up the terms of every user in order, as the loops of `DriftUser` do, so
+    sums of float terms round the same way. `owners` must be sorted.
+    """
+    totals = np.zeros(num_users, dtype=object)
+    if len(terms):
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        totals[owners[starts]] = np.add.reduceat(terms, starts)
+    return totals
+
+
+def size_discount_asset_weights(size, imf_factor, asset_weight):
+    size_sqrt = ceil(np.power(np.abs(size) * 10, 0.5)) + 1
+    imf_num = SPOT_IMF_PRECISION + (SPOT_IMF_PRECISION / 10)
+    size_discount_asset_weight = ceil(
+        imf_num
+        * SPOT_WEIGHT_PRECISION
+        / (SPOT_IMF_PRECISION + size_sqrt * imf_factor / 100_000)
+    )
+    return np.where(
+        imf_factor == 0,
+        asset_weight,
+        np.minimum(asset_weight, size_discount_asset_weight),
+    )
+
+
+def size_premium_liability_weights(size, imf_factor, liability_weight, precision):
+    size_sqrt = np.power(np.abs(size) * 10 + 1, 0.5)
+    liability_weight_numerator = liability_weight - (liability_weight // 5)
+    denom = (100_000 * SPOT_IMF_PRECISION) // precision
+    size_premium_liability_weight = liability_weight_numerator + (
+        (size_sqrt * imf_factor) // denom
+    )
+    return np.where(
+        imf_factor == 0,
+        liability_weight,
+        np.maximum(liability_weight, size_premium_liability_weight),
+    )
+
+
+@dataclass
+class UserRisk:
+    user_public_keys: List[Pubkey]
+    # maintenance total collateral and margin requirement, the requirement
+    # including the liquidation buffer for users being liquidated
+    total_collateral: np.ndarray
+    maintenance_margin_requirement: np.ndarray
+    health: np.ndarray
+    free_collateral: np.ndarray
+    can_be_liquidated: np.ndarray
+    # the collateral `can_be_liquidated` compares with the maintenance margin
+    # requirement, less that requirement: negative when it can be liquidated
+    liquidation_margin: np.ndarray
+
+
+@dataclass
+class LiquidationPrices:
+    # one row per position: its user, market and liquidation price, -1 where
+    # no price move liquidates it, as in DriftUser
+    perp_user_public_keys: List[Pubkey]
+    perp_market_indexes: np.ndarray
+    perp_liq_prices: np.ndarray
+    spot_user_public_keys: List[Pubkey]
+    spot_market_indexes: np.ndarray
+    spot_liq_prices: np.ndarray
+
+
+def get_signed_spot_token_amount(
+    spot_position: SpotPosition, spot_market: SpotMarketAccount
+) -> int:
+    return get_signed_token_amount(
+        get_token_amount(
+            spot_position.scaled_balance, spot_market, spot_position.balance_type
+        ),
+        spot_position.balance_type,
+    )
+
+
+def calculate_liq_price(
+    free_collateral: int, free_collateral_delta: Optional[int], oracle_price: int
+) -> int:
+    if not free_collateral_delta:
+        return -1
+
+    liq_price_delta = (free_collateral * QUOTE_PRECISION) // free_collateral_delta
+    liq_price = oracle_price - liq_price_delta
+    if liq_price < 0:
+        return -1
+
+    return liq_price
+
+
+class PerpPositions:
+    """
+    The active perp positions of many users, one array entry per position,
+    joined with the accounts and oracle prices of their markets.
+    """
+
+    def __init__(self, drift_client, positions: List[tuple], num_users: int):
+        self.num_users = num_users
+        columns = list(zip(*positions)) or [()] * 9
+        self.owners = np.array(columns[0], dtype=np.int64)
+        market_indexes = np.array(columns[1], dtype=np.int64)
+        (
+            self.base,
+            self.quote,
+            self.open_bids,
+            self.open_asks,
+            self.open_orders,
+            self.last_funding_rate,
+            self.max_margin_ratio,
+        ) = map(object_array, columns[2:])
+
+        quote_spot_market = drift_client.get_spot_market_account(
+            QUOTE_SPOT_MARKET_INDEX
+        )
+        quote_price = drift_client.get_oracle_price_data_for_spot_market(
+            QUOTE_SPOT_MARKET_INDEX
+        ).price
+
+        markets: Dict[int, tuple] = {}
+        for market_index in np.unique(market_indexes).tolist():
+            market = drift_client.get_perp_market_account(market_index)
+            oracle_price_data = drift_client.get_oracle_price_data_for_perp_market(
+                market_index
+            )
+            is_settlement = is_variant(market.status, "Settlement")
+
+            unrealized_initial_weight = market.unrealized_pnl_initial_asset_weight
+            if market.unrealized_pnl_max_imbalance > 0:
+                net_unsettled_pnl = calculate_net_user_pnl_imbalance(
+                    market, quote_spot_market, oracle_price_data
+                )
+                if net_unsettled_pnl > market.unrealized_pnl_max_imbalance:
+                    unrealized_initial_weight = (
+                        unrealized_initial_weight
+                        * market.unrealized_pnl_max_imbalance
+                        / net_unsettled_pnl
+                    )
+
+            strict_quote_price = max(
+                quote_price,
+                drift_client.get_spot_market_account(
+                    market.quote_spot_market_index
+                ).historical_oracle_data.last_oracle_price_twap5min,
+            )
+
+            markets[market_index] = (
+                market.expiry_price if is_settlement else oracle_price_data.price,
+                is_settlement,
+                is_variant(market.contract_type, "Prediction"),
+                market.margin_ratio_initial,
+                market.margin_ratio_maintenance,
+                market.imf_factor,
+                market.amm.cumulative_funding_rate_long,
+                market.amm.cumulative_funding_rate_short,
+                unrealized_initial_weight,
+                market.unrealized_pnl_maintenance_asset_weight,
+                market.unrealized_pnl_imf_factor,
+                strict_quote_price,
+            )
+
+        (
+            self.valuation_price,
+            self.is_settlement,
+            self.is_prediction,
+            self.margin_ratio_initial,
+            self.margin_ratio_maintenance,
+            self.imf_factor,
+            self.funding_rate_long,
+            self.funding_rate_short,
+            self.unrealized_initial_weight,
+            self.unrealized_maintenance_weight,
+            self.unrealized_imf_factor,
+            self.strict_quote_price,
+        ) = join_markets(markets, market_indexes, 12)
+        self.is_settlement = self.is_settlement.astype(bool)
+        self.is_prediction = self.is_prediction.astype(bool)
+        self.quote_price = quote_price
+
+    def get_liability_values(self, base_asset_amount):
+        return np.where(
+            self.is_prediction,
+            np.where(
+                base_asset_amount > 0,
+                (base_asset_amount * self.valuation_price) // BASE_PRECISION,
+                (
+                    np.abs(base_asset_amount)
+                    * (MAX_PREDICTION_PRICE - self.valuation_price)
+                )
+                // BASE_PRECISION,
+            ),
+            (np.abs(base_asset_amount) * self.valuation_price) // BASE_PRECISION,
+        )
+
+    def get_margin_requirement(
+        self,
+        margin_category: MarginCategory,
+        liquidation_buffers: np.ndarray,
+        strict: bool = False,
+    ) -> np.ndarray:
+        """
+        `DriftUser.get_total_perp_position_liability` with open orders, per user.
+        """
+        all_bids = self.base + self.open_bids
+        all_asks = self.base + self.open_asks
+        all_bids_liability_value = self.get_liability_values(all_bids)
+        all_asks_liability_value = self.get_liability_values(all_asks)
+        use_asks = all_asks_liability_value >= all_bids_liability_value
+        base_asset_amount = np.where(use_asks, all_asks, all_bids)
+        liability_value = np.where(
+            use_asks, all_asks_liability_value, all_bids_liability_value
+        )
+
+        if margin_category == MarginCategory.INITIAL:
+            default_margin_ratio = self.margin_ratio_initial
+        else:
+            default_margin_ratio = self.margin_ratio_maintenance
+        margin_ratio = np.maximum(
+            default_margin_ratio,
+            size_premium_liability_weights(
+                np.abs(base_asset_amount),
+                self.imf_factor,
+                default_margin_ratio,
+                MARGIN_PRECISION,
+            ),
+        )
+        if margin_category == MarginCategory.INITIAL:
+            margin_ratio = np.maximum(margin_ratio, self.max_margin_ratio)
+        margin_ratio = np.where(
+            self.is_settlement, 0, margin_ratio + liquidation_buffers
+        )
+
+        quote_price = self.strict_quote_price if strict else self.quote_price
+        liability_value = (
+            liability_value * quote_price // PRICE_PRECISION * margin_ratio
+        ) // MARGIN_PRECISION + self.open_orders * OPEN_ORDER_MARGIN_REQUIREMENT
+        return sum_by_user(liability_value, self.owners, self.num_users)
+
+    def get_unrealized_pnl(self, margin_category: MarginCategory) -> np.ndarray:
+        """
+        `DriftUser.get_unrealized_pnl` with funding, weighted for
+        `margin_category`, per user.
+        """
+        base_asset_value = (
+            np.abs(self.base) * self.valuation_price
+        ) // AMM_RESERVE_PRECISION
+        funding_rate = np.where(
+            self.base > 0, self.funding_rate_long, self.funding_rate_short
+        )
+        funding_pnl = (
+            (funding_rate - self.last_funding_rate)
+            * self.base
+            / AMM_RESERVE_PRECISION
+            / FUNDING_RATE_BUFFER
+            * -1
+        )
+        pnl = np.where(
+            self.base == 0,
+            self.quote,
+            base_asset_value * np.where(self.base < 0, -1, 1)
+            + self.quote
+            + funding_pnl,
+        )
+        pnl = (pnl * self.quote_price) // PRICE_PRECISION
+
+        if margin_category == MarginCategory.INITIAL:
+            weight = size_discount_asset_weights(
+                pnl, self.unrealized_imf_factor, self.unrealized_initial_weight
+            )
+        else:
+            weight = self.unrealized_maintenance_weight
+        pnl = np.where(pnl > 0, pnl * weight // SPOT_MARKET_WEIGHT_PRECISION, pnl)
+        return sum_by_user(pnl, self.owners, self.num_users)
+
+
+class SpotPositions:
+    """
+    The spot positions in use of many users, one array entry per position,
+    joined with the accounts and oracle prices of their markets.
+    """
+
+    def __init__(
+        self,
+        drift_client,
+        positions: List[tuple],
+        num_users: int,
+        now: int,
+    ):
+        self.num_users = num_users
+        columns = list(zip(*positions)) or [()] * 9
+        self.owners = np.array(columns[0], dtype=np.int64)
+        market_indexes = np.array(columns[1], dtype=np.int64)
+        self.is_borrow = np.array(columns[2], dtype=bool)
+        (
+            self.scaled_balance,
+            self.open_bids,
+            self.open_asks,
+            self.open_orders,
+            self.max_margin_ratio,
+            self.max_margin_ratio_is_set,
+        ) = map(object_array, columns[3:])
+        self.max_margin_ratio_is_set = self.max_margin_ratio_is_set.astype(bool)
+        self.is_quote = market_indexes == QUOTE_SPOT_MARKET_INDEX
+
+        markets: Dict[int, tuple] = {}
+        for market_index in np.unique(market_indexes).tolist():
+            market = drift_client.get_spot_market_account(market_index)
+            market_risk = drift_client.market_risk_table.get_spot_market_risk(market)
+            oracle_price_data = drift_client.get_oracle_price_data_for_spot_market(
+                market_index
+            )
+            oracle_price = oracle_price_data.price
+            twap_5m = calculate_live_oracle_twap(
+                market.historical_oracle_data, oracle_price_data, now, FIVE_MINUTE
+            )
+            markets[market_index] = (
+                market_risk.size_precision,
+                10 ** (19 - market.decimals),
+                market.cumulative_deposit_interest,
+                market.cumulative_borrow_interest,
+                oracle_price,
+                min(twap_5m, oracle_price) if twap_5m else oracle_price,
+                max(twap_5m, oracle_price) if twap_5m else oracle_price,
+                market.imf_factor,
+                market_risk.get_scaled_initial_asset_weight(oracle_price),
+                market.maintenance_asset_weight,
+                market.initial_liability_weight,
+                market.maintenance_liability_weight,
+            )
+
+        (
+            self.size_precision,
+            precision_decrease,
+            cumulative_deposit_interest,
+            cumulative_borrow_interest,
+            self.oracle_price,
+            self.strict_min_price,
+            self.strict_max_price,
+            self.imf_factor,
+            self.initial_asset_weight,
+            self.maintenance_asset_weight,
+            self.initial_liability_weight,
+            self.maintenance_liability_weight,
+        ) = join_markets(markets, market_indexes, 12)
+
+        deposit_amount = to_int(
+            (self.scaled_balance * cumulative_deposit_interest) / precision_decrease
+        )
+        borrow_balance = self.scaled_balance * cumulative_borrow_interest
+        borrow_amount = borrow_balance // precision_decrease
+        borrow_amount = np.where(
+            borrow_balance % precision_decrease > 0, borrow_amount + 1, borrow_amount
+        )
+        self.token_amount = np.where(
+            self.is_borrow, -np.abs(borrow_amount), deposit_amount
+        )
+
+    def get_size_in_amm_reserve_precision(self, amount):
+        return np.where(
+            self.size_precision > AMM_RESERVE_PRECISION,
+            amount / (self.size_precision / AMM_RESERVE_PRECISION),
+            amount * AMM_RESERVE_PRECISION / self.size_precision,
+        )
+
+    def get_asset_weights(self, amount, margin_category: MarginCategory):
+        return size_discount_asset_weights(
+            self.get_size_in_amm_reserve_precision(amount),
+            self.imf_factor,
+            (
+                self.initial_asset_weight
+                if margin_category == MarginCategory.INITIAL
+                else self.maintenance_asset_weight
+            ),
+        )
+
+    def get_liability_weights(self, amount, margin_category: MarginCategory):
+        return size_premium_liability_weights(
+            self.get_size_in_amm_reserve_precision(amount),
+            self.imf_factor,
+            (
+                self.initial_liability_weight
+                if margin_category == MarginCategory.INITIAL
+                else self.maintenance_liability_weight
+            ),
+            SPOT_WEIGHT_PRECISION,
+        )
+
+    def get_token_values(self, amount, strict: bool):
+        if strict:
+            price = np.where(amount > 0, self.strict_min_price, self.strict_max_price)
+        else:
+            price = self.oracle_price
+        return (amount * price) // self.size_precision
+
+    def get_weighted_token_values(
+        self, token_amount, token_value, margin_category: MarginCategory
+    ):
+        is_asset = token_value >= 0
+        weight = np.where(
+            is_asset,
+            self.get_asset_weights(token_amount, margin_category),
+            self.get_liability_weights(np.abs(token_amount), margin_category),
+        )
+        if margin_category == MarginCategory.INITIAL:
+            user_custom_weight = np.where(
+                is_asset,
+                np.maximum(0, SPOT_MARKET_WEIGHT_PRECISION - self.max_margin_ratio),
+                SPOT_MARKET_WEIGHT_PRECISION + self.max_margin_ratio,
+            )
+            weight = np.where(
+                self.max_margin_ratio_is_set & ~self.is_quote,
+                np.where(
+                    is_asset,
+                    np.minimum(weight, user_custom_weight),
+                    np.maximum(weight, user_custom_weight),
+                ),
+                weight,
+            )
+        return (token_value * weight) // SPOT_MARKET_WEIGHT_PRECISION
+
+    def get_asset_and_liability_value(
+        self,
+        margin_category: MarginCategory,
+        liquidation_buffers: np.ndarray,
+        strict: bool = False,
+    ):
+        """
+        `DriftUser.get_spot_market_asset_and_liability_value` over all markets
+        with open orders, per user.
+        """
+        token_amount = self.token_amount
+        token_value = self.get_token_values(token_amount, strict)
+        max_price = self.strict_max_price if strict else self.oracle_price
+
+        # worst case of all bids or all asks filling, as get_worst_case_token_amounts
+        simulations = []
+        for open_orders in (self.open_bids, self.open_asks):
+            orders_value = (-open_orders * max_price) // self.size_precision
+            amount_after_fill = token_amount + open_orders
+            free_collateral_contribution = (
+                self.get_weighted_token_values(
+                    amount_after_fill, token_value - orders_value, margin_category
+                )
+                + orders_value
+            )
+            simulations.append(
+                (amount_after_fill, orders_value, free_collateral_contribution)
+            )
+        (
+            (bids_amount, bids_value, bids_contribution),
+            (
+                asks_amount,
+                asks_value,
+                asks_contribution,
+            ),
+        ) = simulations
+        use_asks = asks_contribution < bids_contribution
+        worst_case_amount = np.where(use_asks, asks_amount, bids_amount)
+        orders_value = np.where(use_asks, asks_value, bids_value)
+
+        # quote positions are valued as is, other ones at their worst case
+        amount = np.where(self.is_quote, token_amount, worst_case_amount)
+        value = self.get_token_values(amount, strict)
+        asset_weight = self.get_asset_weights(amount, margin_category)
+        liability_weight = self.get_liability_weights(amount, margin_category)
+        if margin_category == MarginCategory.INITIAL:
+            asset_weight = np.where(
+                self.is_quote,
+                asset_weight,
+                np.minimum(
+                    asset_weight,
+                    np.maximum(0, SPOT_MARKET_WEIGHT_PRECISION - self.max_margin_ratio),
+                ),
+            )
+            liability_weight = np.where(
+                self.is_quote,
+                liability_weight,
+                np.maximum(
+                    liability_weight,
+                    SPOT_MARKET_WEIGHT_PRECISION + self.max_margin_ratio,
+                ),
+            )
+        asset_value = (value * asset_weight) // SPOT_MARKET_WEIGHT_PRECISION
+        liability_value = np.abs(
+            (value * (liability_weight + liquidation_buffers))
+            // SPOT_MARKET_WEIGHT_PRECISION
+        )
+
+        orders_weight = SPOT_MARKET_WEIGHT_PRECISION
+        if margin_category == MarginCategory.INITIAL:
+            orders_weight = np.maximum(orders_weight, self.max_margin_ratio)
+        net_quote_value = np.where(
+            self.is_quote,
+            np.where(self.is_borrow, -liability_value, asset_value),
+            np.where(
+                orders_value > 0,
+                orders_value,
+                -(np.abs(orders_value) * orders_weight // SPOT_MARKET_WEIGHT_PRECISION),
+            ),
+        )
+
+        is_base = ~self.is_quote
+        total_asset_value = sum_by_user(
+            np.where(is_base & (amount > 0), asset_value, 0),
+            self.owners,
+            self.num_users,
+        )
+        # the liability and the open orders requirement of every position are
+        # added one after the other
+        liability_terms = np.stack(
+            [
+                np.where(is_base & (amount < 0), liability_value, 0),
+                np.where(is_base, self.open_orders * OPEN_ORDER_MARGIN_REQUIREMENT, 0),
+            ],
+            axis=1,
+        ).ravel()
+        total_liability_value = sum_by_user(
+            liability_terms, np.repeat(self.owners, 2), self.num_users
+        )
+        net_quote_value = sum_by_user(net_quote_value, self.owners, self.num_users)
+
+        is_net_asset = net_quote_value > 0
+        total_asset_value = np.where(
+            is_net_asset, total_asset_value + net_quote_value, total_asset_value
+        )
+        total_liability_value = np.where(
+            is_net_asset,
+            total_liability_value,
+            total_liability_value + np.abs(net_quote_value),
+        )
+        return total_asset_value, total_liability_value
+
+
+def join_markets(markets: Dict[int, tuple], market_indexes: np.ndarray, width: int):
+    """
+    One object array per market field, with the value of each position's market.
+    """
+    size = max(markets, default=-1) + 1
+    fields = [np.zeros(size, dtype=object) for _ in range(width)]
+    for market_index, values in markets.items():
+        for field, value in zip(fields, values):
+            field[market_index] = value
+    return [field[market_indexes] for field in fields]
+
+
+class RiskEngine:
+    """
+    Computes `DriftUser.get_health`, `get_free_collateral`, `can_be_liquidated`,
+    the maintenance collateral and margin requirement and the liquidation
+    prices of many users at once.
+
+    The positions of all users are packed into arrays joined with their market
+    accounts and oracle prices, which are read once per call. Amounts are kept
+    as python ints in object arrays, and every step follows the operations of
+    `DriftUser`, floats included, so the results are the same, not close.
+    Users with LP shares fall back to their `DriftUser` methods.
+    """
+
+    def __init__(self, drift_client):
+        self.drift_client = drift_client
+
+    def get_positions(
+        self, users: List[DriftUser], now: int
+    ) -> Tuple[PerpPositions, SpotPositions, np.ndarray, List[int]]:
+        """
+        The perp and spot positions of `users`, whether each user is being
+        liquidated, and the indexes of the users with LP shares, whose
+        positions are left out.
+        """
+        num_users = len(users)
+        perp_positions = []
+        spot_positions = []
+        being_liquidated = np.zeros(num_users, dtype=bool)
+        lp_users = []
+        for user_index, user in enumerate(users):
+            user_account = user.get_user_account()
+            being_liquidated[user_index] = (
+                user_account.status
+                & (UserStatus.BEING_LIQUIDATED | UserStatus.BANKRUPT)
+            ) > 0
+            if any(position.lp_shares > 0 for position in user_account.perp_positions):
+                lp_users.append(user_index)
+                continue
+
+            max_margin_ratio = user_account.max_margin_ratio
+            for position in user_account.perp_positions:
+                if (
+                    position.base_asset_amount != 0
+                    or position.quote_asset_amount != 0
+                    or position.open_orders != 0
+                ):
+                    perp_positions.append(
+                        (
+                            user_index,
+                            position.market_index,
+                            position.base_asset_amount,
+                            position.quote_asset_amount,
+                            position.open_bids,
+                            position.open_asks,
+                            position.open_orders,
+                            position.last_cumulative_funding_rate,
+                            max_margin_ratio,
+                        )
+                    )
+            for position in user_account.spot_positions:
+                if position.scaled_balance != 0 or position.open_orders != 0:
+                    spot_positions.append(
+                        (
+                            user_index,
+                            position.market_index,
+                            is_variant(position.balance_type, "Borrow"),
+                            position.scaled_balance,
+                            position.open_bids,
+                            position.open_asks,
+                            position.open_orders,
+                            max_margin_ratio,
+                            bool(max_margin_ratio),
+                        )
+                    )
+
+        perps = PerpPositions(self.drift_client, perp_positions, num_users)
+        spots = SpotPositions(self.drift_client, spot_positions, num_users, now)
+        return perps, spots, being_liquidated, lp_users
+
+    def get_user_risk(
+        self, users: Iterable[DriftUser], now: Optional[int] = None
+    ) -> UserRisk:
+        now = now or int(time.time())
+        users = list(users)
+        num_users = len(users)
+        perps, spots, being_liquidated, lp_users = self.get_positions(users, now)
+
+        maintenance_asset_value, maintenance_liability_value = (
+            spots.get_asset_and_liability_value(MarginCategory.MAINTENANCE, 0)
+        )
+        # the liabilities of users being liquidated are weighted up by the
+        # liquidation buffer, which also changes the net quote value of quote
+        # borrows, but their collateral isn't
+        liquidation_buffers = np.zeros(num_users, dtype=object)
+        if being_liquidated.any():
+            liquidation_buffers[being_liquidated] = (
+                self.drift_client.get_state_account().liquidation_margin_buffer_ratio
+            )
+            _, maintenance_liability_value = spots.get_asset_and_liability_value(
+                MarginCategory.MAINTENANCE, liquidation_buffers[spots.owners]
+            )
+        initial_asset_value, _ = spots.get_asset_and_liability_value(
+            MarginCategory.INITIAL, 0
+        )
+        strict_asset_value, strict_liability_value = (
+            spots.get_asset_and_liability_value(MarginCategory.INITIAL, 0, strict=True)
+        )
+        initial_unrealized_pnl = perps.get_unrealized_pnl(MarginCategory.INITIAL)
+
+        total_collateral = maintenance_asset_value + perps.get_unrealized_pnl(
+            MarginCategory.MAINTENANCE
+        )
+        maintenance_margin_requirement = (
+            perps.get_margin_requirement(
+                MarginCategory.MAINTENANCE, liquidation_buffers[perps.owners]
+            )
+            + maintenance_liability_value
+        )
+        free_collateral = np.maximum(
+            0,
+            strict_asset_value
+            + initial_unrealized_pnl
+            - (
+                perps.get_margin_requirement(MarginCategory.INITIAL, 0, strict=True)
+                + strict_liability_value
+            ),
+        )
+        initial_total_collateral = initial_asset_value + initial_unrealized_pnl
+        can_be_liquidated = (
+            initial_total_collateral < maintenance_margin_requirement
+        ).astype(bool)
+        liquidation_margin = initial_total_collateral - maintenance_margin_requirement
+
+        positive_collateral = np.where(total_collateral > 0, total_collateral, 1)
+        health = np.where(
+            being_liquidated,
+            0,
+            np.where(
+                (maintenance_margin_requirement == 0) & (total_collateral >= 0),
+                100,
+                np.where(
+                    total_collateral <= 0,
+                    0,
+                    to_rounded(
+                        np.minimum(
+                            100,
+                            np.maximum(
+                                0,
+                                (
+                                    1
+                                    - maintenance_margin_requirement
+                                    / positive_collateral
+                                )
+                                * 100,
+                            ),
+                        )
+                    ),
+                ),
+            ),
+        ).astype(np.int64)
+
+        for user_index in lp_users:
+            user = users[user_index]
+            liquidation_buffer = (
+                liquidation_buffers[user_index]
+                if being_liquidated[user_index]
+                else None
+            )
+            total_collateral[user_index] = user.get_total_collateral(
+                MarginCategory.MAINTENANCE
+            )
+            maintenance_margin_requirement[user_index] = user.get_margin_requirement(
+                MarginCategory.MAINTENANCE, liquidation_buffer
+            )
+            health[user_index] = user.get_health()
+            free_collateral[user_index] = user.get_free_collateral()
+            can_be_liquidated[user_index] = user.can_be_liquidated()
+            liquidation_margin[user_index] = (
+                user.get_total_collateral() - maintenance_margin_requirement[user_index]
+            )
+
+        return UserRisk(
+            user_public_keys=[user.user_public_key for user in users],
+            total_collateral=total_collateral,
+            maintenance_margin_requirement=maintenance_margin_requirement,
+            health=health,
+            free_collateral=free_collateral,
+            can_be_liquidated=can_be_liquidated,
+            liquidation_margin=liquidation_margin,
+        )
+
+    def get_liquidation_prices(
+        self, users: Iterable[DriftUser], now: Optional[int] = None
+    ) -> LiquidationPrices:
+        """
+        `DriftUser.get_perp_liq_price` of every perp position with a base
+        amount and `get_spot_liq_price` of every spot position with a balance
+        outside the quote market, for all `users`.
+
+        The maintenance collateral and margin requirement are computed once per
+        user for all their positions, and the perp and spot markets sharing an
+        oracle are matched once per call.
+        """
+        now = now or int(time.time())
+        users = list(users)
+        perps, spots, _, lp_users = self.get_positions(users, now)
+
+        maintenance_asset_value, maintenance_liability_value = (
+            spots.get_asset_and_liability_value(MarginCategory.MAINTENANCE, 0)
+        )
+        total_collateral = maintenance_asset_value + perps.get_unrealized_pnl(
+            MarginCategory.MAINTENANCE
+        )
+        maintenance_margin_requirement = (
+            perps.get_margin_requirement(MarginCategory.MAINTENANCE, 0)
+            + maintenance_liability_value
+        )
+        free_collateral = np.maximum(
+            0, total_collateral - maintenance_margin_requirement
+        ).tolist()
+
+        drift_client = self.drift_client
+        perp_markets_by_oracle: Dict[Pubkey, PerpMarketAccount] = {}
+        for perp_market in drift_client.get_perp_market_accounts():
+            perp_markets_by_oracle.setdefault(perp_market.amm.oracle, perp_market)
+        spot_markets_by_oracle: Dict[Pubkey, SpotMarketAccount] = {}
+        for spot_market in drift_client.get_spot_market_accounts():
+            spot_markets_by_oracle.setdefault(spot_market.oracle, spot_market)
+
+        perp_rows = []
+        spot_rows = []
+        lp_users = set(lp_users)
+        for user_index, user in enumerate(users):
+            user_account = user.get_user_account()
+            if user_index in lp_users:
+                for position in user_account.perp_positions:
+                    if position.base_asset_amount != 0 or position.lp_shares != 0:
+                        perp_rows.append(
+                            (
+                                user.user_public_key,
+                                position.market_index,
+                                user.get_perp_liq_price(position.market_index),
+                            )
+                        )
+                for position in user_account.spot_positions:
+                    if (
+                        position.scaled_balance != 0
+                        and position.market_index != QUOTE_SPOT_MARKET_INDEX
+                    ):
+                        spot_rows.append(
+                            (
+                                user.user_public_key,
+                                position.market_index,
+                                user.get_spot_liq_price(position.market_index),
+                            )
+                        )
+                continue
+
+            # the first position in use of each market, as get_spot_position
+            spot_positions: Dict[int, SpotPosition] = {}
+            for position in user_account.spot_positions:
+                if not is_spot_position_available(position):
+                    spot_positions.setdefault(position.market_index, position)
+
+            for position in user_account.perp_positions:
+                if position.base_asset_amount == 0:
+                    continue
+                perp_market = drift_client.get_perp_market_account(
+                    position.market_index
+                )
+                oracle_price = drift_client.get_oracle_price_data_for_perp_market(
+                    position.market_index
+                ).price
+                free_collateral_delta = user.calculate_free_collateral_delta_for_perp(
+                    perp_market, position, 0, oracle_price
+                )
+                if free_collateral_delta:
+                    sister_market = spot_markets_by_oracle.get(perp_market.amm.oracle)
+                    spot_position = (
+                        spot_positions.get(sister_market.market_index)
+                        if sister_market
+                        else None
+                    )
+                    if spot_position:
+                        free_collateral_delta += (
+                            user.calculate_free_collateral_delta_for_spot(
+                                sister_market,
+                                get_signed_spot_token_amount(
+                                    spot_position, sister_market
+                                ),
+                            )
+                        )
+                perp_rows.append(
+                    (
+                        user.user_public_key,
+                        position.market_index,
+                        calculate_liq_price(
+                            free_collateral[user_index],
+                            free_collateral_delta,
+                            oracle_price,
+                        ),
+                    )
+                )
+
+            for market_index, position in spot_positions.items():
+                if (
+                    position.scaled_balance == 0
+                    or market_index == QUOTE_SPOT_MARKET_INDEX
+                ):
+                    continue
+                spot_market = drift_client.get_spot_market_account(market_index)
+                signed_token_amount = get_signed_spot_token_amount(
+                    position, spot_market
+                )
+                free_collateral_delta = None
+                if signed_token_amount != 0:
+                    free_collateral_delta = (
+                        user.calculate_free_collateral_delta_for_spot(
+                            spot_market, signed_token_amount
+                        )
+                    )
+                oracle_price = drift_client.get_oracle_price_data_for_spot_market(
+                    market_index
+                ).price
+                perp_market = perp_markets_by_oracle.get(spot_market.oracle)
+                if free_collateral_delta is not None and perp_market:
+                    perp_position = user.get_perp_position(
+                        perp_market.market_index
+                    ) or user.get_empty_position(perp_market.market_index)
+                    free_collateral_delta += (
+                        user.calculate_free_collateral_delta_for_perp(
+                            perp_market, perp_position, 0, oracle_price
+                        )
+                        or 0
+                    )
+                spot_rows.append(
+                    (
+                        user.user_public_key,
+                        market_index,
+                        calculate_liq_price(
+                            free_collateral[user_index],
+                            free_collateral_delta,
+                            oracle_price,
+                        ),
+                    )
+                )
+
+        perp_columns = list(zip(*perp_rows)) or [()] * 3
+        spot_columns = list(zip(*spot_rows)) or [()] * 3
+        return LiquidationPrices(
+            perp_user_public_keys=list(perp_columns[0]),
+            perp_market_indexes=np.array(perp_columns[1], dtype=np.int64),
+            perp_liq_prices=object_array(perp_columns[2]),
+            spot_user_public_keys=list(spot_columns[0]),
+            spot_market_indexes=np.array(spot_columns[1], dtype=np.int64),
+            spot_liq_prices=object_array(spot_columns[2]),
+        )
@@ -1,8 +1,7 @@
 import asyncio
-import base64
 import os
 import pickle
-from typing import Any, Container, Dict, Optional
+from typing import Any, Container, Dict, List, Optional, Set
 
 import jsonrpcclient
 from solana.rpc.commitment import Confirmed
@@ -10,12 +9,16 @@ from solders.pubkey import Pubkey
 
 from driftpy.account_subscription_config import AccountSubscriptionConfig
 from driftpy.accounts.types import DataAndSlot
-from driftpy.decode.user import decode_user
+from driftpy.decode.user import decode_user, decode_user_lazy
 from driftpy.dlob.client_types import DLOBSource
 from driftpy.drift_client import DriftClient
 from driftpy.drift_user import DriftUser
+from driftpy.pickle.snapshot import Snapshot, is_snapshot, write_snapshot
 from driftpy.types import OrderRecord, PickledData, UserAccount, compress, decompress
+from driftpy.user_map.decode_pool import DecodePool, iter_program_accounts
+from driftpy.user_map.liquidation_index import LiquidationCandidateIndex
 from driftpy.user_map.polling_sub import PollingSubscription
+from driftpy.user_map.risk_engine import RiskEngine
 from driftpy.user_map.types import UserMapInterface
 from driftpy.user_map.user_map_config import PollingConfig, UserMapConfig
 from driftpy.user_map.websocket_sub import WebsocketSubscription
@@ -25,6 +28,10 @@ class UserMap(UserMapInterface, DLOBSource):
     def __init__(self, config: UserMapConfig):
         self.user_map: Dict[str, DriftUser] = {}
         self.raw: Dict[str, bytes] = {}
+        # keys updated outside of sync, whose `raw` no longer matches their data
+        self.stale_keys: Set[str] = set()
+        # keys added, changed or removed by the last sync
+        self.changed_keys: Set[str] = set()
         self.last_number_of_sub_accounts = None
         self.sync_lock = asyncio.Lock()
         self.drift_client: DriftClient = config.drift_client
@@ -37,6 +44,20 @@ class UserMap(UserMapInterface, DLOBSource):
             self.connection = self.drift_client.connection
         self.commitment = config.subscription_config.commitment or Confirmed
         self.include_idle = config.include_idle or False
+        self.incremental_dlob = config.incremental_dlob or False
+        self.dlob = None
+        self.liquidation_index = (
+            LiquidationCandidateIndex(self.drift_client)
+            if config.liquidation_index
+            else None
+        )
+        self.liquidation_index_refresh_syncs = config.liquidation_index_refresh_syncs
+        self.syncs_since_liquidation_index_refresh = 0
+        self.snapshot = None
+        self.decode = decode_user_lazy if config.lazy_decode else decode_user
+        self.decode_pool = (
+            DecodePool(config.decode_workers) if config.decode_workers else None
+        )
         if isinstance(config.subscription_config, PollingConfig):
             self.subscription = PollingSubscription(
                 self, config.subscription_config.frequency, config.skip_initial_load
@@ -81,6 +102,11 @@ class UserMap(UserMapInterface, DLOBSource):
             # again, no event emitter
             self.last_number_of_sub_accounts = None
 
+        self.dlob = None
+        if self.liquidation_index is not None:
+            self.liquidation_index = LiquidationCandidateIndex(self.drift_client)
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
         self.is_subscribed = False
 
     def has(self, key: str) -> bool:
@@ -97,6 +123,9 @@ class UserMap(UserMapInterface, DLOBSource):
 
     def clear(self):
         self.user_map.clear()
+        self.dlob = None
+        if self.liquidation_index is not None:
+            self.liquidation_index = LiquidationCandidateIndex(self.drift_client)
 
     def get_user_authority(self, user_account_public_key: str) -> Optional[Pubkey]:
         user = self.user_map.get(user_account_public_key)
@@ -129,11 +158,29 @@ class UserMap(UserMapInterface, DLOBSource):
             await user.subscribe()
 
         self.user_map[str(user_account_public_key)] = user
+        if self.liquidation_index is not None:
+            self.liquidation_index.update_user(str(user_account_public_key), user)
+
+        user_and_slot = user.get_user_account_and_slot()
+        if self.dlob is not None and user_and_slot is not None:
+            self.dlob.update_user_orders(
+                user_account_public_key,
+                [],
+                user_and_slot.data.orders,
+                user_and_slot.slot,
+            )
 
     async def update_with_order_record(self, record: OrderRecord):
         self.must_get(str(record.user))
 
-    async def sync(self) -> None:
+    async def sync(self) -> Optional[Set[str]]:
+        """
+        Fetches every user account with gPA and updates the map. Accounts whose
+        bytes match the previous sync are not decoded again.
+
+        Returns the keys of users that were added, changed or removed, which are
+        also kept on `changed_keys` until the next sync.
+        """
         async with self.sync_lock:
             try:
                 filters = [{"memcmp": {"offset": 0, "bytes": "TfwwBiNJtao"}}]
@@ -170,16 +217,28 @@ class UserMap(UserMapInterface, DLOBSource):
 
                 rpc_response_values = parsed_resp.result["value"]
 
+                previous_raw = self.raw
+                stale_keys = self.stale_keys
+                self.stale_keys = set()
+
                 program_account_buffer_map: Dict[str, Container[Any]] = {}
                 raw: Dict[str, bytes] = {}
 
-                # parse the gPA data before inserting
-                for program_account in rpc_response_values:
-                    pubkey = program_account["pubkey"]
-                    raw_bytes = base64.b64decode(program_account["account"]["data"][0])
-                    data = decode_user(raw_bytes)
-                    program_account_buffer_map[str(pubkey)] = data
-                    raw[str(pubkey)] = raw_bytes
+                # parse the gPA data before inserting, skipping accounts whose bytes
+                # match the previous sync. Those keep their data and its slot, the
+                # slot they are current as of is `latest_slot`
+                async for pubkey, raw_bytes in iter_program_accounts(
+                    rpc_response_values, self.decode_pool
+                ):
+                    pubkey = str(pubkey)
+                    raw[pubkey] = raw_bytes
+                    if (
+                        previous_raw.get(pubkey) == raw_bytes
+                        and pubkey not in stale_keys
+                        and pubkey in self.user_map
+                    ):
+                        continue
+                    program_account_buffer_map[pubkey] = self.decode(raw_bytes)
 
                 self.raw = raw
 
@@ -195,8 +254,8 @@ class UserMap(UserMapInterface, DLOBSource):
                             DataAndSlot(slot, user_account)
                         )
                     else:
-                        self.user_map.get(pubkey).account_subscriber.update_data(
-                            DataAndSlot(slot, user_account)
+                        self.update_user_data(
+                            self.user_map.get(pubkey), DataAndSlot(slot, user_account)
                         )
                     # let the loop breathe
                     await asyncio.sleep(0)
@@ -204,7 +263,10 @@ class UserMap(UserMapInterface, DLOBSource):
                 # remove any stale data from the usermap or update the data to the latest gPA data
                 keys_to_delete = []
                 for key in list(self.user_map.keys()):
-                    if key not in program_account_buffer_map:
+                    if key not in raw:
+                        self.remove_user_from_dlob(self.user_map[key])
+                        if self.liquidation_index is not None:
+                            self.liquidation_index.remove_user(key)
                         self.user_map[key].unsubscribe()
                         keys_to_delete.append(key)
                     await asyncio.sleep(0)
@@ -212,20 +274,97 @@ class UserMap(UserMapInterface, DLOBSource):
                 for key in keys_to_delete:
                     del self.user_map[key]
 
+                # the liquidation price estimates drift with the other oracles,
+                # changed users are already re-evaluated
+                if self.liquidation_index is not None:
+                    self.refresh_liquidation_index()
+
+                self.changed_keys = set(program_account_buffer_map.keys())
+                self.changed_keys.update(keys_to_delete)
+                return self.changed_keys
+
             except Exception as e:
                 print(f"Error in UserMap.sync(): {e}")
 
+    def refresh_liquidation_index(self):
+        if not self.liquidation_index_refresh_syncs:
+            return
+        self.syncs_since_liquidation_index_refresh += 1
+        if (
+            self.syncs_since_liquidation_index_refresh
+            >= self.liquidation_index_refresh_syncs
+        ):
+            self.liquidation_index.refresh()
+            self.syncs_since_liquidation_index_refresh = 0
+
     # this is used as a callback for ws subscriptions to update data as its streamed
     async def update_user_account(self, key: str, data: DataAndSlot[UserAccount]):
         user: DriftUser = await self.must_get(key)
+        self.update_user_data(user, data)
+        self.stale_keys.add(key)
+
+    def update_user_data(self, user: DriftUser, data: DataAndSlot[UserAccount]):
+        old = user.get_user_account_and_slot()
         user.account_subscriber.update_data(data)
+        new = user.get_user_account_and_slot()
+
+        if new is old:
+            return
+
+        if self.liquidation_index is not None:
+            self.liquidation_index.update_user(str(user.user_public_key), user)
+
+        if self.dlob is None:
+            return
+
+        self.dlob.update_user_orders(
+            user.user_public_key,
+            old.data.orders if old is not None else [],
+            new.data.orders,
+            new.slot,
+        )
+
+    def remove_user_from_dlob(self, user: DriftUser):
+        if self.dlob is None:
+            return
+        user_and_slot = user.get_user_account_and_slot()
+        if user_and_slot is None:
+            return
+        self.dlob.update_user_orders(
+            user.user_public_key, user_and_slot.data.orders, [], user_and_slot.slot
+        )
 
     async def get_DLOB(self, slot: int):
         from driftpy.dlob.dlob import DLOB
 
-        dlob = DLOB()
-        dlob.init_from_usermap(self, slot)
-        return dlob
+        if not self.incremental_dlob:
+            dlob = DLOB()
+            dlob.init_from_usermap(self, slot)
+            return dlob
+
+        if self.dlob is None:
+            self.dlob = DLOB()
+            self.dlob.init_from_usermap(self, slot)
+        else:
+            self.dlob.update_resting_limit_orders(slot)
+        return self.dlob
+
+    def get_liquidation_candidates(self) -> List[DriftUser]:
+        """
+        The users that can be liquidated. With `liquidation_index` set only the
+        users oracle moves or account updates reach are re-evaluated, otherwise
+        every user is.
+        """
+        if self.liquidation_index is not None:
+            return self.liquidation_index.get_liquidation_candidates()
+
+        users = list(self.values())
+        risk = RiskEngine(self.drift_client).get_user_risk(users)
+        return [
+            user
+            for user, can_be_liquidated in zip(users, risk.can_be_liquidated.tolist())
+            if can_be_liquidated
+        ]
 
     def get_slot(self) -> int:
         return self.latest_slot
@@ -238,6 +377,8 @@ class UserMap(UserMapInterface, DLOBSource):
             filename = self.get_last_dump_filepath()
         if not os.path.exists(filename):
             raise FileNotFoundError(f"File {filename} not found")
+        if is_snapshot(filename):
+            return await self.load_snapshot(filename)
         start = filename.rindex("_") + 1
         end = filename.rindex(".")
         slot = int(filename[start:end])
@@ -245,8 +386,36 @@ class UserMap(UserMapInterface, DLOBSource):
             users: list[PickledData] = pickle.load(f)
             for user in users:
                 decompressed_data = decompress(user.data)
-                data = decode_user(decompressed_data)
+                data = self.decode(decompressed_data)
                 await self.add_pubkey(user.pubkey, DataAndSlot(slot, data))
+                self.raw[str(user.pubkey)] = decompressed_data
+
+    async def load_snapshot(self, filename: str):
+        """
+        Loads users from a file written by `dump_snapshot`. The file is memory-mapped,
+        so with `lazy_decode` set positions and orders are only decoded, from the map,
+        when they are first read.
+        """
+        snapshot = Snapshot(filename)
+        slot = snapshot.slot
+        for pubkey, data in snapshot.items():
+            await self.add_pubkey(
+                Pubkey.from_string(pubkey), DataAndSlot(slot, self.decode(data))
+            )
+            self.raw[pubkey] = data
+        self.latest_slot = max(self.latest_slot, slot)
+        # users keep views into the map, so it lives as long as the usermap does
+        self.snapshot = snapshot
+
+    def dump_snapshot(self, filename: Optional[str] = None, compress: bool = False):
+        """
+        Writes the raw user accounts from the last sync to a snapshot file, see
+        `driftpy.pickle.snapshot`. `compress` stores every account zlib compressed,
+        which trades load time for file size.
+        """
+        self.last_dumped_slot = self.get_slot()
+        path = filename or f"usermap_{self.last_dumped_slot}.snap"
+        write_snapshot(path, self.last_dumped_slot, self.raw.items(), compress)
 
     def dump(self, filename: Optional[str] = None):
         users = []
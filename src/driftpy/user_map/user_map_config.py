@@ -37,6 +37,21 @@ class UserMapConfig:
     # True to include idle users when loading.
     # Defaults to false to decrease # of accounts subscribed to
     include_idle: Optional[bool] = None
+    # True to keep one long-lived DLOB that is patched from user account updates
+    # instead of rebuilding it from every user on each get_DLOB call
+    incremental_dlob: Optional[bool] = False
+    # True to keep a `LiquidationCandidateIndex` updated from user account updates,
+    # so get_liquidation_candidates only re-evaluates the users oracle moves reach
+    liquidation_index: Optional[bool] = False
+    # number of syncs between re-evaluations of every user in the liquidation
+    # index, whose estimates drift as the other oracles move. None to never
+    liquidation_index_refresh_syncs: Optional[int] = 10
+    # True to decode users with `decode_user_lazy` during sync/load, deferring
+    # decoding of each account until its fields are read
+    lazy_decode: Optional[bool] = False
+    # number of worker processes used to base64 decode the gPA response in sync.
+    # If None, the response is decoded on the event loop
+    decode_workers: Optional[int] = None
 
 
 @dataclass
@@ -51,3 +66,6 @@ class UserStatsMapConfig:
     drift_client: DriftClient
     connection: Optional[AsyncClient] = None
     sync_config: Optional[SyncConfig] = None
+    # number of worker processes used to base64 decode the gPA response in sync.
+    # If None, the response is decoded on the event loop
+    decode_workers: Optional[int] = None
@@ -29,6 +29,7 @@ from driftpy.types import (
     compress,
     decompress,
 )
+from driftpy.user_map.decode_pool import DecodePool, iter_program_accounts
 from driftpy.user_map.user_map import UserMap
 from driftpy.user_map.user_map_config import SyncConfig, UserStatsMapConfig
 
@@ -44,6 +45,9 @@ class UserStatsMap:
         self.last_dumped_slot: int = 0
         self.connection = config.connection or config.drift_client.connection
         self.sync_config = config.sync_config or SyncConfig(type="default")
+        self.decode_pool = (
+            DecodePool(config.decode_workers) if config.decode_workers else None
+        )
 
     async def subscribe(self):
         if self.size() > 0:
@@ -107,9 +111,9 @@ class UserStatsMap:
                 program_account_buffer_map: Dict[str, UserStatsAccount] = {}
                 raw: Dict[str, bytes] = {}
 
-                for program_account in rpc_response_values:
-                    pubkey = program_account["pubkey"]
-                    buffer = base64.b64decode(program_account["account"]["data"][0])
+                async for pubkey, buffer in iter_program_accounts(
+                    rpc_response_values, self.decode_pool
+                ):
                     data = decode_user_stat(buffer)
                     program_account_buffer_map[str(pubkey)] = data
                     raw[str(pubkey)] = buffer
@@ -294,6 +298,9 @@ class UserStatsMap:
             await user_stat.unsubscribe()
             del self.user_stats_map[key]
 
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+
     async def add_user_stat(
         self,
         authority: Pubkey,
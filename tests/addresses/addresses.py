@@ -0,0 +1,87 @@
+from solders.pubkey import Pubkey
+
+from driftpy.addresses import (
+    clear_pda_cache,
+    get_drift_client_signer_public_key,
+    get_insurance_fund_vault_public_key,
+    get_pda_cache_info,
+    get_perp_market_public_key,
+    get_spot_market_public_key,
+    get_spot_market_vault_public_key,
+    get_state_public_key,
+    get_user_account_public_key,
+    int_to_le_bytes,
+    warm_pda_cache,
+)
+from driftpy.constants.config import DRIFT_PROGRAM_ID
+from driftpy.constants.perp_markets import devnet_perp_market_configs
+from driftpy.constants.spot_markets import devnet_spot_market_configs
+
+
+def test_pda_cache_matches_find_program_address():
+    clear_pda_cache()
+    authority = Pubkey.new_unique()
+    for _ in range(2):
+        assert (
+            get_user_account_public_key(DRIFT_PROGRAM_ID, authority, 3)
+            == Pubkey.find_program_address(
+                [b"user", bytes(authority), int_to_le_bytes(3)], DRIFT_PROGRAM_ID
+            )[0]
+        )
+        assert (
+            get_perp_market_public_key(DRIFT_PROGRAM_ID, 1)
+            == Pubkey.find_program_address(
+                [b"perp_market", int_to_le_bytes(1)], DRIFT_PROGRAM_ID
+            )[0]
+        )
+        assert (
+            get_state_public_key(DRIFT_PROGRAM_ID)
+            == (Pubkey.find_program_address([b"drift_state"], DRIFT_PROGRAM_ID)[0])
+        )
+
+
+def test_pda_cache_counts_hits_and_misses():
+    clear_pda_cache()
+    info = get_pda_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 0, 0)
+
+    authority = Pubkey.new_unique()
+    get_user_account_public_key(DRIFT_PROGRAM_ID, authority, 0)
+    info = get_pda_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 1, 1)
+
+    get_user_account_public_key(DRIFT_PROGRAM_ID, authority, 0)
+    info = get_pda_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+    # another sub account, and another program, are other addresses
+    get_user_account_public_key(DRIFT_PROGRAM_ID, authority, 1)
+    get_user_account_public_key(Pubkey.new_unique(), authority, 0)
+    info = get_pda_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 3, 3)
+
+    clear_pda_cache()
+    info = get_pda_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 0, 0)
+
+
+def test_warm_pda_cache():
+    clear_pda_cache()
+    warm_pda_cache(DRIFT_PROGRAM_ID, "devnet")
+    info = get_pda_cache_info()
+    assert info.hits == 0
+    assert info.currsize == info.misses
+
+    get_state_public_key(DRIFT_PROGRAM_ID)
+    get_drift_client_signer_public_key(DRIFT_PROGRAM_ID)
+    for perp_market in devnet_perp_market_configs:
+        get_perp_market_public_key(DRIFT_PROGRAM_ID, perp_market.market_index)
+    for spot_market in devnet_spot_market_configs:
+        get_spot_market_public_key(DRIFT_PROGRAM_ID, spot_market.market_index)
+        get_spot_market_vault_public_key(DRIFT_PROGRAM_ID, spot_market.market_index)
+        get_insurance_fund_vault_public_key(DRIFT_PROGRAM_ID, spot_market.market_index)
+    warmed = get_pda_cache_info()
+    assert warmed.misses == info.misses
+    assert warmed.hits == 2 + len(devnet_perp_market_configs) + 3 * len(
+        devnet_spot_market_configs
+    )
@@ -1,18 +1,28 @@
 import time
 import base64
+from dataclasses import fields, replace
+from types import SimpleNamespace
 
 from pathlib import Path
 from pytest import fixture, mark
 from sys import getsizeof
 
-from anchorpy import Idl, Program
+from anchorpy import Idl, Program, Wallet
 
+from solana.rpc.async_api import AsyncClient
+from solders.keypair import Keypair
 from solders.pubkey import Pubkey
 
 import driftpy
-from driftpy.decode.user import decode_user
+from driftpy.accounts.types import DataAndSlot
+from driftpy.decode.user import LazyUserAccount, decode_user, decode_user_lazy
+from driftpy.drift_client import DriftClient
 from driftpy.math.perp_position import is_available
 from driftpy.math.spot_position import is_spot_position_available
+from driftpy.pickle.snapshot import Snapshot, is_snapshot, write_snapshot
+from driftpy.user_map.decode_pool import DecodePool, iter_program_accounts
+from driftpy.user_map.user_map import UserMap
+from driftpy.user_map.user_map_config import PollingConfig, UserMapConfig
 from driftpy.types import Order, PerpPosition, SpotPosition, UserAccount, is_variant
 
 from tests.decode.decode_strings import user_account_buffer_strings
@@ -53,6 +63,209 @@ async def test_user_decode(program: Program):
     print("Total custom time:", total_custom_time)
 
 
+def test_user_decode_lazy():
+    for user_account_buffer_string in user_account_buffer_strings:
+        user_account_buffer = base64.b64decode(user_account_buffer_string)
+        user_account = decode_user(user_account_buffer)
+        lazy_user_account = decode_user_lazy(memoryview(user_account_buffer))
+
+        # fields are only decoded once they are read
+        assert "authority" not in vars(lazy_user_account)
+        assert "_lazy_orders" not in vars(lazy_user_account)
+
+        for user_account_field in fields(UserAccount):
+            assert getattr(lazy_user_account, user_account_field.name) == getattr(
+                user_account, user_account_field.name
+            )
+
+        assert "_lazy_orders" in vars(lazy_user_account)
+
+
+def test_user_decode_lazy_compares_and_replaces_as_user_account():
+    for user_account_buffer_string in user_account_buffer_strings:
+        user_account_buffer = base64.b64decode(user_account_buffer_string)
+        user_account = decode_user(user_account_buffer)
+        lazy_user_account = decode_user_lazy(memoryview(user_account_buffer))
+
+        assert lazy_user_account == user_account
+        assert user_account == lazy_user_account
+        assert lazy_user_account.to_user_account() == user_account
+        assert type(lazy_user_account.to_user_account()) is UserAccount
+
+        replaced = replace(lazy_user_account, orders=[])
+        assert replaced.orders == [] and replaced.authority == user_account.authority
+        assert replaced == replace(user_account, orders=[])
+        if user_account.orders:
+            assert replaced != user_account
+
+
+@mark.asyncio
+async def test_user_decode_pool():
+    values = [
+        {"pubkey": str(i), "account": {"data": [user_account_buffer_string, "base64"]}}
+        for i, user_account_buffer_string in enumerate(user_account_buffer_strings)
+    ]
+    inline = {pubkey: raw async for pubkey, raw in iter_program_accounts(values, None)}
+
+    pool = DecodePool(2, shard_size=7)
+    try:
+        pooled = {
+            pubkey: raw async for pubkey, raw in iter_program_accounts(values, pool)
+        }
+    finally:
+        pool.shutdown()
+
+    assert pooled == inline
+
+
+def make_gpa_user_map(responses, **config):
+    """
+    A `UserMap` whose gPA requests are answered with `responses`, a list of
+    (slot, {pubkey: base64 account}), one per sync.
+    """
+
+    async def post(endpoint_uri, json, headers):
+        slot, accounts = responses.pop(0)
+        value = [
+            {"pubkey": pubkey, "account": {"data": [data, "base64"]}}
+            for pubkey, data in accounts.items()
+        ]
+        result = {"context": {"slot": slot}, "value": value}
+        return SimpleNamespace(
+            json=lambda: {"jsonrpc": "2.0", "id": json["id"], "result": result}
+        )
+
+    drift_client = DriftClient(
+        AsyncClient("http://localhost:8899"), wallet=Wallet(Keypair())
+    )
+    drift_client.connection = SimpleNamespace(
+        _provider=SimpleNamespace(
+            endpoint_uri="http://localhost:8899",
+            session=SimpleNamespace(post=post),
+        )
+    )
+    return UserMap(UserMapConfig(drift_client, PollingConfig(frequency=1), **config))
+
+
+@mark.asyncio
+async def test_user_map_sync_updates_only_changed_users():
+    buffers = user_account_buffer_strings
+    unchanged, changed, removed, added, updated = (
+        str(Pubkey.new_unique()) for _ in range(5)
+    )
+    first = {
+        unchanged: buffers[0],
+        changed: buffers[1],
+        removed: buffers[2],
+        updated: buffers[3],
+    }
+    second = {
+        unchanged: buffers[0],
+        changed: buffers[4],
+        added: buffers[5],
+        updated: buffers[3],
+    }
+    user_map = make_gpa_user_map([(1, first), (1, first), (2, second)])
+
+    assert await user_map.sync() == set(first)
+    assert user_map.get_slot() == 1
+    unchanged_data = user_map.get(unchanged).get_user_account_and_slot()
+
+    # nothing changed
+    assert await user_map.sync() == set()
+    assert user_map.get(unchanged).get_user_account_and_slot() is unchanged_data
+
+    # a websocket update between syncs, which the next gPA doesn't see yet
+    await user_map.update_user_account(
+        updated, DataAndSlot(2, decode_user(base64.b64decode(buffers[6])))
+    )
+
+    assert await user_map.sync() == {changed, removed, added, updated}
+    assert user_map.changed_keys == {changed, removed, added, updated}
+    assert user_map.get_slot() == 2
+    assert user_map.get(unchanged).get_user_account_and_slot() is unchanged_data
+    assert unchanged_data.slot == 1
+    assert not user_map.has(removed)
+    assert user_map.size() == len(second)
+    for key in (changed, added, updated):
+        user_and_slot = user_map.get(key).get_user_account_and_slot()
+        assert user_and_slot.slot == 2
+        assert user_and_slot.data == decode_user(base64.b64decode(second[key]))
+
+
+@mark.asyncio
+async def test_user_map_sync_refreshes_liquidation_index_periodically():
+    accounts = {
+        str(Pubkey.new_unique()): user_account_buffer_string
+        for user_account_buffer_string in user_account_buffer_strings[:3]
+    }
+    changed = dict(accounts, **{next(iter(accounts)): user_account_buffer_strings[3]})
+    user_map = make_gpa_user_map(
+        [(1, accounts), (2, changed), (3, changed), (4, changed)],
+        liquidation_index=True,
+        liquidation_index_refresh_syncs=3,
+    )
+    index = user_map.liquidation_index
+
+    await user_map.sync()
+    assert index.pending == set(accounts)
+    index.pending = set()
+
+    # only changed users are re-evaluated between refreshes
+    await user_map.sync()
+    assert index.pending == {next(iter(accounts))}
+    index.pending = set()
+    await user_map.sync()
+    assert index.pending == set(accounts)
+    index.pending = set()
+    await user_map.sync()
+    assert index.pending == set()
+
+
+@mark.parametrize("compress", [False, True])
+def test_user_snapshot_roundtrip(tmp_path, compress: bool):
+    accounts = {
+        str(Pubkey.new_unique()): base64.b64decode(user_account_buffer_string)
+        for user_account_buffer_string in user_account_buffer_strings
+    }
+    filename = str(tmp_path / "usermap_123.snap")
+    write_snapshot(filename, 123, accounts.items(), compress)
+
+    assert is_snapshot(filename)
+    snapshot = Snapshot(filename)
+    assert snapshot.slot == 123
+    assert len(snapshot) == len(accounts)
+    for pubkey, data in snapshot.items():
+        assert bytes(data) == accounts[pubkey]
+        assert decode_user(data) == decode_user(accounts[pubkey])
+
+
+@mark.parametrize("lazy_decode", [False, True])
+@mark.asyncio
+async def test_user_map_dump_snapshot_over_loaded_snapshot(tmp_path, lazy_decode: bool):
+    accounts = {
+        str(Pubkey.new_unique()): base64.b64decode(user_account_buffer_string)
+        for user_account_buffer_string in user_account_buffer_strings
+    }
+    filename = str(tmp_path / "usermap.snap")
+    write_snapshot(filename, 123, accounts.items())
+
+    user_map = make_gpa_user_map([])
+    user_map.decode = decode_user_lazy if lazy_decode else decode_user
+    await user_map.load_snapshot(filename)
+    user = user_map.get(next(iter(accounts))).get_user_account()
+    assert isinstance(user, LazyUserAccount) == lazy_decode
+
+    # the loaded users read from the map of the file being replaced
+    user_map.dump_snapshot(filename, compress=True)
+    for pubkey, data in accounts.items():
+        assert user_map.get(pubkey).get_user_account() == decode_user(data)
+
+    with Snapshot(filename) as snapshot:
+        assert snapshot.slot == 123
+        assert {pubkey: bytes(data) for pubkey, data in snapshot.items()} == accounts
+
+
 def user_account_decode(program: Program, user_account_buffer: bytes, index: int):
     print("Benchmarking user account decode: ", index)
 
@@ -1,16 +1,32 @@
-from dataclasses import dataclass
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from types import SimpleNamespace
 from typing import Optional
 
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from solders.keypair import Keypair
 
-from driftpy.constants.numeric_constants import BASE_PRECISION, QUOTE_PRECISION
-from driftpy.dlob.dlob import DLOB
+from driftpy.constants.numeric_constants import (
+    BASE_PRECISION,
+    PRICE_PRECISION,
+    QUOTE_PRECISION,
+)
+from driftpy.dlob.client_types import DLOBClientConfig
+from driftpy.dlob.dlob import DLOB, MarketToScan
+from driftpy.dlob.dlob_subscriber import DLOBSubscriber, MarketId
+from driftpy.dlob.node_list import get_limit_price_key_generator
+from driftpy.dlob.orderbook_levels import L2OrderBook, apply_l2_orderbook_diff
 from driftpy.math.auction import is_auction_complete
 from driftpy.math.conversion import convert_to_number
 from driftpy.math.orders import is_resting_limit_order
 from driftpy.types import (
+    ExchangeStatus,
     MarketType,
     OraclePriceData,
+    OrderStatus,
     OrderTriggerCondition,
     OrderType,
     PositionDirection,
@@ -883,3 +899,861 @@ def test_dlob_estimate_fill_exact_base_amount_spot_sell():
 
     # 1 * 20.69 + 2 * 20.68 + 1 * 20.67 = 82.72
     assert quote_amt_out == 82.72
+
+
+# NODE LIST BACKEND TESTS
+def test_sorted_node_list_matches_linked_node_list():
+    rng = random.Random(42)
+    linked_dlob = DLOB()
+    sorted_dlob = DLOB(node_list_backend="sorted")
+    market_index = 0
+    users = [Keypair().pubkey() for _ in range(20)]
+
+    orders = []
+    for order_id in range(400):
+        user = users[order_id % len(users)]
+        direction = (
+            PositionDirection.Long() if order_id % 2 else PositionDirection.Short()
+        )
+        # narrow price and slot ranges so ties are exercised
+        price = rng.randint(90, 110)
+        slot = rng.randint(1, 5)
+        orders.append((user, order_id, price, direction, slot))
+
+        for dlob in (linked_dlob, sorted_dlob):
+            insert_order_to_dlob(
+                dlob,
+                user,
+                OrderType.Limit(),
+                MarketType.Perp(),
+                order_id,
+                market_index,
+                price,
+                BASE_PRECISION,
+                direction,
+                0,
+                0,
+                slot,
+                post_only=True,
+            )
+
+    def signatures(dlob):
+        node_lists = dlob.order_lists["perp"][market_index]
+        return {
+            side: [
+                (str(node.user_account), node.order.order_id)
+                for node in node_lists.resting_limit[side].get_generator()
+            ]
+            for side in ("bid", "ask")
+        }
+
+    assert signatures(linked_dlob) == signatures(sorted_dlob)
+
+    for user, order_id, _, _, _ in orders[::3]:
+        for dlob in (linked_dlob, sorted_dlob):
+            order = dlob.get_order(order_id, user)
+            dlob.delete(order, user, 1)
+
+    assert signatures(linked_dlob) == signatures(sorted_dlob)
+
+    sorted_bids = sorted_dlob.order_lists["perp"][market_index].resting_limit["bid"]
+    assert sorted_bids.length == len(signatures(sorted_dlob)["bid"])
+
+    # removing nodes while a generator is suspended must not skip or repeat nodes
+    expected = [node for node in sorted_bids.get_generator()]
+    seen = []
+    for node in sorted_bids.get_generator():
+        seen.append(node)
+        sorted_bids.remove(node.order, node.user_account)
+    assert seen == expected
+    assert sorted_bids.length == 0
+    assert sorted_bids.head is None
+
+
+def test_update_user_orders_matches_rebuild():
+    user = Keypair().pubkey()
+    market_index = 0
+    slot = 20
+
+    seed_dlob = DLOB()
+    for order_id, price, direction in [
+        (1, 9, PositionDirection.Long()),
+        (2, 8, PositionDirection.Long()),
+        (3, 12, PositionDirection.Short()),
+        (4, 13, PositionDirection.Short()),
+    ]:
+        insert_order_to_dlob(
+            seed_dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price,
+            BASE_PRECISION,
+            direction,
+            0,
+            0,
+            1,
+            post_only=True,
+        )
+    old_orders = [seed_dlob.get_order(order_id, user) for order_id in range(1, 5)]
+
+    new_orders = [
+        # partially filled
+        replace(old_orders[0], base_asset_amount_filled=BASE_PRECISION // 2),
+        # order 2 was cancelled
+        replace(old_orders[1], status=OrderStatus.Canceled()),
+        # modified price
+        replace(old_orders[2], price=11),
+        old_orders[3],
+        # newly placed
+        replace(old_orders[1], order_id=5, price=7),
+    ]
+
+    dlob = DLOB()
+    for order in old_orders:
+        dlob.insert_order(order, user, slot)
+    dlob.update_user_orders(user, old_orders, new_orders, slot)
+
+    rebuilt_dlob = DLOB()
+    for order in new_orders:
+        rebuilt_dlob.insert_order(order, user, slot)
+
+    def book(dlob):
+        node_lists = dlob.order_lists["perp"][market_index]
+        return {
+            side: [
+                (
+                    node.order.order_id,
+                    node.order.price,
+                    node.order.base_asset_amount_filled,
+                )
+                for node in node_lists.resting_limit[side].get_generator()
+            ]
+            for side in ("bid", "ask")
+        }
+
+    assert book(dlob) == book(rebuilt_dlob)
+    assert book(dlob) == {
+        "bid": [(1, 9, BASE_PRECISION // 2), (5, 7, 0)],
+        "ask": [(3, 11, 0), (4, 13, 0)],
+    }
+
+    dlob.update_user_orders(user, new_orders, [], slot)
+    assert book(dlob) == {"bid": [], "ask": []}
+
+
+def test_dlob_subscriber_caches_orderbooks():
+    user = Keypair().pubkey()
+    market_index = 0
+    slot = 20
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+
+    dlob = DLOB()
+    for order_id, price, direction in [
+        (1, 9, PositionDirection.Long()),
+        (2, 12, PositionDirection.Short()),
+    ]:
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price,
+            BASE_PRECISION,
+            direction,
+            0,
+            0,
+            1,
+            post_only=True,
+        )
+
+    slot_source = SimpleNamespace(get_slot=lambda: slot)
+    drift_client = SimpleNamespace(
+        get_oracle_price_data_for_perp_market=lambda _: oracle_price_data
+    )
+    dlob_subscriber = DLOBSubscriber(
+        config=DLOBClientConfig(drift_client, None, slot_source, 1, True)
+    )
+    dlob_subscriber.dlob = dlob
+
+    def get_l2():
+        return dlob_subscriber.get_l2_orderbook_sync(
+            market_index=market_index, market_type=MarketType.Perp()
+        )
+
+    l2 = get_l2()
+    assert get_l2() is l2
+    assert [level.price for level in l2.bids] == [9]
+    # books keep the L2OrderBook types whether cached or not
+    assert isinstance(l2.asks, list) and isinstance(l2.bids, list)
+    l3 = dlob_subscriber.get_l3_orderbook_sync(
+        market_index=market_index, market_type=MarketType.Perp()
+    )
+    assert (
+        dlob_subscriber.get_l3_orderbook_sync(
+            market_index=market_index, market_type=MarketType.Perp()
+        )
+        is l3
+    )
+
+    # a new order invalidates the cached book
+    insert_order_to_dlob(
+        dlob,
+        user,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        3,
+        market_index,
+        8,
+        BASE_PRECISION,
+        PositionDirection.Long(),
+        0,
+        0,
+        1,
+        post_only=True,
+    )
+    l2 = get_l2()
+    assert [level.price for level in l2.bids] == [9, 8]
+    assert get_l2() is l2
+
+    # and so does a new slot or oracle price
+    slot += 1
+    assert get_l2() is not l2
+    l2 = get_l2()
+    oracle_price_data = OraclePriceData(11, slot, 1, 1, 1, True)
+    assert get_l2() is not l2
+
+    stats = dlob_subscriber.get_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (4, 5)
+    assert stats["hit_rate"] == 4 / 9
+
+
+@pytest.mark.asyncio
+async def test_dlob_subscriber_l2_diffs_rebuild_orderbook():
+    user = Keypair().pubkey()
+    market_index = 0
+    slot = 20
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+
+    dlob = DLOB()
+    slot_source = SimpleNamespace(get_slot=lambda: slot)
+    drift_client = SimpleNamespace(
+        get_oracle_price_data_for_perp_market=lambda _: oracle_price_data
+    )
+    dlob_subscriber = DLOBSubscriber(
+        config=DLOBClientConfig(drift_client, None, slot_source, 1, True)
+    )
+    dlob_subscriber.dlob = dlob
+
+    def insert(order_id, price, direction, base_asset_amount=BASE_PRECISION):
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price,
+            base_asset_amount,
+            direction,
+            0,
+            0,
+            1,
+            post_only=True,
+        )
+
+    insert(1, 9, PositionDirection.Long())
+    insert(2, 12, PositionDirection.Short())
+
+    diffs = dlob_subscriber.subscribe_l2_diffs(
+        MarketId(market_index, MarketType.Perp())
+    )
+    orderbook = L2OrderBook([], [])
+
+    async def next_orderbook():
+        return apply_l2_orderbook_diff(orderbook, await diffs.__anext__())
+
+    def levels(levels):
+        return [(level.price, level.size) for level in levels]
+
+    orderbook = await next_orderbook()
+    assert levels(orderbook.bids) == [(9, BASE_PRECISION)]
+    assert levels(orderbook.asks) == [(12, BASE_PRECISION)]
+
+    # an update that leaves the book as it was yields nothing
+    await dlob_subscriber.on_dlob_update()
+    insert(3, 9, PositionDirection.Long(), 2 * BASE_PRECISION)
+    insert(4, 8, PositionDirection.Long())
+    dlob.delete(dlob.get_order(2, user), user, slot)
+    await dlob_subscriber.on_dlob_update()
+
+    orderbook = await next_orderbook()
+    assert levels(orderbook.bids) == [(9, 3 * BASE_PRECISION), (8, BASE_PRECISION)]
+    assert orderbook.asks == []
+    expected = dlob_subscriber.get_l2_orderbook_sync(
+        market_index=market_index, market_type=MarketType.Perp()
+    )
+    assert levels(orderbook.bids) == levels(expected.bids)
+
+    await diffs.aclose()
+    assert len(dlob_subscriber.event_emitter.on_dlob_update) == 0
+
+
+@pytest.mark.asyncio
+async def test_dlob_subscriber_fetches_l2_orderbooks_from_server():
+    slots = {0: 10, 1: 20}
+    requests = []
+    failures = [1]
+
+    async def l2(request):
+        market_index = int(request.query["marketIndex"])
+        requests.append((market_index, request.headers.get("If-None-Match")))
+        if market_index == 2:
+            if failures[0]:
+                failures[0] -= 1
+                return web.Response(status=500)
+            return web.json_response({"asks": [], "bids": [], "slot": 1})
+        etag = f'"{slots[market_index]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        body = {
+            "asks": [{"price": 12, "size": 1, "sources": {"dlob": 1}}],
+            "bids": [{"price": 9, "size": 2, "sources": {"vamm": 2}}],
+            "slot": slots[market_index],
+        }
+        # market 1 doesn't send ETags, so unchanged books are detected by slot
+        headers = {"ETag": etag} if market_index == 0 else None
+        return web.json_response(body, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/l2", l2)
+    async with TestServer(app) as server:
+        dlob_subscriber = DLOBSubscriber(url=str(server.make_url("/")))
+        markets = [MarketId(0, MarketType.Perp()), MarketId(1, MarketType.Perp())]
+        try:
+            first = await dlob_subscriber.get_l2_orderbooks(markets, True)
+            assert [orderbook.slot for orderbook in first] == [10, 20]
+            assert [(level.price, level.size) for level in first[0].bids] == [(9, 2)]
+            assert first[1].asks[0].sources == {"dlob": 1}
+
+            second = await dlob_subscriber.get_l2_orderbooks(markets, True)
+            assert all(a is b for a, b in zip(first, second))
+            assert sorted(requests[2:]) == [(0, '"10"'), (1, None)]
+
+            slots[0] += 1
+            third = await dlob_subscriber.get_l2_orderbooks(markets, True)
+            assert third[0].slot == 11 and third[1] is first[1]
+
+            # a failed fetch is retried instead of ending the subscription
+            orderbooks = dlob_subscriber.subscribe_l2_book(
+                MarketId(2, MarketType.Perp()), interval_s=0.01, min_backoff_s=0.01
+            )
+            assert (await orderbooks.__anext__()).slot == 1
+            await orderbooks.aclose()
+            assert failures == [0]
+        finally:
+            await DLOBSubscriber.close_session()
+
+
+@pytest.mark.asyncio
+async def test_dlob_subscriber_backs_off_without_poll_interval(monkeypatch):
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    async def get_orderbook(skip_unchanged):
+        if len(sleeps) < 7:
+            raise ValueError("server error")
+        return L2OrderBook([], [], 1)
+
+    monkeypatch.setattr("driftpy.dlob.dlob_subscriber.asyncio.sleep", sleep)
+    dlob_subscriber = DLOBSubscriber(url="http://localhost")
+    orderbooks = dlob_subscriber.poll_orderbook(
+        get_orderbook, "L2", 0, False, None, 8, 1
+    )
+    assert (await orderbooks.__anext__()).slot == 1
+    await orderbooks.aclose()
+    assert sleeps == [1, 2, 4, 8, 8, 8, 8]
+
+
+def test_resting_limit_orders_merge_floating_limit_orders():
+    market_index = 0
+    slot = 20
+    oracle_price = 100 * PRICE_PRECISION
+    oracle_price_data = OraclePriceData(oracle_price, slot, 1, 1, 1, True)
+
+    dlob = DLOB()
+    order_id = 0
+    for price, direction in [
+        (99, PositionDirection.Long()),
+        (97, PositionDirection.Long()),
+        (101, PositionDirection.Short()),
+        (103, PositionDirection.Short()),
+    ]:
+        for oracle_price_offset in (0, (price - 100) * PRICE_PRECISION + 1):
+            order_id += 1
+            insert_order_to_dlob(
+                dlob,
+                Keypair().pubkey(),
+                OrderType.Limit(),
+                MarketType.Perp(),
+                order_id,
+                market_index,
+                price * PRICE_PRECISION if oracle_price_offset == 0 else 0,
+                BASE_PRECISION,
+                direction,
+                0,
+                0,
+                1,
+                oracle_price_offset=oracle_price_offset,
+                post_only=True,
+            )
+
+    def prices(nodes):
+        return [node.get_price(oracle_price_data, slot) for node in nodes]
+
+    asks = prices(
+        dlob.get_resting_limit_asks(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+    )
+    bids = prices(
+        dlob.get_resting_limit_bids(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+    )
+    assert asks == [p * PRICE_PRECISION + d for p in (101, 103) for d in (0, 1)]
+    assert bids == [p * PRICE_PRECISION + d for p in (99, 97) for d in (1, 0)]
+
+    l2 = dlob.get_l2(market_index, MarketType.Perp(), slot, oracle_price_data, depth=10)
+    assert [level.price for level in l2.asks] == asks
+    assert [level.price for level in l2.bids] == bids
+    assert [level.size for level in l2.asks + l2.bids] == [BASE_PRECISION] * 8
+
+
+def test_crossing_resting_limit_orders_simulate_fills_without_mutating_book():
+    market_index = 0
+    slot = 20
+    oracle_price_data = OraclePriceData(100 * PRICE_PRECISION, slot, 1, 1, 1, True)
+
+    dlob = DLOB()
+    orders = [
+        # order id, price, size, direction, slot, post only
+        (1, 101, 3, PositionDirection.Long(), 1, False),
+        (2, 101, 1, PositionDirection.Long(), 2, False),
+        (3, 99, 1, PositionDirection.Short(), 3, True),
+        (4, 100, 1, PositionDirection.Short(), 4, True),
+        (5, 101, 2, PositionDirection.Short(), 5, True),
+    ]
+    for order_id, price, size, direction, order_slot, post_only in orders:
+        insert_order_to_dlob(
+            dlob,
+            Keypair().pubkey(),
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price * PRICE_PRECISION,
+            size * BASE_PRECISION,
+            direction,
+            0,
+            0,
+            order_slot,
+            post_only=post_only,
+        )
+    # the bids' auctions are complete, move them to the resting limit lists
+    dlob.update_resting_limit_orders(slot)
+    version = dlob.version
+
+    for _ in range(2):
+        nodes_to_fill = dlob.find_crossing_resting_limit_orders(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+        assert [
+            (node_to_fill.node.order.order_id, node_to_fill.maker[0].order.order_id)
+            for node_to_fill in nodes_to_fill
+        ] == [(1, 3), (1, 4), (1, 5), (2, 5)]
+
+        # simulated fills are dropped after the pass, the book is left as is
+        assert dlob.simulated_fills is None
+        assert dlob.version == version
+        for node_to_fill in nodes_to_fill:
+            for node in [node_to_fill.node, *node_to_fill.maker]:
+                assert node.order.base_asset_amount_filled == 0
+
+
+def test_limit_price_keys_match_get_price():
+    oracle_price_data = OraclePriceData(100 * PRICE_PRECISION, 20, 1, 1, 1, True)
+
+    dlob = DLOB()
+    for order_id, (price, oracle_price_offset, auction_duration) in enumerate(
+        [
+            (99 * PRICE_PRECISION, 0, 0),
+            (98 * PRICE_PRECISION, 0, 10),
+            (0, -PRICE_PRECISION, 0),
+            (0, -2 * PRICE_PRECISION, 10),
+        ]
+    ):
+        insert_order_to_dlob(
+            dlob,
+            Keypair().pubkey(),
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            0,
+            price,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            price - 3 * PRICE_PRECISION if price else -5 * PRICE_PRECISION,
+            price if price else oracle_price_offset,
+            10,
+            oracle_price_offset=oracle_price_offset,
+            post_only=True,
+            auction_duration=auction_duration,
+        )
+
+    node_lists = dlob.order_lists["perp"][0]
+    # in and after the auctions of order 1 and 3
+    for slot in (15, 25):
+        for node_list, base_price in [
+            (node_lists.resting_limit["bid"], 0),
+            (node_lists.floating_limit["bid"], oracle_price_data.price),
+        ]:
+            keys = get_limit_price_key_generator(
+                node_list.get_generator(), base_price, oracle_price_data, slot, -1
+            )
+            for key, node in keys:
+                assert key == -node.get_price(oracle_price_data, slot)
+
+    # updated orders are priced off their new auction
+    for node_list, base_price in [
+        (node_lists.resting_limit["bid"], 0),
+        (node_lists.floating_limit["bid"], oracle_price_data.price),
+    ]:
+        for node in list(node_list.get_generator()):
+            node_list.update(
+                replace(node.order, auction_duration=20), node.user_account
+            )
+        keys = get_limit_price_key_generator(
+            node_list.get_generator(), base_price, oracle_price_data, 25, -1
+        )
+        for key, node in keys:
+            assert node.auction_end_slot == 30
+            assert key == -node.get_price(oracle_price_data, 25)
+
+
+def test_update_user_orders_from_a_slot_older_than_the_dlob():
+    user = Keypair().pubkey()
+    seed_dlob = DLOB()
+    for order_id, post_only in [(1, False), (99, True)]:
+        insert_order_to_dlob(
+            seed_dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            0,
+            100 * PRICE_PRECISION,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            99 * PRICE_PRECISION,
+            100 * PRICE_PRECISION,
+            1,
+            post_only=post_only,
+            auction_duration=5,
+        )
+    order, resting_order = seed_dlob.get_order(1, user), seed_dlob.get_order(99, user)
+
+    dlob = DLOB()
+    dlob.insert_order(resting_order, user, 1)
+    node_lists = dlob.order_lists["perp"][0]
+
+    def book():
+        return [
+            [node.order.order_id for node in node_list["bid"].get_generator()]
+            for node_list in (node_lists.taking_limit, node_lists.resting_limit)
+        ]
+
+    # the book is at slot 10, past the end of the order's auction, when an
+    # account update from slot 2 places it
+    dlob.update_resting_limit_orders(10)
+    dlob.update_user_orders(user, [resting_order], [resting_order, order], 2)
+    assert book() == [[], [99, 1]]
+
+    filled = replace(order, base_asset_amount_filled=BASE_PRECISION // 2)
+    dlob.update_user_orders(user, [resting_order, order], [resting_order, filled], 8)
+    assert dlob.get_order(1, user) == filled
+
+    dlob.update_user_orders(user, [resting_order, filled], [resting_order], 8)
+    dlob.update_resting_limit_orders(11)
+    assert book() == [[], [99]]
+
+
+def test_taking_limit_orders_rest_and_expire_by_index():
+    dlob = DLOB()
+    user = Keypair().pubkey()
+    ts = 1_000
+    for order_id, auction_duration, max_ts in [
+        (1, 5, 0),
+        (2, 10, ts + 20),
+        (3, 20, ts + 10),
+    ]:
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            0,
+            100 * PRICE_PRECISION,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            99 * PRICE_PRECISION,
+            100 * PRICE_PRECISION,
+            1,
+            max_ts=max_ts,
+            auction_duration=auction_duration,
+        )
+    node_lists = dlob.order_lists["perp"][0]
+
+    def order_ids(node_list):
+        return [node.order.order_id for node in node_list.get_generator()]
+
+    for slot, taking, resting in [
+        (6, [1, 2, 3], []),
+        (7, [2, 3], [1]),
+        (15, [3], [1, 2]),
+        (30, [], [1, 2, 3]),
+    ]:
+        dlob.update_resting_limit_orders(slot)
+        assert order_ids(node_lists.taking_limit["bid"]) == taking
+        assert order_ids(node_lists.resting_limit["bid"]) == resting
+
+    # limit orders expire 15s after their max ts
+    def expired_order_ids(ts):
+        return sorted(
+            node_to_fill.node.order.order_id
+            for node_to_fill in dlob.find_expired_nodes_to_fill(
+                0, ts, MarketType.Perp()
+            )
+        )
+
+    assert expired_order_ids(ts + 25) == []
+    assert expired_order_ids(ts + 26) == [3]
+    assert expired_order_ids(ts + 36) == [2, 3]
+    # expired orders are found until they are removed from the book
+    assert expired_order_ids(ts + 36) == [2, 3]
+    dlob.delete(dlob.get_order(3, user), user, 30)
+    assert expired_order_ids(ts + 36) == [2]
+
+
+def test_order_churn_keeps_heaps_bounded():
+    dlob = DLOB()
+    user = Keypair().pubkey()
+    ts = 1_000
+    for order_id in range(1, 4):
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            0,
+            100 * PRICE_PRECISION,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            99 * PRICE_PRECISION,
+            100 * PRICE_PRECISION,
+            1,
+            max_ts=ts + order_id,
+            auction_duration=50,
+        )
+    node_lists = dlob.order_lists["perp"][0]
+    orders = [dlob.get_order(order_id, user) for order_id in range(1, 4)]
+
+    # every modification deletes the order and inserts it again
+    for i in range(1, 1_000):
+        new_orders = list(orders)
+        new_orders[i % 3] = replace(
+            orders[i % 3], price=(100 + i % 7) * PRICE_PRECISION
+        )
+        dlob.update_user_orders(user, orders, new_orders, 2)
+        orders = new_orders
+        assert len(node_lists.auction_ends) + len(node_lists.expiries) <= 14
+
+    dlob.update_resting_limit_orders(52)
+    assert [
+        node.order.order_id for node in node_lists.resting_limit["bid"].get_generator()
+    ] == [order.order_id for order in sorted(orders, key=lambda o: -o.price)]
+    assert sorted(
+        node_to_fill.node.order.order_id
+        for node_to_fill in dlob.find_expired_nodes_to_fill(
+            0, ts + 100, MarketType.Perp()
+        )
+    ) == [1, 2, 3]
+
+
+def test_find_nodes_for_markets_matches_per_market_calls():
+    slot = 20
+    ts = 1_000
+    state_account = SimpleNamespace(
+        exchange_status=0,
+        min_perp_auction_duration=10,
+        perp_fee_structure=SimpleNamespace(
+            fee_tiers=[
+                SimpleNamespace(maker_rebate_numerator=2, maker_rebate_denominator=10)
+            ]
+        ),
+    )
+    markets = [
+        MarketToScan(
+            market_account,
+            OraclePriceData(100 * PRICE_PRECISION, slot, 1, 1, 1, True),
+            fallback_bid=99 * PRICE_PRECISION,
+            fallback_ask=101 * PRICE_PRECISION,
+        )
+        for market_account in mock_perp_markets
+    ]
+
+    dlob = DLOB()
+    order_id = 0
+    # market 2 has no orders
+    for market_index in (0, 1):
+        for price, direction, post_only in [
+            (101, PositionDirection.Long(), False),
+            (99, PositionDirection.Short(), True),
+            (100, PositionDirection.Short(), True),
+            (98, PositionDirection.Long(), True),
+        ]:
+            order_id += 1
+            insert_order_to_dlob(
+                dlob,
+                Keypair().pubkey(),
+                OrderType.Limit(),
+                MarketType.Perp(),
+                order_id,
+                market_index,
+                price * PRICE_PRECISION,
+                BASE_PRECISION,
+                direction,
+                0,
+                0,
+                1,
+                max_ts=ts - 20 if price == 98 else 0,
+                post_only=post_only,
+            )
+        order_id += 1
+        insert_trigger_order_to_dlob(
+            dlob,
+            Keypair().pubkey(),
+            OrderType.TriggerMarket(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            0,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            99 * PRICE_PRECISION,
+            OrderTriggerCondition.Above(),
+            0,
+            0,
+        )
+
+    def order_ids(nodes_to_fill):
+        return [
+            (
+                node_to_fill.node.order.order_id,
+                [maker.order.order_id for maker in node_to_fill.maker],
+            )
+            for node_to_fill in nodes_to_fill
+        ]
+
+    expected = {
+        market.key: order_ids(
+            dlob.find_nodes_to_fill(
+                market.market_account.market_index,
+                slot,
+                ts,
+                MarketType.Perp(),
+                market.oracle_price_data,
+                state_account,
+                market.market_account,
+                market.fallback_bid,
+                market.fallback_ask,
+            )
+        )
+        for market in markets[:2]
+    }
+    expected[("perp", 2)] = []
+    assert all(expected[("perp", market_index)] for market_index in (0, 1))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for pool in (None, executor):
+            nodes_to_fill = dlob.find_nodes_to_fill_for_markets(
+                markets, slot, ts, state_account, pool
+            )
+            assert {
+                key: order_ids(market_nodes_to_fill)
+                for key, market_nodes_to_fill in nodes_to_fill.items()
+            } == expected
+
+    # exchange_paused reads the status as an ExchangeStatus variant
+    nodes_to_trigger = dlob.find_nodes_to_trigger_for_markets(
+        markets, SimpleNamespace(exchange_status=ExchangeStatus.Active())
+    )
+    assert {
+        key: [node.node.order.order_id for node in market_nodes_to_trigger]
+        for key, market_nodes_to_trigger in nodes_to_trigger.items()
+    } == {("perp", 0): [5], ("perp", 1): [10], ("perp", 2): []}
+
+
+def test_find_nodes_to_trigger_returns_crossed_trigger_prices():
+    state_account = SimpleNamespace(exchange_status=ExchangeStatus.Active())
+    rng = random.Random(0)
+    trigger_prices = [rng.randint(90, 110) * PRICE_PRECISION for _ in range(40)]
+
+    for backend in ("linked", "sorted"):
+        dlob = DLOB(node_list_backend=backend)
+        for order_id, trigger_price in enumerate(trigger_prices):
+            insert_trigger_order_to_dlob(
+                dlob,
+                Keypair().pubkey(),
+                OrderType.TriggerMarket(),
+                MarketType.Perp(),
+                order_id,
+                0,
+                0,
+                BASE_PRECISION,
+                PositionDirection.Long(),
+                trigger_price,
+                (
+                    OrderTriggerCondition.Above()
+                    if order_id % 2
+                    else OrderTriggerCondition.Below()
+                ),
+                0,
+                0,
+            )
+
+        for oracle_price in (85, 95, 100, 105, 115):
+            oracle_price *= PRICE_PRECISION
+            nodes_to_trigger = dlob.find_nodes_to_trigger(
+                0, oracle_price, MarketType.Perp(), state_account
+            )
+            assert sorted(
+                node_to_trigger.node.order.order_id
+                for node_to_trigger in nodes_to_trigger
+            ) == [
+                order_id
+                for order_id, trigger_price in enumerate(trigger_prices)
+                if (
+                    oracle_price > trigger_price
+                    if order_id % 2
+                    else oracle_price < trigger_price
+                )
+            ]
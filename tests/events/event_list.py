@@ -0,0 +1,101 @@
+import random
+from types import SimpleNamespace
+
+from pytest import mark
+from solders.pubkey import Pubkey
+
+from driftpy.events.event_list import EventList
+from driftpy.events.sort import get_sort_fn
+from driftpy.events.types import WrappedEvent
+
+
+def make_event(slot: int, tx_sig_index: int, taker: Pubkey, maker: Pubkey):
+    return WrappedEvent(
+        event_type="OrderActionRecord",
+        tx_sig=f"{slot}-{tx_sig_index}",
+        slot=slot,
+        tx_sig_index=tx_sig_index,
+        data=SimpleNamespace(
+            market_index=slot % 3,
+            taker=taker,
+            taker_order_id=slot % 5,
+            maker=maker,
+            maker_order_id=tx_sig_index,
+        ),
+    )
+
+
+def reference_insert(events: list, event, sort_fn, order_direction, max_size):
+    # linear scan, as the linked list implementation did
+    halt_condition = -1 if order_direction == "asc" else 1
+    i = 0
+    while i < len(events) and sort_fn(events[i], event) != halt_condition:
+        i += 1
+    events.insert(i, event)
+    if len(events) > max_size:
+        events.pop()
+
+
+def walk(node, direction: str) -> list:
+    events = []
+    while node is not None:
+        events.append(node.event)
+        node = getattr(node, direction)
+    return events
+
+
+@mark.parametrize("order_by", ["blockchain", "client"])
+@mark.parametrize("order_dir", ["asc", "desc"])
+def test_event_list_matches_linear_insert(order_by, order_dir):
+    rng = random.Random(0)
+    users = [Pubkey.new_unique() for _ in range(4)]
+    sort_fn = get_sort_fn(order_by, order_dir)
+    event_list = EventList(50, sort_fn, order_dir)
+    expected = []
+    assert event_list.head is None and event_list.tail is None
+
+    for i in range(300):
+        events = [
+            make_event(rng.randint(0, 40), rng.randint(0, 3), *rng.sample(users, 2))
+            for _ in range(rng.randint(1, 4))
+        ]
+        if len(events) == 1:
+            event_list.insert(events[0])
+        else:
+            event_list.insert_many(events)
+        for event in events:
+            reference_insert(expected, event, sort_fn, order_dir, 10_000)
+        # insert_many evicts once at the end, which is the same as evicting
+        # after every insert since it always drops the last event
+        del expected[50:]
+
+        assert event_list.to_array() == expected
+        assert event_list.size == len(expected)
+        assert walk(event_list.head, "next") == expected
+        assert walk(event_list.tail, "prev") == expected[::-1]
+
+        # the index is built by the first lookup, halfway, and kept after that
+        if i == 150:
+            assert event_list.index is None
+            assert event_list.get_by_user(users[1]) == [
+                e for e in expected if users[1] in (e.data.taker, e.data.maker)
+            ]
+            assert event_list.index is not None
+
+    user = users[0]
+    assert event_list.get_by_user(user) == [
+        e for e in expected if user in (e.data.taker, e.data.maker)
+    ]
+    assert event_list.get_by_user(str(user)) == event_list.get_by_user(user)
+    assert event_list.get_by_market_index(1) == [
+        e for e in expected if e.data.market_index == 1
+    ]
+    assert event_list.get_by_order_id(2) == [
+        e for e in expected if 2 in (e.data.taker_order_id, e.data.maker_order_id)
+    ]
+    assert event_list.get_by_order_id(2, user) == [
+        e
+        for e in expected
+        if (e.data.taker, e.data.taker_order_id) == (user, 2)
+        or (e.data.maker, e.data.maker_order_id) == (user, 2)
+    ]
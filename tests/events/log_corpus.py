@@ -0,0 +1,118 @@
+import base64
+import random
+import struct
+
+from anchorpy import Idl
+from anchorpy.coder.event import _event_discriminator
+from anchorpy_core.idl import (
+    IdlTypeArray,
+    IdlTypeDefined,
+    IdlTypeDefinitionTyEnum,
+    IdlTypeOption,
+    IdlTypeSimple,
+    IdlTypeVec,
+)
+from solders.pubkey import Pubkey
+
+from driftpy.events.parse import DRIFT_PROGRAM_ID
+
+# synthetic transaction logs, serialized from random values of the IDL's events
+
+SIMPLE_SIZES = {
+    IdlTypeSimple.Bool: 1,
+    IdlTypeSimple.U8: 1,
+    IdlTypeSimple.I8: 1,
+    IdlTypeSimple.U16: 2,
+    IdlTypeSimple.I16: 2,
+    IdlTypeSimple.U32: 4,
+    IdlTypeSimple.I32: 4,
+    IdlTypeSimple.F32: 4,
+    IdlTypeSimple.U64: 8,
+    IdlTypeSimple.I64: 8,
+    IdlTypeSimple.F64: 8,
+    IdlTypeSimple.U128: 16,
+    IdlTypeSimple.I128: 16,
+    IdlTypeSimple.PublicKey: 32,
+}
+
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+COMPUTE_BUDGET_PROGRAM_ID = "ComputeBudget111111111111111111111111111111"
+
+
+def serialize(ty, types: dict, rng: random.Random) -> bytes:
+    if isinstance(ty, IdlTypeSimple):
+        if ty == IdlTypeSimple.Bool:
+            return bytes([rng.randint(0, 1)])
+        if ty in (IdlTypeSimple.F32, IdlTypeSimple.F64):
+            return struct.pack("<f" if ty == IdlTypeSimple.F32 else "<d", rng.random())
+        if ty in (IdlTypeSimple.String, IdlTypeSimple.Bytes):
+            data = bytes(rng.randint(97, 122) for _ in range(rng.randint(0, 16)))
+            return struct.pack("<I", len(data)) + data
+        if ty == IdlTypeSimple.PublicKey:
+            return bytes(Pubkey.new_unique())
+        size = SIMPLE_SIZES[ty]
+        return rng.randrange(256 ** min(size, 4)).to_bytes(size, "little")
+    if isinstance(ty, IdlTypeOption):
+        if rng.random() < 0.5:
+            return b"\x00"
+        return b"\x01" + serialize(ty.option, types, rng)
+    if isinstance(ty, IdlTypeVec):
+        length = rng.randint(0, 3)
+        return struct.pack("<I", length) + b"".join(
+            serialize(ty.vec, types, rng) for _ in range(length)
+        )
+    if isinstance(ty, IdlTypeArray):
+        inner, length = ty.array
+        return b"".join(serialize(inner, types, rng) for _ in range(length))
+    if isinstance(ty, IdlTypeDefined):
+        definition = types[ty.defined].ty
+        if isinstance(definition, IdlTypeDefinitionTyEnum):
+            index = rng.randrange(len(definition.variants))
+            fields = definition.variants[index].fields or []
+            return bytes([index]) + b"".join(
+                serialize(getattr(field, "ty", field), types, rng) for field in fields
+            )
+        return b"".join(serialize(field.ty, types, rng) for field in definition.fields)
+    raise ValueError(f"Unsupported idl type: {ty}")
+
+
+def make_corpus(idl: Idl, num_transactions: int, seed: int = 0) -> list[list[str]]:
+    rng = random.Random(seed)
+    types = {ty.name: ty for ty in idl.types}
+    events = [
+        (_event_discriminator(event.name), event)
+        for event in idl.events
+        # fills dominate mainnet traffic
+        for _ in range(20 if event.name == "OrderActionRecord" else 1)
+    ]
+
+    def program_data() -> str:
+        discriminator, event = rng.choice(events)
+        data = discriminator + b"".join(
+            serialize(field.ty, types, rng) for field in event.fields
+        )
+        return "Program data: " + base64.b64encode(data).decode()
+
+    corpus = []
+    for _ in range(num_transactions):
+        logs = [
+            f"Program {COMPUTE_BUDGET_PROGRAM_ID} invoke [1]",
+            f"Program {COMPUTE_BUDGET_PROGRAM_ID} success",
+            f"Program {DRIFT_PROGRAM_ID} invoke [1]",
+            "Program log: Instruction: FillPerpOrder",
+        ]
+        for _ in range(rng.randint(1, 8)):
+            if rng.random() < 0.2:
+                logs += [
+                    f"Program {TOKEN_PROGRAM_ID} invoke [2]",
+                    "Program log: Instruction: Transfer",
+                    f"Program {TOKEN_PROGRAM_ID} consumed 4645 of 180000 compute units",
+                    f"Program {TOKEN_PROGRAM_ID} success",
+                ]
+            logs.append(program_data())
+        logs += [
+            f"Program {DRIFT_PROGRAM_ID} consumed 120000 of 200000 compute units",
+            f"Program {DRIFT_PROGRAM_ID} success",
+        ]
+        corpus.append(logs)
+    return corpus
@@ -0,0 +1,45 @@
+import base64
+from pathlib import Path
+
+from anchorpy import Idl, Program
+from solders.pubkey import Pubkey
+
+import driftpy
+from driftpy.events.parse import DRIFT_PROGRAM_ID, EventLogParser, parse_logs
+from tests.events.log_corpus import make_corpus
+
+IDL = Idl.from_json((Path(driftpy.__path__[0]) / "idl/drift.json").read_text())
+PROGRAM = Program(IDL, Pubkey.from_string(DRIFT_PROGRAM_ID))
+
+
+def test_event_log_parser_matches_parse_logs():
+    corpus = make_corpus(IDL, 200, seed=1)
+    # events outside the drift program and after truncation are ignored
+    compute_budget_invoke, compute_budget_success = corpus[0][:2]
+    corpus.append(
+        [
+            compute_budget_invoke,
+            corpus[0][-3],
+            compute_budget_success,
+            *corpus[1],
+            "Log truncated",
+            *corpus[2],
+        ]
+    )
+    corpus.append(["Program data: " + base64.b64encode(b"not an event").decode()])
+
+    event_log_parser = EventLogParser(PROGRAM)
+    for logs in corpus:
+        assert event_log_parser.parse_logs(logs) == parse_logs(PROGRAM, logs)
+
+
+def test_event_log_parser_event_names():
+    corpus = make_corpus(IDL, 50, seed=2)
+    event_log_parser = EventLogParser(PROGRAM, event_names=["OrderActionRecord"])
+    for logs in corpus:
+        expected = [
+            (index, event)
+            for index, event in enumerate(parse_logs(PROGRAM, logs))
+            if event.name == "OrderActionRecord"
+        ]
+        assert event_log_parser.parse_indexed_logs(logs) == expected
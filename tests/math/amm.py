@@ -2,6 +2,7 @@ import copy
 from copy import deepcopy
 from unittest.mock import Mock
 
+import numpy as np
 import pytest
 
 from driftpy.constants.numeric_constants import (
@@ -12,8 +13,16 @@ from driftpy.constants.numeric_constants import (
     SPOT_MARKET_CUMULATIVE_INTEREST_PRECISION,
     SPOT_MARKET_WEIGHT_PRECISION,
 )
-from driftpy.dlob.orderbook_levels import get_vamm_l2_generator
-from driftpy.math.amm import calculate_market_open_bid_ask, calculate_updated_amm
+from driftpy.dlob.orderbook_levels import (
+    get_vamm_l2_generator,
+    get_vamm_l2_ladder,
+    get_vamm_l2_ladder_side,
+)
+from driftpy.math.amm import (
+    calculate_market_open_bid_ask,
+    calculate_spread_reserves,
+    calculate_updated_amm,
+)
 from driftpy.types import (
     AssetTier,
     MarketStatus,
@@ -520,3 +529,91 @@ async def test_orderbook_l2_gen_no_top_of_book_quote_amounts_10_orders_no_liquid
     print(f"total_ask_size: {total_ask_size} \nopen_asks: {open_asks}")
     assert open_asks == -9
     assert total_ask_size == 0
+
+
+@pytest.mark.parametrize(
+    "top_of_book_quote_amounts", [[], [QUOTE_PRECISION // 10, QUOTE_PRECISION]]
+)
+def test_vamm_l2_ladder_int64_matches_python_ints(top_of_book_quote_amounts):
+    mock_market1 = custom_deepcopy_perp_market_account(mock_perp_markets[0])
+    # small enough reserves for every intermediate value to fit in an int64
+    mock_market1.amm.base_asset_reserve = 1_900_000_000
+    mock_market1.amm.quote_asset_reserve = 1_800_000_000
+    mock_market1.amm.sqrt_k = 1_800_000_000
+    mock_market1.amm.max_base_asset_reserve = mock_market1.amm.base_asset_reserve * 2
+    mock_market1.amm.min_base_asset_reserve = mock_market1.amm.base_asset_reserve // 2
+    mock_market1.amm.peg_multiplier = int(18.32 * PEG_PRECISION)
+    mock_market1.amm.historical_oracle_data.last_oracle_price = int(
+        18.5535 * PRICE_PRECISION
+    )
+    oracle_price_data = OraclePriceData(int(18.624 * PRICE_PRECISION), 0, 1, 1, 1, True)
+    now = 1_688_881_915
+
+    ladder = get_vamm_l2_ladder(
+        mock_market1, oracle_price_data, 50, now, top_of_book_quote_amounts
+    )
+    assert ladder.bid_prices.dtype == np.int64
+    assert len(ladder.bid_prices) == 50
+
+    updated_amm = calculate_updated_amm(mock_market1.amm, oracle_price_data)
+    bid_reserves, ask_reserves = calculate_spread_reserves(
+        updated_amm, oracle_price_data, now
+    )
+    open_bids, open_asks = calculate_market_open_bid_ask(
+        updated_amm.base_asset_reserve,
+        updated_amm.min_base_asset_reserve,
+        updated_amm.max_base_asset_reserve,
+        updated_amm.order_step_size,
+    )
+    num_base_orders = 50 - len(top_of_book_quote_amounts)
+    for reserves, open_liquidity, is_bid, prices, sizes in (
+        (bid_reserves, open_bids, True, ladder.bid_prices, ladder.bid_sizes),
+        (ask_reserves, -open_asks, False, ladder.ask_prices, ladder.ask_sizes),
+    ):
+        for dtype in (np.int64, object):
+            dtype_prices, dtype_sizes = get_vamm_l2_ladder_side(
+                *reserves,
+                updated_amm.sqrt_k**2,
+                updated_amm.peg_multiplier,
+                open_liquidity,
+                50,
+                num_base_orders,
+                top_of_book_quote_amounts,
+                is_bid,
+                dtype=dtype,
+            )
+            assert prices.tolist() == dtype_prices.tolist()
+            assert sizes.tolist() == dtype_sizes.tolist()
+
+    get_l2_bids, get_l2_asks = get_vamm_l2_generator(
+        mock_market1, oracle_price_data, 50, now, top_of_book_quote_amounts
+    )
+    assert [(level.price, level.size) for level in get_l2_bids()] == list(
+        zip(ladder.bid_prices.tolist(), ladder.bid_sizes.tolist())
+    )
+    assert [(level.price, level.size) for level in get_l2_asks()] == list(
+        zip(ladder.ask_prices.tolist(), ladder.ask_sizes.tolist())
+    )
+
+
+def test_vamm_l2_ladder_side_falls_back_to_python_ints_past_int64():
+    # the reserves fit in an int64, but the quote reserve after the last ask
+    # level doesn't once multiplied by the peg
+    base_asset_reserve = quote_asset_reserve = 3_000_000_000
+    peg_multiplier = 10 * PEG_PRECISION
+    open_liquidity = base_asset_reserve - base_asset_reserve // 1000
+    args = (
+        base_asset_reserve,
+        quote_asset_reserve,
+        base_asset_reserve * quote_asset_reserve,
+        peg_multiplier,
+        open_liquidity,
+        10,
+        10,
+        [],
+        False,
+    )
+    prices, sizes = get_vamm_l2_ladder_side(*args)
+    object_prices, object_sizes = get_vamm_l2_ladder_side(*args, dtype=object)
+    assert prices.tolist() == object_prices.tolist()
+    assert sizes.tolist() == object_sizes.tolist()
@@ -0,0 +1,141 @@
+import random
+from dataclasses import replace
+
+from pytest import mark
+
+from driftpy.constants.numeric_constants import (
+    AMM_RESERVE_PRECISION,
+    PRICE_PRECISION,
+    SPOT_BALANCE_PRECISION,
+)
+from driftpy.math.margin import (
+    MarginCategory,
+    MarketRiskTable,
+    calculate_asset_weight,
+    calculate_liability_weight,
+    calculate_market_margin_ratio,
+)
+from driftpy.types import MarketStatus
+from tests.dlob_test_constants import mock_perp_markets, mock_spot_markets
+
+IMF_FACTORS = [0, 1, 1_000, 2_000, 100_000, 1_000_000]
+CATEGORIES = [MarginCategory.INITIAL, MarginCategory.MAINTENANCE]
+
+
+def make_sizes(rng: random.Random, boundaries) -> list:
+    sizes = [0, 1, 2**53, 2**53 + 1, 10**30]
+    sizes += [10**exponent for exponent in range(25)]
+    sizes += [rng.randint(0, 10 ** rng.randint(1, 24)) for _ in range(300)]
+    for boundary in boundaries:
+        for delta in (-2, -1, 0, 1, 2):
+            sizes.append(max(0, boundary + delta))
+    sizes += [size + 0.5 for size in sizes[:100]]
+    return sizes + [-size for size in sizes]
+
+
+def same(value, expected) -> bool:
+    return type(value) is type(expected) and value == expected
+
+
+@mark.asyncio
+async def test_spot_market_risk_matches_margin_functions():
+    rng = random.Random(0)
+    table = MarketRiskTable()
+    for decimals in (6, 9, 10):
+        for imf_factor in IMF_FACTORS:
+            spot_market = replace(
+                mock_spot_markets[1],
+                decimals=decimals,
+                imf_factor=imf_factor,
+                initial_asset_weight=8_000,
+                maintenance_asset_weight=9_000,
+                initial_liability_weight=12_000,
+                maintenance_liability_weight=11_000,
+                scale_initial_asset_weight_start=rng.choice([0, 10**12]),
+                deposit_balance=10_000 * SPOT_BALANCE_PRECISION,
+            )
+            spot_market_risk = table.get_spot_market_risk(spot_market)
+            oracle_prices = [PRICE_PRECISION, 150 * PRICE_PRECISION]
+            for category in CATEGORIES:
+                for oracle_price in oracle_prices:
+                    spot_market_risk.get_asset_weight(1, oracle_price, category)
+                spot_market_risk.get_liability_weight(1, category)
+
+            ratio = 10**decimals / AMM_RESERVE_PRECISION
+            boundaries = [
+                int(size * ratio) for size in spot_market_risk.max_flat_sizes.values()
+            ]
+            for size in make_sizes(rng, boundaries):
+                for oracle_price in oracle_prices:
+                    for category in CATEGORIES + [None]:
+                        assert same(
+                            spot_market_risk.get_asset_weight(
+                                size, oracle_price, category
+                            ),
+                            calculate_asset_weight(
+                                size, oracle_price, spot_market, category
+                            ),
+                        ), (decimals, imf_factor, size, oracle_price, category)
+                for category in CATEGORIES + [None]:
+                    assert same(
+                        spot_market_risk.get_liability_weight(size, category),
+                        calculate_liability_weight(size, spot_market, category),
+                    ), (decimals, imf_factor, size, category)
+
+
+@mark.asyncio
+async def test_perp_market_risk_matches_margin_functions():
+    rng = random.Random(1)
+    table = MarketRiskTable()
+    for imf_factor in IMF_FACTORS:
+        for status, high_leverage_margin_ratio in (
+            (MarketStatus.Active(), 0),
+            (MarketStatus.Active(), 100),
+            (MarketStatus.Settlement(), 0),
+        ):
+            perp_market = replace(
+                mock_perp_markets[0],
+                imf_factor=imf_factor,
+                status=status,
+                high_leverage_margin_ratio_initial=high_leverage_margin_ratio,
+                high_leverage_margin_ratio_maintenance=high_leverage_margin_ratio // 2,
+            )
+            perp_market_risk = table.get_perp_market_risk(perp_market)
+            for category in CATEGORIES:
+                perp_market_risk.get_margin_ratio(1, category)
+
+            for size in make_sizes(rng, perp_market_risk.max_flat_sizes.values()):
+                for category in CATEGORIES:
+                    for custom_margin_ratio in (0, 5_000):
+                        for user_high_leverage_mode in (False, True):
+                            args = (
+                                size,
+                                category,
+                                custom_margin_ratio,
+                                user_high_leverage_mode,
+                            )
+                            assert same(
+                                perp_market_risk.get_margin_ratio(*args),
+                                calculate_market_margin_ratio(perp_market, *args),
+                            ), (imf_factor, status, args)
+
+
+@mark.asyncio
+async def test_market_risk_table_rebuilds_on_new_market_account():
+    table = MarketRiskTable()
+    spot_market = replace(mock_spot_markets[1], imf_factor=1_000)
+    spot_market_risk = table.get_spot_market_risk(spot_market)
+    assert table.get_spot_market_risk(spot_market) is spot_market_risk
+
+    updated_spot_market = replace(spot_market, maintenance_liability_weight=20_000)
+    updated_spot_market_risk = table.get_spot_market_risk(updated_spot_market)
+    assert updated_spot_market_risk is not spot_market_risk
+    assert (
+        updated_spot_market_risk.get_liability_weight(1, MarginCategory.MAINTENANCE)
+        == 20_000
+    )
+
+    perp_market = mock_perp_markets[0]
+    perp_market_risk = table.get_perp_market_risk(perp_market)
+    assert table.get_perp_market_risk(perp_market) is perp_market_risk
+    assert table.get_perp_market_risk(replace(perp_market)) is not perp_market_risk
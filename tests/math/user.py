@@ -1,8 +1,13 @@
+import copy
+import random
 from copy import deepcopy
+from types import SimpleNamespace
 from unittest.mock import Mock
 
 from pytest import mark
+from solders.pubkey import Pubkey
 
+from driftpy.accounts import DataAndSlot
 from driftpy.constants.numeric_constants import (
     BASE_PRECISION,
     MARGIN_PRECISION,
@@ -15,7 +20,16 @@ from driftpy.math.margin import MarginCategory
 from driftpy.math.perp_position import calculate_position_pnl
 from driftpy.math.spot_position import get_worst_case_token_amounts
 from driftpy.oracles.strict_oracle_price import StrictOraclePrice
-from driftpy.types import SpotBalanceType
+from driftpy.types import (
+    ContractType,
+    MarketStatus,
+    OraclePriceData,
+    SpotBalanceType,
+    UserStatus,
+)
+from driftpy.user_map.risk_engine import RiskEngine
+from driftpy.user_map.user_map import UserMap
+from driftpy.user_map.user_map_config import UserMapConfig, WebsocketConfig
 from tests.dlob_test_constants import mock_perp_markets, mock_spot_markets
 
 from .helpers import make_mock_user, mock_user_account
@@ -348,3 +362,361 @@ async def test_sol_perp_custom_mrgn_ratio():
     m_lev_2 = user_2.get_max_leverage_for_perp(0, MarginCategory.MAINTENANCE)
     assert i_lev_2 == 2_000
     assert m_lev_2 == 10_000
+
+
+async def make_risk_engine_users(seed: int = 0):
+    rng = random.Random(seed)
+    perp_markets = deepcopy(mock_perp_markets) + [deepcopy(mock_perp_markets[0])]
+    spot_markets = deepcopy(mock_spot_markets)
+    perp_prices = [
+        60_000 * PRICE_PRECISION,
+        150 * PRICE_PRECISION,
+        PRICE_PRECISION * 3 // 5,
+        10 * PRICE_PRECISION,
+    ]
+    spot_prices = [PRICE_PRECISION, 150 * PRICE_PRECISION, 3 * PRICE_PRECISION // 2]
+
+    for market_index, market in enumerate(perp_markets):
+        # the mock markets share their amm
+        market.amm = copy.copy(market.amm)
+        market.market_index = market_index
+        market.amm.cumulative_funding_rate_long = rng.randint(-(10**12), 10**12)
+        market.amm.cumulative_funding_rate_short = rng.randint(-(10**12), 10**12)
+        market.unrealized_pnl_initial_asset_weight = 9_000
+        market.unrealized_pnl_maintenance_asset_weight = 10_000
+    perp_markets[1].imf_factor = 1_000
+    perp_markets[1].unrealized_pnl_imf_factor = 2_000
+    perp_markets[1].unrealized_pnl_max_imbalance = 100 * QUOTE_PRECISION
+    perp_markets[1].amm.base_asset_amount_with_amm = 10_000 * BASE_PRECISION
+    perp_markets[2].contract_type = ContractType.Prediction()
+    perp_markets[3].status = MarketStatus.Settlement()
+    perp_markets[3].expiry_price = 12 * PRICE_PRECISION
+
+    # perp market 1 and spot market 1 share an oracle
+    for market in perp_markets:
+        market.amm.oracle = Pubkey.new_unique()
+    for market_index, market in enumerate(spot_markets):
+        market.oracle = (
+            perp_markets[1].amm.oracle if market_index == 1 else Pubkey.new_unique()
+        )
+
+    spot_markets[0].historical_oracle_data.last_oracle_price_twap5min = 1_000_100
+    spot_markets[1].imf_factor = 2_000
+    spot_markets[1].initial_asset_weight = 8_000
+    spot_markets[1].maintenance_asset_weight = 9_000
+    spot_markets[1].initial_liability_weight = 12_000
+    spot_markets[1].maintenance_liability_weight = 11_000
+    spot_markets[1].historical_oracle_data.last_oracle_price_twap5min = (
+        140 * PRICE_PRECISION
+    )
+    spot_markets[1].cumulative_deposit_interest = 10_123_456_789
+    spot_markets[1].cumulative_borrow_interest = 10_456_789_123
+    spot_markets[2].scale_initial_asset_weight_start = 1_000 * QUOTE_PRECISION
+    spot_markets[2].deposit_balance = 10_000 * SPOT_BALANCE_PRECISION
+    spot_markets[2].initial_asset_weight = 7_000
+
+    user = await make_mock_user(
+        perp_markets, spot_markets, deepcopy(mock_user_account), [1] * 4, [1] * 3
+    )
+    drift_client = user.drift_client
+    drift_client.get_oracle_price_data_for_perp_market = lambda i: OraclePriceData(
+        perp_prices[i], 0, 1, 0, 0, True
+    )
+    drift_client.get_oracle_price_data_for_spot_market = lambda i: OraclePriceData(
+        spot_prices[i], 0, 1, 0, 0, True
+    )
+    drift_client.get_state_account = lambda: SimpleNamespace(
+        liquidation_margin_buffer_ratio=200
+    )
+    drift_client.get_perp_market_accounts = lambda: perp_markets
+    drift_client.get_spot_market_accounts = lambda: spot_markets
+
+    users = []
+    for i in range(300):
+        user_account = deepcopy(mock_user_account)
+        user_account.max_margin_ratio = rng.choice([0, 0, 1_000, 5_000])
+        user_account.status = rng.choice([0, 0, 0, UserStatus.BEING_LIQUIDATED])
+        for position, market_index in zip(
+            user_account.perp_positions, rng.sample(range(4), rng.randint(0, 4))
+        ):
+            position.market_index = market_index
+            position.base_asset_amount = rng.choice([0, 1]) * rng.randint(
+                -1_000 * BASE_PRECISION, 1_000 * BASE_PRECISION
+            )
+            position.quote_asset_amount = rng.randint(
+                -100_000 * QUOTE_PRECISION, 100_000 * QUOTE_PRECISION
+            )
+            position.open_bids = rng.choice([0, 1]) * rng.randint(0, 10**12)
+            position.open_asks = rng.choice([0, 1]) * rng.randint(-(10**12), 0)
+            position.open_orders = rng.randint(0, 3)
+            position.last_cumulative_funding_rate = rng.randint(-(10**12), 10**12)
+        for position, market_index in zip(
+            user_account.spot_positions, rng.sample(range(3), rng.randint(0, 3))
+        ):
+            position.market_index = market_index
+            position.balance_type = rng.choice(
+                [SpotBalanceType.Deposit(), SpotBalanceType.Borrow()]
+            )
+            position.scaled_balance = rng.randint(0, 100_000 * SPOT_BALANCE_PRECISION)
+            position.open_bids = rng.choice([0, 1]) * rng.randint(0, 10**12)
+            position.open_asks = rng.choice([0, 1]) * rng.randint(-(10**12), 0)
+            position.open_orders = rng.randint(0, 3)
+
+        drift_user = copy.copy(user)
+        drift_user.get_user_account = lambda user_account=user_account: user_account
+        drift_user.user_public_key = i
+        users.append(drift_user)
+
+    return drift_client, users
+
+
+@mark.asyncio
+async def test_risk_engine_matches_drift_user():
+    drift_client, users = await make_risk_engine_users()
+
+    risk = RiskEngine(drift_client).get_user_risk(users)
+
+    assert risk.user_public_keys == list(range(300))
+    assert risk.can_be_liquidated.any() and not risk.can_be_liquidated.all()
+    for i, drift_user in enumerate(users):
+        liquidation_buffer = 200 if drift_user.is_being_liquidated() else 0
+        assert risk.health[i] == drift_user.get_health()
+        assert risk.free_collateral[i] == drift_user.get_free_collateral()
+        assert risk.can_be_liquidated[i] == drift_user.can_be_liquidated()
+        assert risk.total_collateral[i] == drift_user.get_total_collateral(
+            MarginCategory.MAINTENANCE
+        )
+        assert risk.maintenance_margin_requirement[
+            i
+        ] == drift_user.get_margin_requirement(
+            MarginCategory.MAINTENANCE, liquidation_buffer
+        )
+
+
+@mark.asyncio
+async def test_risk_engine_liquidation_prices_match_drift_user():
+    drift_client, users = await make_risk_engine_users(seed=1)
+
+    liquidation_prices = RiskEngine(drift_client).get_liquidation_prices(users)
+
+    expected_perp_rows = [
+        (i, position.market_index, drift_user.get_perp_liq_price(position.market_index))
+        for i, drift_user in enumerate(users)
+        for position in drift_user.get_user_account().perp_positions
+        if position.base_asset_amount != 0
+    ]
+    expected_spot_rows = [
+        (i, position.market_index, drift_user.get_spot_liq_price(position.market_index))
+        for i, drift_user in enumerate(users)
+        for position in drift_user.get_user_account().spot_positions
+        if position.scaled_balance != 0 and position.market_index != 0
+    ]
+    assert (
+        list(
+            zip(
+                liquidation_prices.perp_user_public_keys,
+                liquidation_prices.perp_market_indexes.tolist(),
+                liquidation_prices.perp_liq_prices.tolist(),
+            )
+        )
+        == expected_perp_rows
+    )
+    assert (
+        list(
+            zip(
+                liquidation_prices.spot_user_public_keys,
+                liquidation_prices.spot_market_indexes.tolist(),
+                liquidation_prices.spot_liq_prices.tolist(),
+            )
+        )
+        == expected_spot_rows
+    )
+    # sister markets and both signs of liquidation price are covered
+    assert any(
+        market_index == 1 and liq_price > 0
+        for _, market_index, liq_price in expected_perp_rows
+    )
+    assert any(liq_price == -1 for _, _, liq_price in expected_perp_rows)
+    assert any(liq_price > 0 for _, _, liq_price in expected_spot_rows)
+
+
+@mark.asyncio
+async def test_margin_cache_invalidates_on_account_and_oracle_slots():
+    perp_markets = deepcopy(mock_perp_markets)
+    spot_markets = deepcopy(mock_spot_markets)
+    user_account = deepcopy(mock_user_account)
+    user_account.perp_positions[0].base_asset_amount = 20 * BASE_PRECISION
+    user_account.perp_positions[0].quote_asset_amount = -10 * QUOTE_PRECISION
+    user_account.spot_positions[0].scaled_balance = 10 * SPOT_BALANCE_PRECISION
+
+    user = await make_mock_user(
+        perp_markets, spot_markets, user_account, [1] * 3, [1] * 3
+    )
+    oracles = {
+        "perp": [OraclePriceData(PRICE_PRECISION, 1, 1, 0, 0, True)] * 3,
+        "spot": [OraclePriceData(PRICE_PRECISION, 1, 1, 0, 0, True)] * 3,
+    }
+    user.drift_client.get_oracle_price_data_for_perp_market = lambda i: oracles["perp"][
+        i
+    ]
+    user.drift_client.get_oracle_price_data_for_spot_market = lambda i: oracles["spot"][
+        i
+    ]
+
+    # without a slot for the account nothing is cached
+    user.get_health()
+    assert user.margin_cache_hits == user.margin_cache_misses == 0
+
+    del user.get_user_account
+    user.account_subscriber.update_data(DataAndSlot(1, user_account))
+
+    def render():
+        return (
+            user.get_health(),
+            user.get_free_collateral(),
+            user.get_leverage(),
+            user.can_be_liquidated(),
+            user.get_perp_liq_price(0),
+            user.get_max_leverage_for_perp(0),
+        )
+
+    expected = render()
+    misses = user.margin_cache_misses
+    assert user.margin_cache_hits > 0
+    assert render() == expected
+    assert user.margin_cache_misses == misses
+
+    user.clear_margin_cache()
+    components = user.get_leverage_components()
+    state = user.get_margin_cache_state()
+    assert state[0] is user.get_user_account_and_slot()
+    assert state[1] == (perp_markets[0],) and state[2] == (1,)
+    assert state[3] == (spot_markets[0],) and state[4] == (1,)
+    assert components == (
+        user.calculate_total_perp_position_liability(None, None, True),
+        user.calculate_unrealized_pnl(True, None, None),
+        *user.calculate_spot_market_asset_and_liability_value(None, None, None, True),
+    )
+
+    # a new oracle slot drops the cache
+    oracles["perp"] = [OraclePriceData(PRICE_PRECISION // 2, 2, 1, 0, 0, True)] * 3
+    assert user.get_unrealized_pnl(True) == 0
+    assert render() != expected
+
+    # and so does a new user account slot
+    closed_account = deepcopy(user_account)
+    closed_account.perp_positions[0].base_asset_amount = 0
+    user.account_subscriber.update_data(DataAndSlot(3, closed_account))
+    assert user.get_unrealized_pnl(True) == -10 * QUOTE_PRECISION
+    assert user.get_total_perp_position_liability() == 0
+    assert user.get_margin_cache_state()[0].slot == 3
+    assert user.get_margin_cache_state()[2] == (2,)
+
+
+@mark.asyncio
+async def test_margin_cache_invalidates_on_updates_within_a_slot():
+    perp_markets = deepcopy(mock_perp_markets)
+    spot_markets = deepcopy(mock_spot_markets)
+    user_account = deepcopy(mock_user_account)
+    user_account.perp_positions[0].base_asset_amount = 20 * BASE_PRECISION
+    user_account.perp_positions[0].quote_asset_amount = -10 * QUOTE_PRECISION
+    user_account.spot_positions[0].scaled_balance = 10 * SPOT_BALANCE_PRECISION
+
+    user = await make_mock_user(
+        perp_markets, spot_markets, user_account, [1] * 3, [1] * 3
+    )
+    perp_oracle = OraclePriceData(PRICE_PRECISION // 2, 5, 1, 0, 0, True)
+    spot_oracle = OraclePriceData(PRICE_PRECISION, 5, 1, 0, 0, True)
+    user.drift_client.get_oracle_price_data_for_perp_market = lambda i: perp_oracle
+    user.drift_client.get_oracle_price_data_for_spot_market = lambda i: spot_oracle
+    del user.get_user_account
+    user.account_subscriber.update_data(DataAndSlot(5, user_account))
+    assert user.get_unrealized_pnl(True) == user.calculate_unrealized_pnl(True)
+
+    # a new account at the same slot
+    closed_account = deepcopy(user_account)
+    closed_account.perp_positions[0].base_asset_amount = 0
+    user.account_subscriber.update_data(DataAndSlot(5, closed_account))
+    assert user.get_unrealized_pnl(True) == user.calculate_unrealized_pnl(True)
+    assert user.get_unrealized_pnl(True) == -10 * QUOTE_PRECISION
+
+    # a market account update, with the same oracle slot
+    collateral = user.get_total_collateral()
+    spot_market = deepcopy(spot_markets[0])
+    spot_market.cumulative_deposit_interest *= 2
+    user.drift_client.get_spot_market_account = lambda i: spot_market
+    updated_collateral = user.get_total_collateral()
+    assert updated_collateral != collateral
+    user.clear_margin_cache()
+    assert user.get_total_collateral() == updated_collateral
+
+
+@mark.asyncio
+async def test_liquidation_candidate_index_matches_full_scan():
+    drift_client, users = await make_risk_engine_users(seed=2)
+    perp_prices = [
+        60_000 * PRICE_PRECISION,
+        150 * PRICE_PRECISION,
+        PRICE_PRECISION * 3 // 5,
+        10 * PRICE_PRECISION,
+    ]
+    spot_prices = [PRICE_PRECISION, 150 * PRICE_PRECISION, 3 * PRICE_PRECISION // 2]
+    drift_client.get_oracle_price_data_for_perp_market = lambda i: OraclePriceData(
+        perp_prices[i], 0, 1, 0, 0, True
+    )
+    drift_client.get_oracle_price_data_for_spot_market = lambda i: OraclePriceData(
+        spot_prices[i], 0, 1, 0, 0, True
+    )
+
+    user_map = UserMap(
+        UserMapConfig(drift_client, WebsocketConfig(), liquidation_index=True)
+    )
+    for drift_user in users:
+        await user_map.add_pubkey(
+            Pubkey.new_unique(), DataAndSlot(0, drift_user.get_user_account())
+        )
+    index = user_map.liquidation_index
+
+    def get_candidates():
+        return {user.user_public_key for user in user_map.get_liquidation_candidates()}
+
+    def scan():
+        users = list(user_map.values())
+        risk = RiskEngine(drift_client).get_user_risk(users)
+        return {
+            user.user_public_key
+            for user, can_be_liquidated in zip(users, risk.can_be_liquidated.tolist())
+            if can_be_liquidated
+        }
+
+    assert get_candidates() == scan()
+    assert index.last_evaluated == 300
+
+    # without oracle moves only the users that could be liquidated are checked
+    assert get_candidates() == scan()
+    assert index.last_evaluated == len(index.liquidatable)
+
+    rng = random.Random(0)
+    evaluated = 0
+    for _ in range(30):
+        market_index = rng.randrange(3)
+        move = rng.uniform(0.98, 1.02)
+        if market_index == 1:
+            # perp market 1 and spot market 1 share an oracle
+            perp_prices[1] = spot_prices[1] = int(perp_prices[1] * move)
+        elif market_index == 2:
+            spot_prices[2] = int(spot_prices[2] * move)
+        else:
+            perp_prices[0] = int(perp_prices[0] * move)
+        assert get_candidates() == scan()
+        evaluated += index.last_evaluated - len(index.liquidatable)
+    # most users here have open orders, which are re-evaluated by any move
+    # out of the band of the oracle price
+    assert evaluated < 30 * (300 - len(index.liquidatable)) * 2 / 3
+
+    # account updates are picked up by the next call
+    key = next(iter(index.liquidatable))
+    user = user_map.get(key)
+    await user_map.update_user_account(key, DataAndSlot(1, deepcopy(mock_user_account)))
+    assert user not in user_map.get_liquidation_candidates()
+    assert get_candidates() == scan()